@@ -0,0 +1,4 @@
+"""
+Utilitários compartilhados pelos scripts de classificação
+(local_models/ e gemini25/).
+"""
@@ -0,0 +1,125 @@
+"""
+Repetição adaptativa (--adaptive). Com temperature=0 as runs tendem a
+repetir as mesmas respostas; em vez de pagar --runs vezes por linha, as
+runs são executadas em rodadas (run 1 para todas as linhas, run 2 só
+para as que ainda não estabilizaram, ...). Entre rodadas:
+
+  linha   estável após --stable_k rótulos idênticos consecutivos;
+  prompt  encerrado quando o IC 95% (t de Student) da métrica
+          --ci_metric entre as runs já feitas fica mais estreito que
+          --ci_eps, a partir de --min_runs runs (só tarefas com métricas).
+
+Células não consultadas recebem a última resposta da linha, de modo que
+toda run continua com um CSV completo; o relatório registra quantas
+requisições (linhas) foram poupadas por prompt.
+"""
+import math
+
+from polarity.cache import is_error
+from polarity.metrics import METRICS
+
+# quantis t de Student (bicaudal 95%) para 1..30 graus de liberdade
+T95 = (12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+       2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+       2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042)
+
+
+def ci_width(values):
+    """Largura do IC 95% da média; inf com menos de dois valores."""
+    n = len(values)
+    if n < 2:
+        return math.inf
+    mean = sum(values) / n
+    sd = math.sqrt(sum((v - mean) ** 2 for v in values) / (n - 1))
+    t = T95[n - 2] if n - 2 < len(T95) else 1.96
+    return 2 * t * sd / math.sqrt(n)
+
+
+def add_adaptive_args(parser):
+    parser.add_argument("--adaptive", action="store_true",
+                        help="executa as runs em rodadas e para de consultar linhas/prompts estáveis")
+    parser.add_argument("--stable_k", type=int, default=3,
+                        help="rótulos idênticos consecutivos para uma linha ser estável")
+    parser.add_argument("--ci_eps", type=float, default=None,
+                        help="encerra o prompt quando o IC 95%% da métrica fica abaixo disto")
+    parser.add_argument("--ci_metric", choices=METRICS, default="f1_macro",
+                        help="métrica usada no critério --ci_eps")
+    parser.add_argument("--min_runs", type=int, default=3,
+                        help="runs completas antes de aplicar --ci_eps")
+
+
+class StabilityTracker:
+    """Concordância por linha e métrica por run de cada prompt, atualizadas a cada célula."""
+
+    def __init__(self, prompts, n_rows, stable_k=3, ci_eps=None, min_runs=3):
+        self.n_rows = n_rows
+        self.stable_k = max(1, stable_k)
+        self.ci_eps = ci_eps
+        self.min_runs = max(2, min_runs)
+        self.last   = {p: [None] * n_rows for p in prompts}   # última resposta válida
+        self.label  = {p: [None] * n_rows for p in prompts}
+        self.streak = {p: [0] * n_rows for p in prompts}
+        self.scores = {p: [] for p in prompts}
+        self.stopped = {}                      # prompt → run a partir da qual foi encerrado
+        self.queried = dict.fromkeys(prompts, 0)
+        self.saved   = dict.fromkeys(prompts, 0)
+
+    def update(self, prompt, responses, preds, score=None):
+        """Célula (run, prompt) completa, na ordem das runs."""
+        last, label, streak = self.last[prompt], self.label[prompt], self.streak[prompt]
+        for row, (resp, lab) in enumerate(zip(responses, preds)):
+            if is_error(resp):
+                streak[row] = 0
+                continue
+            streak[row] = streak[row] + 1 if lab == label[row] else 1
+            label[row], last[row] = lab, resp
+        if score is not None:
+            self.scores[prompt].append(score)
+
+    def plan(self, prompt, run):
+        """Linhas a consultar na run `run`; as demais são preenchidas com `fill`."""
+        last, streak = self.last[prompt], self.streak[prompt]
+        if prompt not in self.stopped and self.ci_eps is not None \
+                and len(self.scores[prompt]) >= self.min_runs \
+                and ci_width(self.scores[prompt]) < self.ci_eps:
+            self.stopped[prompt] = run
+        if prompt in self.stopped:
+            rows = [r for r in range(self.n_rows) if last[r] is None]
+        else:
+            rows = [r for r in range(self.n_rows)
+                    if last[r] is None or streak[r] < self.stable_k]
+        self.queried[prompt] += len(rows)
+        self.saved[prompt] += self.n_rows - len(rows)
+        return rows
+
+    def fill(self, prompt, row):
+        return self.last[prompt][row]
+
+    # ----------------------------- relatório --------------------------
+    def report_rows(self):
+        out = []
+        for p in self.last:
+            out.append({
+                "prompt": p,
+                "requests": self.queried[p],
+                "requests_saved": self.saved[p],
+                "rows_stable": sum(s >= self.stable_k for s in self.streak[p]),
+                "stopped_at_run": self.stopped.get(p),
+                "ci_width": ci_width(self.scores[p]) if self.scores[p] else None,
+            })
+        return out
+
+    @property
+    def total_saved(self):
+        return sum(self.saved.values())
+
+    def summary(self) -> str:
+        total = sum(self.queried.values()) + self.total_saved
+        lines = [f"adaptativo: {self.total_saved} de {total} requisições poupadas "
+                 f"({self.total_saved / total:.0%})" if total else "adaptativo: nada planejado"]
+        for r in self.report_rows():
+            stop = f", encerrado na run {r['stopped_at_run']}" if r["stopped_at_run"] else ""
+            ci = f", IC={r['ci_width']:.4f}" if r["ci_width"] not in (None, math.inf) else ""
+            lines.append(f"  {r['prompt']}: {r['requests']} consultas, {r['requests_saved']} poupadas, "
+                         f"{r['rows_stable']}/{self.n_rows} linhas estáveis{ci}{stop}")
+        return "\n".join(lines)
@@ -0,0 +1,28 @@
+"""
+Backends de LLM. Os módulos de cada backend importam suas dependências
+(llama_index, google-genai) apenas quando escolhidos.
+"""
+from polarity.backends.base import Backend, Request
+
+
+def get_backend(name, model, **kwargs) -> Backend:
+    if name == "ollama":
+        from polarity.backends.ollama import OllamaBackend
+        endpoints = kwargs.pop("endpoints", None) or []
+        health_interval = kwargs.pop("health_interval", 30.0)
+        if len(endpoints) > 1:
+            from polarity.backends.balancer import BalancedBackend
+            # um HttpPool compartilhado: o resumo de conexões soma todos os endpoints
+            children = [OllamaBackend(model, **dict(kwargs, base_url=url)) for url in endpoints]
+            return BalancedBackend(children, endpoints, kwargs.get("timeout", 120.0),
+                                   health_interval)
+        if endpoints:
+            kwargs["base_url"] = endpoints[0]
+        return OllamaBackend(model, **kwargs)
+    if name == "gemini":
+        from polarity.backends.gemini import GeminiBackend
+        return GeminiBackend(model, **kwargs)
+    if name == "mock":
+        from polarity.backends.mock import MockBackend
+        return MockBackend(model, **kwargs)
+    raise ValueError(f"backend desconhecido: {name!r}")
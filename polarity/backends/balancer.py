@@ -0,0 +1,292 @@
+"""
+Distribuição das requisições entre vários servidores do mesmo backend
+(--endpoints, p.ex. várias máquinas com Ollama).
+
+Cada requisição vai para o endpoint saudável com menos requisições em
+voo (least outstanding requests; empate: o que atendeu menos). Uma
+tentativa que passa de `timeout` (o request_timeout do backend) ou
+falha por causa do servidor (conexão recusada, HTTP 5xx, modelo
+ausente) marca o endpoint como fora do ar e a requisição segue para o
+próximo (failover), até todos terem sido tentados; erros da própria
+requisição sobem direto para o engine. O timeout vale por tentativa
+também nas chamadas síncronas (`complete`, numa thread), e uma chamada
+cancelada de fora (timeout do engine) libera o endpoint sem contar erro. Um endpoint fora do ar volta à
+escala depois de `health_interval` segundos, se o health check passar.
+
+O health check (`Backend.health`) devolve a impressão digital do modelo
+servido; em `prepare`, endpoints com um modelo diferente do da maioria
+(outra quantização, outro template) ficam de fora, para que o rótulo de
+cada linha não dependa de qual servidor a atendeu. Com temperatura 0 e
+os mesmos parâmetros de decodificação (e o mesmo num_ctx em todos), a
+resposta é a mesma em qualquer endpoint, e a chave do cache não inclui
+o endpoint.
+"""
+import asyncio, threading, time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from polarity.backends.base import Backend
+
+HOST_STATUS = (404, 500, 502, 503, 504)   # modelo ausente ou servidor com problema
+ABORTED     = asyncio.CancelledError()      # tentativa interrompida de fora (cancelamento)
+
+
+def host_failure(err) -> bool:
+    """A falha é do servidor (vale tentar outro endpoint) e não da requisição?"""
+    if isinstance(err, (asyncio.TimeoutError, TimeoutError, ConnectionError, httpx.TransportError)):
+        return True
+    return getattr(err, "status_code", None) in HOST_STATUS
+
+
+def add_endpoint_args(parser):
+    parser.add_argument("--endpoints", nargs="+", default=None,
+                        help="vários servidores (URLs); as requisições vão para o que tiver "
+                             "menos em voo, com failover (substitui --base_url)")
+    parser.add_argument("--health_interval", type=float, default=30.0,
+                        help="espera (s) antes de testar de novo um endpoint fora do ar")
+
+
+class Endpoint:
+    """Estado e contadores de um servidor."""
+
+    def __init__(self, backend, url):
+        self.backend = backend
+        self.url = url
+        self.healthy = True
+        self.excluded = None        # motivo, se ficou fora da varredura
+        self.retry_at = 0.0         # quando testar de novo (fora do ar)
+        self.checking = False
+        self.fingerprint = None
+        self.in_flight = self.peak = 0
+        self.requests = self.ok = self.errors = self.timeouts = 0
+        self.busy_s = 0.0
+        self.first = self.last = None
+
+    def as_dict(self, wall=None):
+        span = wall or ((self.last - self.first) if self.first is not None else 0.0)
+        return {"url": self.url, "requests": self.requests, "ok": self.ok,
+                "errors": self.errors, "timeouts": self.timeouts, "peak_in_flight": self.peak,
+                "mean_ms": self.busy_s * 1000 / self.ok if self.ok else 0.0,
+                "req_per_s": self.ok / span if span > 0 else 0.0,
+                "healthy": self.healthy and not self.excluded, "excluded": self.excluded}
+
+
+class BalancedBackend(Backend):
+    def __init__(self, backends, urls, timeout=120.0, health_interval=30.0):
+        first = backends[0]
+        super().__init__(first.model)
+        self.name = first.name
+        self.json_mode = first.json_mode
+        self.batch_api = first.batch_api
+        self.prefix_cache = first.prefix_cache
+        self.max_concurrency = sum(b.max_concurrency for b in backends)
+        self.attempts = len(backends)
+        self.pool = first.pool          # o mesmo HttpPool em todos os endpoints
+        self.top_logprobs = first.top_logprobs
+        self.timeout = timeout
+        self.health_interval = health_interval
+        self.endpoints = [Endpoint(b, u) for b, u in zip(backends, urls)]
+        self.failovers = 0
+        self._lock = threading.Lock()
+        self._probes = set()
+        self._threads = None     # executor das chamadas síncronas (timeout por tentativa)
+
+    def params(self):
+        return self.endpoints[0].backend.params()
+
+    # -------------------------- health check --------------------------
+    def prepare(self, system, prefixes, texts, pack_size=1):
+        """Health check de todos; exclui endpoints fora do ar ou com outro modelo."""
+        for ep in self.endpoints:
+            try:
+                ep.fingerprint = ep.backend.health()
+            except Exception as e:
+                ep.excluded = f"health check falhou ({type(e).__name__}: {e})"
+        alive = [ep for ep in self.endpoints if not ep.excluded]
+        if not alive:
+            raise RuntimeError("nenhum endpoint respondeu ao health check: "
+                               + "; ".join(f"{ep.url}: {ep.excluded}" for ep in self.endpoints))
+        majority = self._majority()
+        for ep in alive:
+            if ep.fingerprint != majority:
+                ep.excluded = f"modelo diferente da maioria ({ep.fingerprint} ≠ {majority})"
+        for ep in self.endpoints:
+            if ep.excluded:
+                print(f"! endpoint {ep.url} fora da varredura: {ep.excluded}")
+        alive = [ep for ep in self.endpoints if not ep.excluded]
+        self.max_concurrency = sum(ep.backend.max_concurrency for ep in alive)
+        self.attempts = len(alive)
+        print(f"endpoints: {len(alive)}/{len(self.endpoints)} saudáveis "
+              f"(modelo {self.model}, impressão {majority or '?'})")
+
+        lead = alive[0].backend
+        lead.prepare(system, prefixes, texts, pack_size)
+        for ep in alive[1:]:   # num_ctx calculado uma vez vale para todos
+            if getattr(lead, "num_ctx", None) is not None and hasattr(ep.backend, "use_num_ctx"):
+                ep.backend.use_num_ctx(lead.num_ctx)
+            else:
+                ep.backend.prepare(system, prefixes, texts, pack_size)
+
+    def _majority(self):
+        """Impressão digital do modelo da maioria dos endpoints que responderam."""
+        fps = Counter(ep.fingerprint for ep in self.endpoints if not ep.excluded)
+        return fps.most_common(1)[0][0] if fps else None
+
+    def _check_due(self):
+        """Dispara o health check dos endpoints fora do ar cuja espera acabou."""
+        now = time.monotonic()
+        with self._lock:
+            due = [ep for ep in self.endpoints if not ep.excluded and not ep.healthy
+                   and not ep.checking and now >= ep.retry_at]
+            for ep in due:
+                ep.checking = True
+        for ep in due:
+            task = asyncio.ensure_future(self._probe(ep))
+            self._probes.add(task)
+            task.add_done_callback(self._probes.discard)
+
+    async def _probe(self, ep):
+        try:
+            fp = await asyncio.wait_for(ep.backend.ahealth(), self.timeout)
+            ok = fp == self._majority()
+        except Exception:
+            ok = False
+        with self._lock:
+            ep.healthy = ok
+            ep.retry_at = time.monotonic() + self.health_interval
+            ep.checking = False
+
+    # ----------------------------- escolha ----------------------------
+    def _pick(self, tried, trial=False):
+        """
+        Endpoint com menos requisições em voo entre os saudáveis não
+        tentados. `trial`: sem health check assíncrono, um endpoint fora
+        do ar cuja espera acabou é testado com a própria requisição.
+        """
+        with self._lock:
+            now = time.monotonic()
+            usable = [ep for ep in self.endpoints if not ep.excluded and ep not in tried]
+            if not usable:
+                return None
+            live = [ep for ep in usable if ep.healthy or (trial and now >= ep.retry_at)]
+            # todos fora do ar: tenta o que volta primeiro em vez de falhar de vez
+            ep = (min(live, key=lambda e: (e.in_flight, e.requests)) if live
+                  else min(usable, key=lambda e: e.retry_at))
+            ep.in_flight += 1
+            ep.peak = max(ep.peak, ep.in_flight)
+            ep.requests += 1
+            if ep.first is None:
+                ep.first = time.perf_counter()
+        return ep
+
+    def _done(self, ep, t0, err=None):
+        """Contabiliza a tentativa; devolve True se vale tentar outro endpoint."""
+        with self._lock:
+            ep.in_flight -= 1
+            ep.last = time.perf_counter()
+            if err is ABORTED:
+                return False
+            if err is None:
+                ep.ok += 1
+                ep.busy_s += ep.last - t0
+                ep.healthy = True
+                return False
+            ep.errors += 1
+            if not host_failure(err):
+                return False
+            if isinstance(err, (asyncio.TimeoutError, TimeoutError)):
+                ep.timeouts += 1
+            ep.healthy = False
+            ep.retry_at = time.monotonic() + self.health_interval
+            return True
+
+    def _next(self, tried, err, span, trial=False):
+        """Próximo endpoint a tentar; sem nenhum, relança a última falha."""
+        ep = self._pick(tried, trial)
+        if ep is None:
+            raise err
+        if tried:
+            with self._lock:
+                self.failovers += 1
+            if span is not None:
+                span["failovers"] = span.get("failovers", 0) + 1
+        tried.append(ep)
+        return ep
+
+    # ----------------------------- chamadas ---------------------------
+    def _served(self, ep, span):
+        if span is not None:
+            span["endpoint"] = ep.url
+
+    async def acomplete(self, req, span=None):
+        self._check_due()
+        tried, err = [], None
+        while True:
+            ep = self._next(tried, err, span)
+            t0, err = time.perf_counter(), ABORTED
+            try:
+                out = await asyncio.wait_for(ep.backend.acomplete(req, span), self.timeout)
+                err = None
+            except asyncio.TimeoutError:
+                err = TimeoutError(f"{ep.url}: sem resposta em {self.timeout}s")
+            except Exception as e:
+                err = e
+            finally:   # libera o endpoint mesmo se a chamada for cancelada
+                again = self._done(ep, t0, err)
+            if err is None:
+                self._served(ep, span)
+                return out
+            if not again:
+                raise err
+
+    def _executor(self):
+        with self._lock:
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(self.max_concurrency,
+                                                   thread_name_prefix="endpoint")
+            return self._threads
+
+    def complete(self, req, span=None):
+        tried, err = [], None
+        while True:
+            ep = self._next(tried, err, span, trial=True)
+            t0, err = time.perf_counter(), ABORTED
+            try:
+                call = self._executor().submit(ep.backend.complete, req, span)
+                out = call.result(timeout=self.timeout)
+                err = None
+            except TimeoutError:   # a thread segue até o timeout do cliente HTTP
+                err = TimeoutError(f"{ep.url}: sem resposta em {self.timeout}s")
+            except Exception as e:
+                err = e
+            finally:
+                again = self._done(ep, t0, err)
+            if err is None:
+                self._served(ep, span)
+                return out
+            if not again:
+                raise err
+
+    # ----------------------------- resumo -----------------------------
+    def as_dict(self):
+        return {"failovers": self.failovers,
+                "endpoints": [ep.as_dict() for ep in self.endpoints]}
+
+    def summary(self):
+        lines = [f"endpoints ({self.failovers} failovers):"]
+        for ep in self.endpoints:
+            d = ep.as_dict()
+            state = (f"excluído: {ep.excluded}" if ep.excluded
+                     else "ok" if ep.healthy else "fora do ar")
+            lines.append(f"  {ep.url}: {d['ok']}/{d['requests']} ok, {d['errors']} erros "
+                         f"({d['timeouts']} timeouts), {d['req_per_s']:.1f} req/s, "
+                         f"média {d['mean_ms']:.0f} ms, pico {d['peak_in_flight']} em voo · {state}")
+        return "\n".join(lines)
+
+    def close(self):
+        if self._threads is not None:
+            self._threads.shutdown(wait=False, cancel_futures=True)
+        for ep in self.endpoints:
+            ep.backend.close()
@@ -0,0 +1,75 @@
+"""
+Interface comum dos backends de LLM.
+
+Um backend sabe enviar uma requisição (instrução de sistema + prompt do
+usuário) e devolver o texto da resposta. Concorrência, cache, limite de
+taxa, empacotamento e gravação dos resultados ficam no runner e valem
+para todos os backends.
+"""
+import asyncio
+from collections import namedtuple
+
+# labels: rótulos permitidos quando a saída é JSON estruturado (modo pack);
+# n_items: quantos rótulos a resposta deve conter (0 = resposta livre, 1 item);
+# labels com n_items=0: um rótulo com decodificação restrita (polarity.decoding)
+Request = namedtuple("Request", "system prompt labels n_items", defaults=(None, 0))
+
+
+class Backend:
+    name = "base"
+
+    # capacidades
+    max_concurrency = 1      # sugestão de requisições simultâneas
+    json_mode = False        # aceita saída JSON estruturada (--pack_size)
+    batch_api = False        # oferece API de lote assíncrona
+    prefix_cache = False     # servidor reaproveita o KV de prefixos repetidos
+
+    pool = None              # polarity.pool.HttpPool dos backends HTTP
+    attempts = 1             # servidores tentados por requisição (failover entre --endpoints)
+    top_logprobs = 0         # alternativas por token pedidas no modo --decoding label
+
+    def __init__(self, model):
+        self.model = model
+
+    def prepare(self, system, prefixes, texts, pack_size=1):
+        """Ajusta o backend à varredura antes da primeira chamada."""
+
+    def health(self):
+        """
+        Health check: impressão digital do modelo servido (para comparar
+        servidores) ou None; levanta exceção se o servidor não responde.
+        """
+        return None
+
+    async def ahealth(self):
+        return await asyncio.to_thread(self.health)
+
+    def params(self) -> dict:
+        """Parâmetros de decodificação (entram na chave do cache)."""
+        return {}
+
+    # `span` (opcional) é o dicionário do polarity.trace; o backend soma
+    # nele tokens_in/tokens_out e, quando o servidor informa, os tempos
+    # de prefill/decode.
+    def complete(self, req: Request, span=None) -> str:
+        raise NotImplementedError
+
+    async def acomplete(self, req: Request, span=None) -> str:
+        return await asyncio.to_thread(self.complete, req, span)
+
+    def complete_batch(self, reqs, path=None):
+        """
+        Lista de respostas para uma lista de requisições (em ordem).
+        Backends com batch_api gravam as requisições em `path` (JSONL).
+        Falhas individuais viram "ERROR: ...".
+        """
+        out = []
+        for r in reqs:
+            try:
+                out.append(self.complete(r))
+            except Exception as e:
+                out.append(f"ERROR: {e}")
+        return out
+
+    def close(self):
+        pass
@@ -0,0 +1,348 @@
+"""
+Backend Gemini (Vertex AI, google-genai). Usa o cliente assíncrono
+nativo (`client.aio`); os GenerateContentConfig são montados uma vez por
+formato de resposta e reaproveitados.
+
+Com context_cache=True, `prepare` cria um CachedContent por prefixo de
+prompt (instrução de sistema + persona) e cada requisição envia só o
+restante do prompt, referenciando o cache. Prefixos recusados pela API
+(abaixo do mínimo de tokens do modelo, p.ex.) seguem inline.
+
+`complete_batch` grava as requisições em JSONL (formato REST do
+generateContent) e submete um único job de Batch Prediction: no Vertex
+o arquivo sobe para --batch_gcs (Cloud Storage) e as predições são lidas
+de lá; com base_url (API do Gemini ou stand-in local) as requisições vão
+inline no job.
+
+O cliente usa transportes httpx próprios (polarity.pool): pool de
+conexões dimensionado pela concorrência, keep-alive e HTTP/2 opcional.
+
+Requisições com rótulos e sem n_items (--decoding label) pedem
+`text/x.enum` com os rótulos, poucos tokens de saída e, com
+top_logprobs, os logprobs da resposta (polarity.decoding).
+"""
+import json, os, time
+from pathlib import Path
+
+from google import genai
+from google.genai import types
+
+from polarity.backends.base import Backend
+from polarity.decoding import LABEL_TOKENS, label_confidence, label_response
+from polarity.pool import HttpPool
+
+MAX_OUTPUT_TOKENS = 20
+TEMPERATURE       = 0
+TOP_P             = 0.95
+
+SAFETY_SETTINGS = [
+    types.SafetySetting(category="HARM_CATEGORY_HATE_SPEECH",       threshold="OFF"),
+    types.SafetySetting(category="HARM_CATEGORY_DANGEROUS_CONTENT", threshold="OFF"),
+    types.SafetySetting(category="HARM_CATEGORY_SEXUALLY_EXPLICIT", threshold="OFF"),
+    types.SafetySetting(category="HARM_CATEGORY_HARASSMENT",        threshold="OFF"),
+]
+
+BATCH_DONE = {"JOB_STATE_SUCCEEDED", "JOB_STATE_PARTIALLY_SUCCEEDED", "JOB_STATE_FAILED",
+              "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"}
+BATCH_OK   = {"JOB_STATE_SUCCEEDED", "JOB_STATE_PARTIALLY_SUCCEEDED"}
+
+
+def _user(text):
+    return types.Content(role="user", parts=[types.Part.from_text(text=text)])
+
+
+def _state(job):
+    return getattr(job.state, "name", str(job.state))
+
+
+def _is_label(labels, n_items):
+    return bool(labels) and not n_items
+
+
+def _max_tokens(labels, n_items):
+    return LABEL_TOKENS if _is_label(labels, n_items) else MAX_OUTPUT_TOKENS * max(1, n_items)
+
+
+def rest_request(req, top_logprobs=0):
+    """Corpo REST do generateContent para uma requisição (linha do JSONL de lote)."""
+    gen = {"temperature": TEMPERATURE, "topP": TOP_P,
+           "maxOutputTokens": _max_tokens(req.labels, req.n_items),
+           "responseModalities": ["TEXT"], "thinkingConfig": {"thinkingBudget": 0}}
+    if _is_label(req.labels, req.n_items):
+        gen["responseMimeType"] = "text/x.enum"
+        gen["responseSchema"] = {"type": "STRING", "enum": list(req.labels)}
+        if top_logprobs:
+            gen.update(responseLogprobs=True, logprobs=top_logprobs)
+    elif req.n_items:
+        gen["responseMimeType"] = "application/json"
+        gen["responseSchema"] = {
+            "type": "OBJECT",
+            "properties": {"labels": {"type": "ARRAY",
+                                      "items": {"type": "STRING", "enum": list(req.labels)}}},
+            "required": ["labels"],
+        }
+    return {
+        "contents": [{"role": "user", "parts": [{"text": req.prompt}]}],
+        "systemInstruction": {"parts": [{"text": req.system}]},
+        "generationConfig": gen,
+        "safetySettings": [{"category": getattr(s.category, "value", s.category),
+                            "threshold": getattr(s.threshold, "value", s.threshold)}
+                           for s in SAFETY_SETTINGS],
+    }
+
+
+def _text(response):
+    """Texto da primeira candidata de uma resposta REST (dict) ou "ERROR: ..."."""
+    try:
+        parts = response["candidates"][0]["content"]["parts"]
+        return "".join(p.get("text", "") for p in parts).strip()
+    except (KeyError, IndexError, TypeError):
+        return f"ERROR: resposta sem texto ({json.dumps(response)[:200]})"
+
+
+def _steps(result):
+    """[(token, logprob, [(token, logprob)])] de um LogprobsResult."""
+    if result is None:
+        return []
+    chosen = result.chosen_candidates or []
+    top = result.top_candidates or []
+    return [(c.token or "", c.log_probability or 0.0,
+             [(t.token or "", t.log_probability) for t in (top[i].candidates or [])]
+             if i < len(top) else [])
+            for i, c in enumerate(chosen)]
+
+
+def _answer(req, resp):
+    """Texto da resposta; no modo label, o JSON com rótulo e confiança."""
+    text = (resp.text or "").strip()
+    if not _is_label(req.labels, req.n_items) or not text:
+        return text
+    cand = resp.candidates[0] if resp.candidates else None
+    steps = _steps(cand.logprobs_result if cand is not None else None)
+    return label_response(text, label_confidence(steps, text, req.labels))
+
+
+class GeminiBackend(Backend):
+    name = "gemini"
+    max_concurrency = 10
+    json_mode = True
+    batch_api = True
+
+    def __init__(self, model, project="aida-risk", location="global", base_url=None,
+                 context_cache=False, cache_ttl="3600s", batch_gcs=None, batch_poll=30.0,
+                 pool=None, top_logprobs=0):
+        super().__init__(model)
+        self.project = project
+        self.vertex = not base_url
+        self.pool = (pool or HttpPool()).sized(self.max_concurrency)
+        # transporte explícito: o SDK usa httpx (e não aiohttp) com o nosso pool
+        http = dict(client_args=self.pool.client_args(),
+                    async_client_args=self.pool.async_client_args())
+        if base_url:
+            # endpoint alternativo (ex.: polarity.fake_ollama), sem credenciais do Vertex
+            self.client = genai.Client(
+                api_key=os.environ.get("GOOGLE_API_KEY", "fake"),
+                http_options=types.HttpOptions(base_url=base_url, **http),
+            )
+        else:
+            self.client = genai.Client(vertexai=True, project=project, location=location,
+                                       http_options=types.HttpOptions(**http))
+        self.context_cache = context_cache
+        self.cache_ttl = cache_ttl
+        self.batch_gcs = batch_gcs
+        self.batch_poll = batch_poll
+        self.top_logprobs = top_logprobs
+        self._configs = {}
+        self._cached = {}    # (sistema, prefixo sem espaço final) → nome do CachedContent
+
+    def params(self):
+        return dict(temperature=TEMPERATURE, top_p=TOP_P,
+                    max_output_tokens=MAX_OUTPUT_TOKENS, thinking_budget=0)
+
+    # ------------------------ cache de contexto -----------------------
+    def prepare(self, system, prefixes, texts, pack_size=1):
+        if not self.context_cache:
+            return
+        unique = list(dict.fromkeys(p.rstrip() for p in prefixes))
+        for prefix in unique:
+            try:
+                cached = self.client.caches.create(
+                    model=self.model,
+                    config=types.CreateCachedContentConfig(
+                        system_instruction=system,
+                        contents=[_user(prefix)],
+                        ttl=self.cache_ttl,
+                        display_name="polarity",
+                    ),
+                )
+            except Exception as e:
+                print(f"! cache de contexto recusado ({type(e).__name__}: {e}); prefixo segue inline")
+                continue
+            self._cached[(system, prefix)] = cached.name
+        print(f"cache de contexto: {len(self._cached)}/{len(unique)} prefixos (ttl {self.cache_ttl})")
+
+    def _split(self, req):
+        """(nome do cache, restante do prompt) quando o prompt começa por um prefixo em cache."""
+        for (system, prefix), name in self._cached.items():
+            if req.system == system and req.prompt.startswith(prefix):
+                return name, req.prompt[len(prefix):].lstrip()
+        return None, req.prompt
+
+    def build_config(self, system, labels=None, n_items=0, cached=None):
+        """
+        GenerateContentConfig (memoizado); com n_items pede {"labels": [...]},
+        com rótulos e sem n_items, um único rótulo (text/x.enum).
+        Com `cached`, a instrução de sistema já está no CachedContent.
+        """
+        key = (system, tuple(labels or ()), n_items, cached)
+        if key in self._configs:
+            return self._configs[key]
+        extra = {}
+        if _is_label(labels, n_items):
+            extra = dict(response_mime_type="text/x.enum",
+                         response_schema=types.Schema(type="STRING", enum=list(labels)))
+            if self.top_logprobs:
+                extra.update(response_logprobs=True, logprobs=self.top_logprobs)
+        elif n_items:
+            extra = dict(
+                response_mime_type="application/json",
+                response_schema=types.Schema(
+                    type="OBJECT",
+                    properties={"labels": types.Schema(
+                        type="ARRAY",
+                        items=types.Schema(type="STRING", enum=list(labels)),
+                    )},
+                    required=["labels"],
+                ),
+            )
+        if cached:
+            extra["cached_content"] = cached
+        else:
+            extra["system_instruction"] = [types.Part.from_text(text=system)]
+        cfg = types.GenerateContentConfig(
+            temperature=TEMPERATURE,
+            max_output_tokens=_max_tokens(labels, n_items),
+            top_p=TOP_P,
+            response_modalities=["TEXT"],
+            safety_settings=SAFETY_SETTINGS,
+            thinking_config=types.ThinkingConfig(thinking_budget=0),
+            **extra,
+        )
+        self._configs[key] = cfg
+        return cfg
+
+    def _args(self, req):
+        cached, prompt = self._split(req)
+        return dict(model=self.model, contents=[_user(prompt)],
+                    config=self.build_config(req.system, req.labels, req.n_items, cached))
+
+    @staticmethod
+    def _usage(resp, span):
+        meta = getattr(resp, "usage_metadata", None)
+        if span is None or meta is None:
+            return
+        span["tokens_in"] += meta.prompt_token_count or 0
+        span["tokens_out"] += meta.candidates_token_count or 0
+        span["tokens_cached"] = (span.get("tokens_cached", 0)
+                                 + (getattr(meta, "cached_content_token_count", None) or 0))
+
+    def complete(self, req, span=None):
+        resp = self.client.models.generate_content(**self._args(req))
+        self._usage(resp, span)
+        return _answer(req, resp)
+
+    async def acomplete(self, req, span=None):
+        resp = await self.client.aio.models.generate_content(**self._args(req))
+        self._usage(resp, span)
+        return _answer(req, resp)
+
+    # ------------------------ Batch Prediction ------------------------
+    def complete_batch(self, reqs, path=None):
+        """
+        Um job de lote para `reqs`; devolve as respostas na ordem da
+        entrada ("ERROR: ..." nas que falharem). `path` recebe o JSONL.
+        """
+        path = Path(path or f"batch_{int(time.time())}.jsonl")
+        with open(path, "w", encoding="utf-8") as fh:
+            for r in reqs:
+                line = {"request": rest_request(r, self.top_logprobs)}
+                fh.write(json.dumps(line, ensure_ascii=False) + "\n")
+        print(f"lote: {len(reqs)} requisições em {path}")
+        if self.vertex:
+            return self._batch_gcs(path, reqs)
+        return self._batch_inline(reqs)
+
+    def _wait(self, job):
+        t0 = time.perf_counter()
+        while _state(job) not in BATCH_DONE:
+            time.sleep(self.batch_poll)
+            job = self.client.batches.get(name=job.name)
+            print(f"lote {job.name}: {_state(job)} ({time.perf_counter() - t0:.0f}s)")
+        if _state(job) not in BATCH_OK:
+            raise RuntimeError(f"job de lote {job.name} terminou em {_state(job)}: {job.error}")
+        return job
+
+    def _batch_inline(self, reqs):
+        src = [types.InlinedRequest(contents=[_user(r.prompt)],
+                                    config=self.build_config(r.system, r.labels, r.n_items))
+               for r in reqs]
+        job = self._wait(self.client.batches.create(model=self.model, src=src))
+        items = job.dest.inlined_responses
+        if len(items) != len(reqs):
+            raise RuntimeError(f"job de lote {job.name}: {len(items)} respostas para {len(reqs)} requisições")
+        out = []
+        for r, item in zip(reqs, items):
+            if item.error is not None:
+                out.append(f"ERROR: {item.error.message or item.error}")
+            else:
+                out.append(_answer(r, item.response))
+        return out
+
+    def _batch_gcs(self, path, reqs):
+        from google.cloud import storage   # dependência só do modo lote no Vertex
+
+        if not self.batch_gcs:
+            raise ValueError("--mode batch no Vertex exige --batch_gcs gs://bucket/prefixo")
+        bucket_name, _, prefix = self.batch_gcs.removeprefix("gs://").partition("/")
+        prefix = prefix.strip("/")
+        blob_name = f"{prefix}/{path.name}".lstrip("/")
+        gcs = storage.Client(project=self.project)
+        gcs.bucket(bucket_name).blob(blob_name).upload_from_filename(str(path))
+        out_prefix = f"{prefix}/{path.stem}_out".lstrip("/")
+        job = self._wait(self.client.batches.create(
+            model=self.model,
+            src=f"gs://{bucket_name}/{blob_name}",
+            config=types.CreateBatchJobConfig(dest=f"gs://{bucket_name}/{out_prefix}/"),
+        ))
+
+        # a saída não preserva a ordem: casa pelo texto do prompt
+        pending = {}
+        for i, r in enumerate(reqs):
+            pending.setdefault(r.prompt, []).append(i)
+        out = ["ERROR: sem resposta no lote"] * len(reqs)
+        for blob in gcs.list_blobs(bucket_name, prefix=out_prefix):
+            if not blob.name.endswith("predictions.jsonl"):
+                continue
+            for line in blob.download_as_text().splitlines():
+                rec = json.loads(line)
+                prompt = rec["request"]["contents"][0]["parts"][0]["text"]
+                if not pending.get(prompt):
+                    continue
+                i = pending[prompt].pop()
+                if rec.get("status"):
+                    out[i] = f"ERROR: {rec['status']}"
+                elif _is_label(reqs[i].labels, reqs[i].n_items) and rec.get("response"):
+                    resp = types.GenerateContentResponse.model_validate(rec["response"])
+                    out[i] = _answer(reqs[i], resp)
+                else:
+                    out[i] = _text(rec.get("response"))
+        print(f"lote {job.name}: predições em gs://{bucket_name}/{out_prefix}/")
+        return out
+
+    def close(self):
+        for name in self._cached.values():
+            try:
+                self.client.caches.delete(name=name)
+            except Exception as e:
+                print(f"! não foi possível apagar o cache {name}: {e}")
+        self._cached = {}
@@ -0,0 +1,49 @@
+"""
+Backend determinístico e local, sem rede: mesma regra de rótulo do
+fake_ollama (hash da manchete entre os rótulos citados no prompt), com
+latência configurável. Serve para medir concorrência, cache, limite de
+taxa etc. sem depender de Ollama ou Vertex AI.
+"""
+import asyncio, random, time
+
+from polarity.backends.base import Backend
+from polarity.decoding import label_response
+from polarity.fake_ollama import fake_answer, fake_confidence, fake_label
+
+
+class MockBackend(Backend):
+    name = "mock"
+    max_concurrency = 64
+    json_mode = True
+
+    def __init__(self, model="mock", latency=0.0, jitter=0.0, seed=0):
+        super().__init__(model)
+        self.latency = latency
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+
+    def _delay(self):
+        return max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+
+    @staticmethod
+    def _usage(req, span):
+        if span is not None:
+            span["tokens_in"] += len(req.prompt) // 4
+            span["tokens_out"] += max(1, req.n_items)
+
+    @staticmethod
+    def _answer(req):
+        if req.labels and not req.n_items:   # --decoding label
+            text = req.prompt.rsplit(": ", 1)[-1]
+            return label_response(fake_label(req.prompt, text), fake_confidence(text))
+        return fake_answer(req.prompt, json_mode=bool(req.n_items))
+
+    def complete(self, req, span=None):
+        time.sleep(self._delay())
+        self._usage(req, span)
+        return self._answer(req)
+
+    async def acomplete(self, req, span=None):
+        await asyncio.sleep(self._delay())
+        self._usage(req, span)
+        return self._answer(req)
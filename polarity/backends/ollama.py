@@ -0,0 +1,207 @@
+"""
+Backend Ollama (via LlamaIndex). Requisições empacotadas usam um segundo
+cliente em json_mode com orçamento de tokens proporcional, e cada chamada
+passa em `format` o JSON schema de polarity.packing ({"labels": [...]}
+com enum dos rótulos), que o servidor converte em gramática.
+
+Para o servidor reaproveitar o KV cache do prefixo comum (instrução de
+sistema + prompt de persona), o modelo fica carregado com `keep_alive`
+e o runner agenda as requisições agrupadas por prompt (prefix_cache).
+Com num_ctx="auto" o contexto é dimensionado pela maior requisição da
+varredura (ver `prepare`).
+
+Todos os clientes LlamaIndex do backend compartilham o mesmo par
+ollama.Client/AsyncClient, sobre o pool de conexões de polarity.pool,
+passado nos kwargs `client`/`async_client` do `Ollama`, ao lado de
+`keep_alive`. Isso e o `format` por chamada exigem llama-index-llms-ollama
+>= 0.5.0; versões anteriores são recusadas na criação do backend, em vez
+de ignorarem o pool ou o schema.
+
+Requisições com rótulos e sem n_items (--decoding label) vão direto ao
+ollama.Client, com `format` = JSON schema enum dos rótulos (o servidor o
+converte em gramática) e logprobs quando o cliente e o servidor os
+oferecem (ollama >= 0.12.11).
+
+O health check (`health`) usa /api/show: a impressão digital do modelo
+(detalhes, parâmetros e template) permite ao polarity.backends.balancer
+recusar servidores com outra versão do modelo.
+"""
+import hashlib, inspect, json, re
+from importlib.metadata import version
+
+from llama_index.core.llms import ChatMessage
+from llama_index.llms.ollama import Ollama
+from ollama import AsyncClient, Client
+
+from polarity.backends.base import Backend
+from polarity.decoding import LABEL_TOKENS, label_confidence, label_response
+from polarity.packing import json_schema
+from polarity.pool import HttpPool
+from polarity.ratelimit import estimate_tokens
+
+TEMPERATURE = 0
+OPTIONS     = {"top_p": 0.95, "num_predict": 20}
+CTX_STEP    = 256   # num_ctx="auto" arredonda para múltiplos disto
+MIN_LLAMA_INDEX = (0, 5, 0)   # llama-index-llms-ollama: client/async_client/keep_alive, format por chamada
+
+
+def record_usage(raw, span):
+    """Tokens e durações (ns) da resposta do /api/chat no span de trace."""
+    if span is None or raw is None:
+        return
+    get = raw.get if isinstance(raw, dict) else (lambda k: getattr(raw, k, None))
+    ms = lambda k: (get(k) or 0) / 1e6
+    span["tokens_in"] += get("prompt_eval_count") or 0
+    span["tokens_out"] += get("eval_count") or 0
+    span["prefill_ms"] = span.get("prefill_ms", 0.0) + ms("prompt_eval_duration")
+    span["decode_ms"] = span.get("decode_ms", 0.0) + ms("eval_duration")
+    span["first_byte_ms"] = ms("load_duration") + ms("prompt_eval_duration")
+
+
+def fingerprint(show):
+    """Impressão digital curta de uma resposta do /api/show."""
+    info = show.model_dump() if hasattr(show, "model_dump") else dict(show)
+    key = {k: info.get(k) for k in ("details", "parameters", "template")}
+    return hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:12]
+
+
+def _steps(logprobs):
+    """[(token, logprob, [(token, logprob)])] do campo logprobs do /api/chat."""
+    get = lambda o, k: o.get(k) if isinstance(o, dict) else getattr(o, k, None)
+    return [(get(s, "token") or "", get(s, "logprob") or 0.0,
+             [(get(t, "token") or "", get(t, "logprob")) for t in get(s, "top_logprobs") or ()])
+            for s in logprobs or ()]
+
+
+class OllamaBackend(Backend):
+    name = "ollama"
+    max_concurrency = 1      # acima disso, subir OLLAMA_NUM_PARALLEL
+    json_mode = True
+    prefix_cache = True
+
+    def __init__(self, model, base_url="http://localhost:11434", timeout=120.0,
+                 keep_alive="30m", num_ctx=None, pool=None, top_logprobs=0):
+        super().__init__(model)
+        found = version("llama-index-llms-ollama")
+        if tuple(int(x) for x in re.findall(r"\d+", found)[:3]) < MIN_LLAMA_INDEX:
+            raise ImportError(f"llama-index-llms-ollama {found}: atualize para >= 0.5.0 "
+                              "(pip install -U llama-index-llms-ollama)")
+        self.base_url = base_url
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+        self.num_ctx = num_ctx       # None (padrão do modelo), int ou "auto"
+        self.top_logprobs = top_logprobs
+        # clientes ollama anteriores à 0.6.1 não aceitam logprobs
+        self._logprobs = "logprobs" in inspect.signature(Client.chat).parameters
+        self.pool = (pool or HttpPool()).sized(self.max_concurrency)
+        self._client = Client(host=base_url, timeout=timeout, **self.pool.client_args())
+        self._async_client = AsyncClient(host=base_url, timeout=timeout,
+                                         **self.pool.async_client_args())
+        self.llm = self._make_llm()
+        self._json_llms = {}
+
+    def _make_llm(self, n_items=0):
+        options = dict(OPTIONS)
+        if n_items:
+            options["num_predict"] = OPTIONS["num_predict"] * n_items
+        if isinstance(self.num_ctx, int):
+            options["num_ctx"] = self.num_ctx
+        return Ollama(
+            model=self.model,
+            base_url=self.base_url,
+            request_timeout=self.timeout,
+            temperature=TEMPERATURE,
+            json_mode=bool(n_items),
+            keep_alive=self.keep_alive,
+            additional_kwargs=options,
+            client=self._client,
+            async_client=self._async_client,
+        )
+
+    def prepare(self, system, prefixes, texts, pack_size=1):
+        """
+        Com num_ctx="auto", usa o menor múltiplo de CTX_STEP que cabe a
+        maior requisição (sistema + maior prefixo + pacote das maiores
+        manchetes + saída). Um num_ctx fixo evita recarregar o modelo.
+        """
+        if self.num_ctx != "auto":
+            return
+        longest = sorted((len(t) for t in texts), reverse=True)[:max(1, pack_size)]
+        chars = len(system) + max(len(p) for p in prefixes) + sum(longest) + 8 * pack_size
+        need = estimate_tokens("x" * chars, OPTIONS["num_predict"] * pack_size)
+        need = int(need * 1.25)   # folga: ~4 caracteres/token é só uma estimativa
+        self.use_num_ctx(-(-need // CTX_STEP) * CTX_STEP)
+        print(f"num_ctx automático: {self.num_ctx} tokens")
+
+    def use_num_ctx(self, num_ctx):
+        """Fixa num_ctx e refaz os clientes LlamaIndex."""
+        self.num_ctx = num_ctx
+        self.llm = self._make_llm()
+        self._json_llms = {}
+
+    def health(self):
+        return fingerprint(self._client.show(self.model))
+
+    async def ahealth(self):
+        return fingerprint(await self._async_client.show(self.model))
+
+    def _llm_for(self, req):
+        if not req.n_items:
+            return self.llm
+        if req.n_items not in self._json_llms:
+            self._json_llms[req.n_items] = self._make_llm(req.n_items)
+        return self._json_llms[req.n_items]
+
+    def params(self):
+        # num_ctx fica fora da chave: basta caber a requisição para a resposta ser a mesma
+        return {"temperature": TEMPERATURE, **OPTIONS}
+
+    @staticmethod
+    def _messages(req):
+        return [
+            ChatMessage(role="system", content=req.system),
+            ChatMessage(role="user", content=req.prompt),
+        ]
+
+    @staticmethod
+    def _chat_kwargs(req):
+        """Pacotes: `format` = schema do objeto {"labels": [...]}."""
+        return {"format": json_schema(req.labels)} if req.n_items and req.labels else {}
+
+    def _label_args(self, req):
+        """kwargs de Client.chat para um rótulo com decodificação restrita."""
+        options = dict(OPTIONS, temperature=TEMPERATURE, num_predict=LABEL_TOKENS)
+        if isinstance(self.num_ctx, int):
+            options["num_ctx"] = self.num_ctx
+        kwargs = dict(model=self.model, keep_alive=self.keep_alive, options=options,
+                      messages=[{"role": "system", "content": req.system},
+                                {"role": "user", "content": req.prompt}],
+                      format={"type": "string", "enum": list(req.labels)})
+        if self._logprobs and self.top_logprobs:
+            kwargs.update(logprobs=True, top_logprobs=self.top_logprobs)
+        return kwargs
+
+    @staticmethod
+    def _label(req, resp, span):
+        record_usage(resp, span)
+        content = resp.message.content.strip()
+        try:
+            label = json.loads(content)
+        except ValueError:
+            label = content.strip('"')
+        steps = _steps(getattr(resp, "logprobs", None))
+        return label_response(label, label_confidence(steps, label, req.labels))
+
+    def complete(self, req, span=None):
+        if req.labels and not req.n_items:
+            return self._label(req, self._client.chat(**self._label_args(req)), span)
+        resp = self._llm_for(req).chat(self._messages(req), **self._chat_kwargs(req))
+        record_usage(resp.raw, span)
+        return resp.message.content.strip()
+
+    async def acomplete(self, req, span=None):
+        if req.labels and not req.n_items:
+            return self._label(req, await self._async_client.chat(**self._label_args(req)), span)
+        resp = await self._llm_for(req).achat(self._messages(req), **self._chat_kwargs(req))
+        record_usage(resp.raw, span)
+        return resp.message.content.strip()
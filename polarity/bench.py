@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos scripts de classificação contra o stand-in local
+(polarity.fake_ollama), sem Ollama nem Vertex AI.
+
+Cada alvo roda como subprocesso do script real (local_models/ ou
+gemini25/) sobre as primeiras --rows linhas do CSV, apontado para um
+servidor falso novo (porta livre) com a latência, a taxa de erros e a
+taxa de 429 pedidas. Para cada alvo são registrados linhas/s, latência
+p50/p95/p99 por chamada, erros, CPU (user+sys) e pico de RSS do
+processo, mais os contadores do servidor. Com --backend mock o script
+usa o backend em processo (sem HTTP).
+
+O resultado vai para um JSON que pode servir de baseline:
+
+  python -m polarity.bench --rows 300 --latency 0.05 --out bench_base.json
+  python -m polarity.bench --rows 300 --latency 0.05 --compare bench_base.json
+
+Com --decoding label os alvos pedem a saída restrita aos rótulos; contra
+um baseline em texto livre, a comparação mostra o ganho por linha. Com
+--endpoints N os alvos Ollama recebem N servidores falsos (--endpoints)
+e o resultado traz as requisições atendidas por cada um.
+"""
+import argparse, datetime, json, os, platform, subprocess, sys, tempfile, threading
+from pathlib import Path
+
+import pandas as pd
+
+from polarity.fake_ollama import DISTRIBUTIONS, serve
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# alvo → (script, prompts, backend real)
+TARGETS = {
+    "local_opprisk":  ("local_models/classify_opprisk.py", "prompts_opprisk.json", "ollama"),
+    "local_posneg":   ("local_models/classify_posneg.py",  "prompts_posneg.json",  "ollama"),
+    "gemini_opprisk": ("gemini25/gemini_opprisk.py",       "prompts_opprisk.json", "gemini"),
+    "gemini_posneg":  ("gemini25/gemini_posneg.py",        "prompts_posneg.json",  "gemini"),
+}
+
+# métrica → sentido (+1: maior é melhor, -1: menor é melhor)
+COMPARED = {
+    "rows_per_s": +1,
+    "p50_ms": -1, "p95_ms": -1, "p99_ms": -1,
+    "cpu_s": -1, "peak_rss_mb": -1,
+}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_target(name, args, input_csv, work_dir):
+    """Roda um alvo e devolve o dicionário de medidas."""
+    script, prompts, real = TARGETS[name]
+    out_dir = work_dir / name
+    stats_path = work_dir / f"{name}_stats.json"
+    cmd = [sys.executable, str(ROOT / script),
+           "--input_csv", str(input_csv), "--out_dir", str(out_dir),
+           "--prompts", str(ROOT / prompts), "--runs", str(args.runs),
+           "--pack_size", str(args.pack_size), "--stats_json", str(stats_path)]
+    if args.concurrency:
+        cmd += ["--concurrency", str(args.concurrency)]
+    if real == "gemini":
+        cmd += ["--rpm", str(args.rpm)]
+        if args.gemini_mode == "batch":
+            cmd += ["--mode", "batch", "--batch_poll", "0.1"]
+        if args.context_cache:
+            cmd += ["--context_cache"]
+    if args.schedule:
+        cmd += ["--schedule", args.schedule]
+    if args.decoding != "free":
+        cmd += ["--decoding", args.decoding]
+
+    srvs = []
+    if args.backend == "mock":
+        cmd += ["--backend", "mock", "--mock_latency", str(args.latency)]
+    else:
+        for i in range(args.endpoints if real == "ollama" else 1):
+            srv = serve(port=0, latency=args.latency, dist=args.dist,
+                        error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+                        seed=args.seed + i, prefill_ms=args.prefill_ms)
+            threading.Thread(target=srv.serve_forever, daemon=True).start()
+            srvs.append(srv)
+        urls = [f"http://127.0.0.1:{srv.server_address[1]}" for srv in srvs]
+        cmd += ["--backend", real] + (["--endpoints", *urls] if len(urls) > 1
+                                      else ["--base_url", urls[0]])
+
+    log_path = work_dir / f"{name}.log"
+    try:
+        with open(log_path, "w", encoding="utf-8") as log:
+            proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, cwd=work_dir)
+            _, status, usage = os.wait4(proc.pid, 0)   # rusage só deste processo
+            proc.returncode = os.waitstatus_to_exitcode(status)
+    finally:
+        server_stats = [srv.state.as_dict() for srv in srvs]
+        for srv in srvs:
+            srv.shutdown()
+            srv.server_close()
+    if proc.returncode != 0:
+        tail = log_path.read_text(encoding="utf-8").splitlines()[-5:]
+        raise RuntimeError(f"{name} terminou com código {proc.returncode}:\n" + "\n".join(tail))
+
+    stats = json.loads(stats_path.read_text(encoding="utf-8"))
+    stats["cpu_s"] = usage.ru_utime + usage.ru_stime
+    stats["peak_rss_mb"] = usage.ru_maxrss / 1024   # Linux: KiB
+    if server_stats:
+        stats["server"] = server_stats[0] if len(server_stats) == 1 else server_stats
+    return stats
+
+
+def compare(baseline, current, tolerance):
+    """Imprime a variação por alvo/métrica e devolve a lista de regressões."""
+    regressions = []
+    for name, cur in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            print(f"{name}: sem baseline")
+            continue
+        print(f"\n{name} (baseline {baseline.get('commit') or '?'} → {current.get('commit') or '?'})")
+        for metric, sense in COMPARED.items():
+            b, c = base.get(metric), cur.get(metric)
+            if not b or c is None:
+                continue
+            delta = (c - b) / b
+            worse = -sense * delta > tolerance
+            flag = "  ✗ regressão" if worse else ""
+            print(f"  {metric:<12} {b:>10.2f} → {c:>10.2f}  ({delta:+.1%}){flag}")
+            if worse:
+                regressions.append((name, metric, delta))
+    return regressions
+
+
+def main(args):
+    df = pd.read_csv(args.input_csv)
+    if args.rows:
+        df = df.head(args.rows)
+    targets = args.targets or list(TARGETS)
+
+    with tempfile.TemporaryDirectory(prefix="polarity_bench_") as tmp:
+        work_dir = Path(args.keep_dir or tmp)
+        work_dir.mkdir(parents=True, exist_ok=True)
+        input_csv = work_dir / Path(args.input_csv).name
+        df.to_csv(input_csv, index=False)
+
+        results = {}
+        for name in targets:
+            print(f"# {name} ...", flush=True)
+            r = results[name] = run_target(name, args, input_csv, work_dir)
+            print(f"  {r['rows']} linhas em {r['wall_s']:.2f}s → {r['rows_per_s']:.1f} linhas/s, "
+                  f"p50={r['p50_ms']:.0f}ms p95={r['p95_ms']:.0f}ms p99={r['p99_ms']:.0f}ms, "
+                  f"erros={r['errors']}, cpu={r['cpu_s']:.2f}s, rss={r['peak_rss_mb']:.0f}MB")
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "keep_dir")},
+        "results": results,
+    }
+    Path(args.out).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"\n✔ resultados em {args.out}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(baseline, report, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regressões acima de {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark dos runners contra um LLM falso local")
+    ap.add_argument("--targets", nargs="+", choices=list(TARGETS), default=None,
+                    help="alvos a medir (padrão: todos)")
+    ap.add_argument("--backend", choices=("server", "mock"), default="server",
+                    help="server: backend real contra o stand-in HTTP; mock: backend em processo")
+    ap.add_argument("--input_csv", default=str(ROOT / "ML-ESG-2_English_Train_formatted.csv"))
+    ap.add_argument("--rows", type=int, default=200, help="linhas do CSV usadas (0 = todas)")
+    ap.add_argument("--runs", type=int, default=1)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--pack_size", type=int, default=1)
+    ap.add_argument("--rpm", type=float, default=60000, help="teto de RPM dos alvos Gemini")
+    ap.add_argument("--latency", type=float, default=0.05, help="latência média simulada (s)")
+    ap.add_argument("--dist", choices=DISTRIBUTIONS, default="lognormal")
+    ap.add_argument("--error_rate", type=float, default=0.0, help="fração de HTTP 500")
+    ap.add_argument("--throttle_rate", type=float, default=0.0, help="fração de HTTP 429")
+    ap.add_argument("--prefill_ms", type=float, default=0.0,
+                    help="prefill simulado por palavra fora do cache de prefixo (ms, Ollama)")
+    ap.add_argument("--schedule", choices=("run", "prefix"), default=None,
+                    help="repassa --schedule aos runners")
+    ap.add_argument("--endpoints", type=int, default=1,
+                    help="servidores falsos por alvo Ollama (repassa --endpoints)")
+    ap.add_argument("--decoding", choices=("free", "label"), default="free",
+                    help="repassa --decoding aos runners")
+    ap.add_argument("--gemini_mode", choices=("online", "batch"), default="online",
+                    help="--mode dos alvos gemini (batch: um job de lote no stand-in)")
+    ap.add_argument("--context_cache", action="store_true",
+                    help="repassa --context_cache aos alvos gemini")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default="bench.json", help="JSON de saída")
+    ap.add_argument("--compare", default=None, help="JSON de baseline para comparar")
+    ap.add_argument("--tolerance", type=float, default=0.10,
+                    help="piora relativa tolerada antes de acusar regressão")
+    ap.add_argument("--keep_dir", default=None, help="guarda CSVs e logs neste diretório")
+    main(ap.parse_args())
@@ -0,0 +1,146 @@
+"""
+Cache persistente (SQLite) de respostas de LLM, endereçado por conteúdo.
+
+A chave é o SHA-256 da requisição completa: backend, modelo, instrução de
+sistema, prefixo do prompt, manchete e parâmetros de decodificação (e,
+opcionalmente, o número da run). Modos:
+
+  off        não consulta nem grava
+  read       consulta, mas não grava respostas novas
+  readwrite  consulta e grava
+
+Respostas de erro ("ERROR: ..."/"Error: ...") nunca são gravadas. A
+evicção remove entradas mais antigas que `max_age_days` e, acima de
+`max_entries`, as menos acessadas recentemente (LRU).
+"""
+import hashlib, json, sqlite3, threading, time
+
+MODES = ("off", "read", "readwrite")
+
+
+def make_key(backend, model, system, prefix, text, params, run=None) -> str:
+    payload = {
+        "backend": backend, "model": model, "system": system,
+        "prefix": prefix, "text": text, "params": params,
+    }
+    if run is not None:
+        payload["run"] = run
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def is_error(response: str) -> bool:
+    return response.lower().startswith("error:")
+
+
+class ResponseCache:
+    def __init__(self, path, mode="readwrite", max_entries=None, max_age_days=None):
+        if mode not in MODES:
+            raise ValueError(f"modo de cache inválido: {mode!r} (use {MODES})")
+        self.mode = mode
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.hits = self.misses = self.writes = 0
+        self._lock = threading.Lock()
+        self._db = None
+        if mode == "off":
+            return
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, response TEXT NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_accessed ON responses(accessed)")
+        self._db.commit()
+        self.evict()
+
+    @property
+    def enabled(self):
+        return self._db is not None
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if self.mode == "readwrite":
+                self._db.execute(
+                    "UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key)
+                )
+            return row[0]
+
+    def put(self, key, response: str):
+        if self.mode != "readwrite" or is_error(response):
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            self.writes += 1
+            if self.writes % 500 == 0:
+                self._db.commit()
+
+    def evict(self):
+        if self.mode != "readwrite":
+            return
+        with self._lock:
+            if self.max_age_days is not None:
+                cutoff = time.time() - self.max_age_days * 86400
+                self._db.execute("DELETE FROM responses WHERE created < ?", (cutoff,))
+            if self.max_entries is not None:
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    " SELECT key FROM responses ORDER BY accessed DESC"
+                    " LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            self._db.commit()
+
+    def summary(self) -> str:
+        return f"cache[{self.mode}]: {self.hits} hits, {self.misses} misses, {self.writes} gravações"
+
+    def close(self):
+        if not self.enabled:
+            return
+        self.evict()
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+        self._db = None
+
+
+def add_cache_args(parser):
+    """Registra as flags de cache comuns aos quatro scripts."""
+    parser.add_argument("--cache", choices=MODES, default="off",
+                        help="cache persistente de respostas (off/read/readwrite)")
+    parser.add_argument("--cache_path", default="llm_cache.sqlite",
+                        help="arquivo SQLite do cache")
+    parser.add_argument("--cache_scope", choices=("request", "run"), default="request",
+                        help="'run' inclui o nº da run na chave (runs continuam independentes)")
+    parser.add_argument("--cache_max_entries", type=int, default=None,
+                        help="máximo de entradas (evicção LRU)")
+    parser.add_argument("--cache_max_age_days", type=float, default=None,
+                        help="idade máxima das entradas em dias")
+
+
+def open_cache(args) -> ResponseCache:
+    return ResponseCache(
+        args.cache_path, mode=args.cache,
+        max_entries=args.cache_max_entries, max_age_days=args.cache_max_age_days,
+    )
+
+
+def scoped_run(scope, run_id):
+    """Número da run a incluir na chave, conforme --cache_scope."""
+    return run_id if scope == "run" else None
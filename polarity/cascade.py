@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Cascata barata: um classificador local (TF-IDF com hashing de uni- e
+bigramas + regressão logística multinomial, em NumPy) treinado por
+prompt sobre os rótulos que os LLMs já deram nos diretórios de
+resultado. Na varredura (--cascade modelo.npz), as linhas em que o
+classificador tem confiança ≥ --cascade_threshold são respondidas
+localmente em todas as runs; só as demais vão ao LLM.
+
+O alvo de treino de cada manchete é o rótulo majoritário das runs (e
+modelos) para aquele prompt; respostas indeterminadas ou com erro não
+entram. `eval` mede, por validação cruzada, quantas chamadas seriam
+evitadas em cada limiar e a variação das métricas contra o ouro em
+relação às respostas do LLM.
+
+Exemplo:
+  python -m polarity.cascade eval  --task opprisk gemini25/train_results_gemini_opprisk
+  python -m polarity.cascade train --task opprisk gemini25/train_results_gemini_opprisk \
+         --out cascade_opprisk.npz
+  python gemini25/gemini_opprisk.py --input_csv ML-ESG-2_English_Testset_formatted.csv \
+         --cascade cascade_opprisk.npz --cascade_threshold 0.9
+"""
+import argparse, json, re, zlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from polarity.dedup import normalize
+from polarity.evaluate import CLASSES, encode, scan
+from polarity.metrics import confusion, metrics_from_confusion
+from polarity.tasks import OPPRISK, POSNEG
+
+N_FEATURES = 1 << 18
+EPOCHS     = 10
+
+TASKS = {t.name: t for t in (OPPRISK, POSNEG)}
+_WORD_RE = re.compile(r"\w+")
+
+
+def add_cascade_args(parser):
+    parser.add_argument("--cascade", default=None,
+                        help="modelo local (.npz de polarity.cascade train); responde as linhas confiantes")
+    parser.add_argument("--cascade_threshold", type=float, default=0.9,
+                        help="confiança mínima do modelo local para não consultar o LLM")
+
+
+# ----------------------------- atributos -----------------------------
+def features(text, n_features=N_FEATURES):
+    """(índices, contagens) dos uni- e bigramas de palavras, por hashing."""
+    words = _WORD_RE.findall(normalize(text))
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    idx = np.fromiter((zlib.crc32(g.encode("utf-8")) % n_features for g in grams),
+                      dtype=np.int64, count=len(grams))
+    return np.unique(idx, return_counts=True)
+
+
+def tfidf(docs, idf):
+    """Lista de (índices, pesos) com tf sublinear × idf, normalizados (L2)."""
+    out = []
+    for idx, counts in docs:
+        w = (1 + np.log(counts)) * idf[idx]
+        norm = np.linalg.norm(w)
+        out.append((idx, w / norm if norm > 0 else w))
+    return out
+
+
+def fit_idf(docs, n_features=N_FEATURES):
+    df = np.zeros(n_features, dtype=np.float64)
+    for idx, _ in docs:
+        df[idx] += 1
+    return (np.log((1 + len(docs)) / (1 + df)) + 1).astype(np.float32)
+
+
+# ------------------------------ modelo -------------------------------
+class LocalModel:
+    """Regressão logística multinomial sobre TF-IDF esparso, treinada com AdaGrad."""
+
+    def __init__(self, labels, n_features=N_FEATURES):
+        self.labels = list(labels)
+        self.n_features = n_features
+        self.W = np.zeros((n_features, len(self.labels)), dtype=np.float32)
+        self.b = np.zeros(len(self.labels), dtype=np.float32)
+        self.idf = np.ones(n_features, dtype=np.float32)
+
+    def fit(self, texts, targets, epochs=EPOCHS, lr=0.5, l2=1e-6, seed=0):
+        docs = [features(t, self.n_features) for t in texts]
+        self.idf = fit_idf(docs, self.n_features)
+        X = tfidf(docs, self.idf)
+        y = np.array([self.labels.index(t) for t in targets])
+        G = np.full_like(self.W, 1e-8)
+        Gb = np.full_like(self.b, 1e-8)
+        rng = np.random.default_rng(seed)
+        eye = np.eye(len(self.labels), dtype=np.float32)
+        for _ in range(epochs):
+            for i in rng.permutation(len(X)):
+                idx, w = X[i]
+                z = w @ self.W[idx] + self.b
+                p = np.exp(z - z.max())
+                p /= p.sum()
+                err = p - eye[y[i]]
+                g = np.outer(w, err) + l2 * self.W[idx]
+                G[idx] += g * g
+                Gb += err * err
+                self.W[idx] -= lr * g / np.sqrt(G[idx])
+                self.b -= lr * err / np.sqrt(Gb)
+        return self
+
+    def predict_proba(self, texts):
+        X = tfidf((features(t, self.n_features) for t in texts), self.idf)
+        z = np.array([w @ self.W[idx] for idx, w in X]).reshape(-1, len(self.labels)) + self.b
+        p = np.exp(z - z.max(axis=1, keepdims=True))
+        return p / p.sum(axis=1, keepdims=True)
+
+    def predict(self, texts):
+        """(rótulos, confiança) por texto."""
+        p = self.predict_proba(texts)
+        return np.array(self.labels, dtype=object)[p.argmax(axis=1)], p.max(axis=1)
+
+
+def save(path, task, models):
+    arrays = {"meta": np.array(json.dumps({"task": task, "prompts": list(models),
+                                           "labels": next(iter(models.values())).labels}))}
+    for i, m in enumerate(models.values()):
+        arrays[f"W{i}"], arrays[f"b{i}"], arrays[f"idf{i}"] = m.W, m.b, m.idf
+    np.savez_compressed(path, **arrays)
+
+
+def load(path):
+    """(tarefa, {prompt: LocalModel})."""
+    with np.load(path) as z:
+        meta = json.loads(str(z["meta"]))
+        models = {}
+        for i, prompt in enumerate(meta["prompts"]):
+            m = LocalModel(meta["labels"], z[f"W{i}"].shape[0])
+            m.W, m.b, m.idf = z[f"W{i}"], z[f"b{i}"], z[f"idf{i}"]
+            models[prompt] = m
+    return meta["task"], models
+
+
+# ----------------------------- varredura -----------------------------
+class Cascade:
+    """Modelos locais de uma tarefa carregados para a varredura."""
+
+    def __init__(self, path, threshold, task):
+        name, self.models = load(path)
+        if name != task.name:
+            raise ValueError(f"{path}: modelo da tarefa {name!r}, varredura de {task.name!r}")
+        self.threshold = threshold
+        self.local = {}
+        self.total = {}
+
+    def route(self, prompts, texts):
+        """
+        {prompt: (rótulos, confiança, máscara local)}; prompts sem modelo
+        vão inteiros ao LLM.
+        """
+        out = {}
+        for key in prompts:
+            m = self.models.get(key)
+            if m is None:
+                continue
+            labels, conf = m.predict(texts)
+            local = conf >= self.threshold
+            out[key] = (labels, conf, local)
+            self.local[key] = self.local.get(key, 0) + int(local.sum())
+            self.total[key] = self.total.get(key, 0) + len(local)
+        return out
+
+    def answer(self, prompts, texts, row_ids):
+        """
+        ({prompt: {linha: rótulo local}}, DataFrame do relatório por linha)
+        para um bloco da entrada; `row_ids` identifica as linhas no relatório.
+        """
+        local, report = {}, []
+        for key, (labels, conf, mask) in self.route(prompts, texts).items():
+            local[key] = {int(row): labels[row] for row in np.flatnonzero(mask)}
+            report.append(pd.DataFrame({
+                "row": row_ids, "prompt": key, "local_label": labels, "confidence": conf,
+                "routed": np.where(mask, "local", "llm")}))
+        return local, pd.concat(report) if report else None
+
+    def summary(self, runs):
+        lines = [f"cascata (confiança ≥ {self.threshold:g}):"]
+        for key, total in self.total.items():
+            n = self.local[key]
+            lines.append(f"  {key}: {n}/{total} linhas locais, "
+                         f"{n * runs} chamadas ao LLM evitadas ({n / max(1, total):.1%})")
+        return "\n".join(lines)
+
+
+# --------------------------- dados de treino --------------------------
+def training_rows(dirs, task):
+    """{prompt: DataFrame(text, label, target, agreement)} com o rótulo majoritário dos LLMs."""
+    canon = {l.lower(): l for l in task.labels}
+    frames = {}
+    for directory in dirs:
+        for files in scan(directory).values():
+            for (prompt, _), path in files.items():
+                df = pd.read_csv(path, usecols=["text", "label", "responseLabel"])
+                df["target"] = df["responseLabel"].astype(str).str.strip().str.lower().map(canon)
+                frames.setdefault(prompt, []).append(df.dropna(subset=["target"]))
+    out = {}
+    for prompt, parts in frames.items():
+        df = pd.concat(parts, ignore_index=True)
+        votes = df.groupby(["text", "target"]).size().rename("n").reset_index()
+        votes["share"] = votes["n"] / votes.groupby("text")["n"].transform("sum")
+        top = votes.sort_values(["text", "n"], ascending=[True, False]).drop_duplicates("text")
+        gold = df.drop_duplicates("text").set_index("text")["label"]
+        out[prompt] = pd.DataFrame({"text": top["text"].to_numpy(),
+                                    "label": gold.reindex(top["text"]).to_numpy(),
+                                    "target": top["target"].to_numpy(),
+                                    "agreement": top["share"].to_numpy()})
+    return out
+
+
+def _scores(gold, pred):
+    m = metrics_from_confusion(confusion(encode(pd.Series(gold)), encode(pd.Series(pred)),
+                                         len(CLASSES)))
+    return float(m["accuracy"]), float(m["f1_macro"])
+
+
+def cross_validate(df, labels, thresholds, folds=5, seed=0):
+    """Por limiar: fração local, métricas do LLM, da cascata e concordância local × LLM."""
+    rng = np.random.default_rng(seed)
+    fold = rng.permutation(len(df)) % folds
+    pred = np.empty(len(df), dtype=object)
+    conf = np.zeros(len(df))
+    for k in range(folds):
+        train, test = fold != k, fold == k
+        if len(set(df["target"][train])) < 2:
+            continue
+        m = LocalModel(labels).fit(df["text"][train].tolist(), df["target"][train].tolist())
+        pred[test], conf[test] = m.predict(df["text"][test].tolist())
+    gold, llm = df["label"].to_numpy(), df["target"].to_numpy()
+    base_acc, base_f1 = _scores(gold, llm)
+    rows = []
+    for t in thresholds:
+        local = conf >= t
+        mixed = np.where(local, pred, llm)
+        acc, f1 = _scores(gold, mixed)
+        rows.append({"threshold": t, "local": local.mean(),
+                     "agree_llm": (pred[local] == llm[local]).mean() if local.any() else np.nan,
+                     "accuracy_llm": base_acc, "accuracy": acc, "accuracy_delta": acc - base_acc,
+                     "f1_macro_llm": base_f1, "f1_macro": f1, "f1_macro_delta": f1 - base_f1})
+    return pd.DataFrame(rows)
+
+
+def main(args):
+    task = TASKS[args.task]
+    data = training_rows(args.dirs, task)
+    if not data:
+        raise SystemExit(f"nenhum CSV de resultado com rótulos de {task.name} em {args.dirs}")
+    if args.cmd == "eval":
+        for prompt, df in data.items():
+            res = cross_validate(df, task.labels, args.thresholds, args.folds)
+            print(f"\n{prompt} ({len(df)} manchetes, {args.folds} folds)")
+            for _, r in res.iterrows():
+                print(f"  ≥{r['threshold']:.2f}: {r['local']:6.1%} locais "
+                      f"(concordância com o LLM {r['agree_llm']:.1%}) · "
+                      f"accuracy {r['accuracy']:.4f} ({r['accuracy_delta']:+.4f}) · "
+                      f"f1_macro {r['f1_macro']:.4f} ({r['f1_macro_delta']:+.4f})")
+            if args.out_csv:
+                res.insert(0, "prompt", prompt)
+                res.to_csv(args.out_csv, mode="a", index=False,
+                           header=not Path(args.out_csv).exists())
+        return
+    models = {prompt: LocalModel(task.labels).fit(df["text"].tolist(), df["target"].tolist())
+              for prompt, df in data.items()}
+    save(args.out, task.name, models)
+    print(f"✔ {len(models)} modelos ({', '.join(f'{p}: {len(data[p])}' for p in models)}) "
+          f"salvos em {args.out}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Classificador local em cascata treinado nos rótulos dos LLMs")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name, desc in (("train", "treina e salva os modelos por prompt"),
+                       ("eval", "validação cruzada: chamadas evitadas × variação das métricas")):
+        p = sub.add_parser(name, help=desc)
+        p.add_argument("dirs", nargs="+", help="diretórios com CSVs <stem>_<prompt>_run<k>.csv")
+        p.add_argument("--task", choices=list(TASKS), required=True)
+        if name == "train":
+            p.add_argument("--out", required=True, help="arquivo .npz do modelo")
+        else:
+            p.add_argument("--thresholds", type=float, nargs="+",
+                           default=[0.6, 0.7, 0.8, 0.9, 0.95, 0.99])
+            p.add_argument("--folds", type=int, default=5)
+            p.add_argument("--out_csv", default=None, help="acrescenta a tabela a este CSV")
+    main(ap.parse_args())
@@ -0,0 +1,81 @@
+"""
+Voto majoritário (self-consistency) calculado durante a varredura.
+
+`VoteTally` mantém, por prompt, uma matriz linhas × rótulos de contagens
+atualizada a cada resposta que chega (engine, lote ou diário); respostas
+de erro não votam e linhas preenchidas pelo modo --adaptive também não.
+Ao fim sai um CSV de consenso por prompt (rótulo majoritário,
+concordância, entropia em bits e votos por rótulo) e, nas tarefas com
+métricas, as métricas do consenso contra o ouro.
+
+Com --resample_split N, as linhas com votos divididos recebem N amostras
+extras (runs além de --runs, com cache por run) que só entram no voto.
+"""
+import numpy as np
+import pandas as pd
+
+from polarity.metrics import METRICS, compute_metrics
+
+
+def add_consensus_args(parser):
+    parser.add_argument("--consensus", action="store_true",
+                        help="voto majoritário por linha entre as runs (CSV de consenso)")
+    parser.add_argument("--resample_split", type=int, default=0,
+                        help="amostras extras só para linhas com votos divididos (implica --consensus)")
+
+
+class VoteTally:
+    def __init__(self, prompts, n_rows, labels):
+        """`labels`: valores possíveis de Task.detect; o último absorve o resto."""
+        self.labels = list(labels)
+        self._index = {l: i for i, l in enumerate(self.labels)}
+        self.counts = {p: np.zeros((n_rows, len(self.labels)), dtype=np.int32) for p in prompts}
+
+    def add(self, prompt, row, label):
+        self.counts[prompt][row, self._index.get(label, len(self.labels) - 1)] += 1
+
+    def split_rows(self, prompt):
+        """Linhas com votos em mais de um rótulo."""
+        return np.flatnonzero((self.counts[prompt] > 0).sum(axis=1) > 1).tolist()
+
+    def consensus(self, prompt):
+        """
+        (rótulo, concordância, entropia, votos) por linha. Empates ficam
+        com o primeiro rótulo na ordem da tarefa; linhas sem votos, com o último.
+        """
+        c = self.counts[prompt]
+        n = c.sum(axis=1)
+        share = c / np.maximum(n, 1)[:, None]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            entropy = -np.where(share > 0, share * np.log2(share), 0.0).sum(axis=1)
+        top = np.where(n > 0, c.argmax(axis=1), len(self.labels) - 1)
+        return np.array(self.labels, dtype=object)[top], share.max(axis=1), entropy, n
+
+    def frame(self, prompt, texts, gold):
+        label, agreement, entropy, n = self.consensus(prompt)
+        df = pd.DataFrame({"text": texts, "label": gold, "responseLabel": label,
+                           "votes": n, "agreement": agreement, "entropy": entropy})
+        for i, l in enumerate(self.labels):
+            df[f"votes_{l}"] = self.counts[prompt][:, i]
+        return df
+
+
+def write_consensus(tally, out_dir, stem, texts, gold, metrics=False):
+    """Grava `<stem>_<prompt>_consensus.csv` (e as métricas do consenso); devolve o resumo."""
+    lines, rows = ["consenso por prompt:"], []
+    for prompt in tally.counts:
+        df = tally.frame(prompt, texts, gold)
+        df.to_csv(out_dir / f"{stem}_{prompt}_consensus.csv", index=False)
+        rec = {"prompt": prompt, "rows_split": len(tally.split_rows(prompt)),
+               "agreement_mean": df["agreement"].mean(), "entropy_mean": df["entropy"].mean()}
+        if metrics:
+            rec.update(compute_metrics(list(gold), df["responseLabel"].tolist()))
+        rows.append(rec)
+        extra = (f", accuracy={rec['accuracy']:.4f} f1_macro={rec['f1_macro']:.4f}"
+                 if metrics else "")
+        lines.append(f"  {prompt}: {rec['rows_split']} linhas divididas, "
+                     f"concordância média={rec['agreement_mean']:.3f}, "
+                     f"entropia média={rec['entropy_mean']:.3f} bits{extra}")
+    cols = ["prompt", "rows_split", "agreement_mean", "entropy_mean"] + (METRICS if metrics else [])
+    pd.DataFrame(rows, columns=cols).to_csv(out_dir / f"consensus_{stem}_metrics.csv", index=False)
+    return "\n".join(lines)
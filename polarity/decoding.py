@@ -0,0 +1,76 @@
+"""
+Decodificação restrita ao conjunto de rótulos (--decoding label).
+
+Em vez de até 20 tokens de texto livre interpretados depois pelo
+LabelParser, o backend pede ao servidor uma saída que só pode ser um dos
+rótulos da tarefa (Ollama: `format` com JSON schema enum, que vira uma
+gramática; Gemini: `text/x.enum` com response_schema enum), com
+orçamento de poucos tokens, e os logprobs dos tokens gerados quando o
+servidor os oferece.
+
+A resposta gravada é {"label": ..., "confidence": p}; o LabelParser já
+lê o rótulo desse JSON (regra 4), e a confiança vai para a coluna
+`confidence` dos CSVs. Ela é a probabilidade do rótulo escolhido
+renormalizada entre os rótulos no primeiro token do rótulo (com
+--top_logprobs > 0) ou, sem alternativas, o produto das probabilidades
+dos tokens gerados; null quando o servidor não devolve logprobs.
+"""
+import json, math
+
+import numpy as np
+
+LABEL_TOKENS = 8    # teto de tokens na saída restrita (a gramática encerra no fim do rótulo)
+_QUOTES      = ' \t\r\n"'
+
+
+def add_decoding_args(parser):
+    parser.add_argument("--decoding", choices=("free", "label"), default="free",
+                        help="free: texto livre interpretado depois; label: saída restrita "
+                             "aos rótulos da tarefa, com confiança por linha")
+    parser.add_argument("--top_logprobs", type=int, default=5,
+                        help="alternativas por token pedidas com --decoding label "
+                             "(0: não pede logprobs; confiança vazia)")
+
+
+def label_confidence(steps, label, labels):
+    """
+    Probabilidade do rótulo escolhido em [0, 1]; steps = [(token, logprob,
+    [(token, logprob), ...])] na ordem da saída. None sem logprobs.
+    """
+    if not steps:
+        return None
+    for token, logprob, top in steps:
+        if not token.strip(_QUOTES):
+            continue            # aspas e espaços impostos pela gramática
+        mass = dict.fromkeys(labels, 0.0)
+        for alt, lp in top or ():
+            alt = alt.strip(_QUOTES).lower()
+            hits = [l for l in labels if alt and l.lower().startswith(alt)]
+            if len(hits) == 1:
+                mass[hits[0]] += math.exp(lp)
+        total = sum(mass.values())
+        if mass.get(label):
+            return mass[label] / total
+        break
+    return math.exp(sum(lp for _, lp, _ in steps))
+
+
+def label_response(label, confidence=None) -> str:
+    """Resposta gravada no modo label (JSON lido pelo LabelParser)."""
+    if confidence is not None:
+        confidence = round(confidence, 4)
+    return json.dumps({"label": label, "confidence": confidence}, ensure_ascii=False)
+
+
+def confidence_many(responses) -> np.ndarray:
+    """Coluna de confiança (NaN onde a resposta não traz uma)."""
+    out = np.full(len(responses), np.nan)
+    for i, r in enumerate(responses):
+        if isinstance(r, str) and r.startswith('{"label"'):
+            try:
+                c = json.loads(r).get("confidence")
+            except ValueError:
+                continue
+            if c is not None:
+                out[i] = c
+    return out
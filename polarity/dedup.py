@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Deduplicação das manchetes antes do envio: uma chamada por grupo, com a
+resposta do representante (a menor linha do grupo ainda sem resposta)
+copiada para os demais membros em todas as runs e prompts.
+
+  exact: mesmo texto após normalização (NFKC, caixa, pontuação e espaços);
+  near:  além disso, MinHash sobre 5-gramas de caracteres com LSH em
+         bandas; pares candidatos com Jaccard estimado ≥ --dedup_threshold
+         são unidos (fecho transitivo, union-find).
+
+Na varredura, `--dedup exact|near`. Cada membro tem a sua linha no
+diário e a retomada consulta o diário linha a linha antes de agrupar;
+--resume vale mesmo com outro --dedup. Offline, o módulo mede quanto a
+cópia custaria nos resultados já gravados: para cada CSV
+`<stem>_<prompt>_run<k>.csv`, a fração de membros cujo rótulo difere do
+rótulo do representante na mesma run (perda de concordância).
+
+Exemplo:
+  python -m polarity.dedup ML-ESG-2_English_Train_formatted.csv --mode near \
+         --compare gemini25/train_results_gemini_opprisk local_models/train_results_qwen_opprisk
+"""
+import argparse, re, unicodedata, zlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+MERSENNE = (1 << 31) - 1
+NUM_PERM = 128
+SHINGLE  = 5
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def add_dedup_args(parser):
+    parser.add_argument("--dedup", choices=("off", "exact", "near"), default="off",
+                        help="uma chamada por grupo de manchetes iguais (exact) ou quase iguais (near)")
+    parser.add_argument("--dedup_threshold", type=float, default=0.9,
+                        help="Jaccard mínimo (5-gramas de caracteres) para --dedup near")
+
+
+def normalize(text) -> str:
+    return " ".join(_WORD_RE.findall(unicodedata.normalize("NFKC", str(text)).casefold()))
+
+
+def _bands(threshold, num_perm):
+    """(bandas, linhas por banda) com o limiar do LSH logo abaixo de `threshold`."""
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    below = [(b, r) for b, r in options if (1 / b) ** (1 / r) <= threshold]
+    return max(below, key=lambda br: (1 / br[0]) ** (1 / br[1]))
+
+
+def minhash(texts, num_perm=NUM_PERM, k=SHINGLE, seed=1):
+    """Assinaturas (N, num_perm) sobre k-gramas de caracteres dos textos normalizados."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MERSENNE, num_perm, dtype=np.uint64)
+    b = rng.integers(0, MERSENNE, num_perm, dtype=np.uint64)
+    sig = np.empty((len(texts), num_perm), dtype=np.uint64)
+    for i, t in enumerate(texts):
+        grams = {t[j:j + k] for j in range(max(1, len(t) - k + 1))}
+        h = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams),
+                        dtype=np.uint64, count=len(grams)) % np.uint64(MERSENNE)
+        sig[i] = ((a[:, None] * h[None, :] + b[:, None]) % np.uint64(MERSENNE)).min(axis=1)
+    return sig
+
+
+class _UnionFind:
+    def __init__(self, n):
+        self.parent = np.arange(n)
+
+    def find(self, x):
+        root = x
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[x] != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def union(self, x, y):
+        rx, ry = self.find(x), self.find(y)
+        if rx != ry:   # a menor linha vira a raiz (representante)
+            self.parent[max(rx, ry)] = min(rx, ry)
+
+
+def cluster(texts, mode="exact", threshold=0.9, num_perm=NUM_PERM):
+    """Representante de cada linha (array de índices); rep[i] == i nos representantes."""
+    norm = [normalize(t) for t in texts]
+    rep = pd.Series(np.arange(len(norm))).groupby(pd.Series(norm)).transform("min").to_numpy()
+    if mode != "near" or len(norm) < 2:
+        return rep
+
+    uniq = np.flatnonzero(rep == np.arange(len(rep)))
+    sig = minhash([norm[i] for i in uniq], num_perm)
+    n_bands, r = _bands(threshold, num_perm)
+    uf = _UnionFind(len(uniq))
+    for band in range(n_bands):
+        block = sig[:, band * r:(band + 1) * r]
+        _, bucket = np.unique(block, axis=0, return_inverse=True)
+        bucket = bucket.ravel()
+        order = np.argsort(bucket, kind="stable")
+        bounds = np.flatnonzero(np.diff(bucket[order])) + 1
+        for group in np.split(order, bounds):
+            for j, x in enumerate(group[:-1]):
+                rest = group[j + 1:]
+                sim = (sig[rest] == sig[x]).mean(axis=1)
+                for y in rest[sim >= threshold]:
+                    uf.union(x, y)
+    root = np.array([uf.find(i) for i in range(len(uniq))])
+    near = uniq[root]                  # representante de cada texto único
+    return near[np.searchsorted(uniq, rep)]
+
+
+class Dedup:
+    """Agrupamento das linhas de um bloco de entrada."""
+
+    def __init__(self, texts, mode="exact", threshold=0.9):
+        self.mode = mode
+        self.threshold = threshold
+        self.rep = cluster(list(texts), mode, threshold)
+
+    @property
+    def n_rows(self):
+        return len(self.rep)
+
+    @property
+    def n_reps(self):
+        return int((self.rep == np.arange(len(self.rep))).sum())
+
+    def groups(self):
+        """{representante: [linhas]} dos grupos com mais de uma linha."""
+        s = pd.Series(np.arange(len(self.rep))).groupby(self.rep).apply(list)
+        return {int(k): v for k, v in s.items() if len(v) > 1}
+
+    def summary(self):
+        groups = self.groups()
+        members = sum(len(v) - 1 for v in groups.values())
+        limit = f", J≥{self.threshold:g}" if self.mode == "near" else ""
+        return (f"dedup ({self.mode}{limit}): {self.n_rows} linhas → {self.n_reps} representantes "
+                f"({members} cópias em {len(groups)} grupos, "
+                f"-{members / max(1, self.n_rows):.1%} chamadas)")
+
+
+def agreement_loss(dedup, labels):
+    """Fração dos membros (não representantes) com rótulo diferente do representante."""
+    labels = np.asarray(labels, dtype=object)
+    members = np.flatnonzero(dedup.rep != np.arange(len(dedup.rep)))
+    if not len(members):
+        return 0.0
+    return float((labels[members] != labels[dedup.rep[members]]).mean())
+
+
+def main(args):
+    from polarity.evaluate import scan
+
+    df = pd.read_csv(args.input_csv)
+    dedup = Dedup(df["text"], args.mode, args.threshold)
+    print(dedup.summary())
+    for rep, rows in list(dedup.groups().items())[:args.show]:
+        print(f"\n  grupo de {len(rows)} (linha {rep}):")
+        for row in rows[:3]:
+            print(f"    [{row}] {str(df['text'].iat[row])[:110]}")
+
+    stem = Path(args.input_csv).stem
+    for directory in args.compare:
+        files = scan(directory).get(stem, {})
+        if not files:
+            print(f"\n{directory}: nenhum CSV de {stem}")
+            continue
+        rows = []
+        for (prompt, run), path in sorted(files.items()):
+            labels = pd.read_csv(path)["responseLabel"].astype(str).str.lower()
+            if len(labels) != dedup.n_rows:
+                continue
+            rows.append({"prompt": prompt, "run": run, "loss": agreement_loss(dedup, labels)})
+        if not rows:
+            continue
+        res = pd.DataFrame(rows).groupby("prompt")["loss"].agg(["mean", "max"])
+        print(f"\n{directory}: perda de concordância dos membros ({len(rows)} CSVs)")
+        for prompt, r in res.iterrows():
+            print(f"  {prompt}: média={r['mean']:.2%} máx={r['max']:.2%}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Grupos de manchetes duplicadas e perda de concordância")
+    ap.add_argument("input_csv", help="CSV com a coluna text")
+    ap.add_argument("--mode", choices=("exact", "near"), default="near")
+    ap.add_argument("--threshold", type=float, default=0.9, help="Jaccard mínimo para near")
+    ap.add_argument("--compare", nargs="*", default=[],
+                    help="diretórios de resultado (<stem>_<prompt>_run<k>.csv) para medir a perda")
+    ap.add_argument("--show", type=int, default=5, help="quantos grupos exibir")
+    main(ap.parse_args())
@@ -0,0 +1,162 @@
+"""
+Entrega dos resultados de uma varredura.
+
+`Delivery` recebe cada resposta (do diário, do modelo local da cascata
+ou do despacho), copia a resposta enviada para os demais membros do
+grupo (--dedup), grava no diário o que chegou agora (uma linha por
+membro), conta o voto (--consensus) e passa as runs regulares ao
+ResultSink.
+
+`CellWriter` grava cada célula (run, prompt) completa: CSV, datasets
+colunares, métricas e o estado do --adaptive.
+"""
+import gc
+
+import pandas as pd
+
+from polarity.cache import is_error
+from polarity.decoding import confidence_many
+from polarity.metrics import compute_metrics
+from polarity.stream import StreamMetrics
+
+
+class CellWriter:
+    def __init__(self, args, task, stem, out_dir, *, stores, pack_report, tracker,
+                 run_stats, metrics_on, partial):
+        self.args = args
+        self.task = task
+        self.stem = stem
+        self.out_dir = out_dir
+        self.stores = stores
+        self.pack_report = pack_report
+        self.tracker = tracker
+        self.run_stats = run_stats
+        self.metrics_on = metrics_on
+        self.partial = partial
+        self.constrained = args.decoding == "label"
+        self.df = self.gold = None
+        self.run_metrics = []
+        self.stream_metrics = StreamMetrics()
+        self.written = set()   # CSVs já abertos nesta execução (com --stream, os blocos seguintes acrescentam)
+
+    def start_chunk(self, df, gold):
+        self.df, self.gold = df, gold
+
+    def save_cell(self, run_id, key, responses):
+        args, df = self.args, self.df
+        preds = self.task.detect_many(responses)
+        csv_name = f"{self.stem}_{key}_run{run_id}.csv"
+        if "csv" in args.output:
+            frame = pd.DataFrame(
+                {"text": df["text"], "label": self.gold,
+                 "response": responses, "responseLabel": preds}
+            )
+            if self.constrained:
+                frame["confidence"] = confidence_many(responses)
+            if self.partial:
+                frame.insert(0, "row", df["row"])
+            first = csv_name not in self.written
+            self.written.add(csv_name)
+            frame.to_csv(self.out_dir / csv_name, index=False, mode="w" if first else "a",
+                         header=first)
+        for st in self.stores:
+            st.write_cell(key, run_id, responses, preds)
+        if not args.stream:
+            print(f"--> run {run_id} · {key}")
+        self.pack_report.compare(csv_name, preds)
+
+        m = None
+        if self.metrics_on and args.stream:
+            self.stream_metrics.add(key, run_id, self.gold, preds)
+        elif self.metrics_on:
+            m = compute_metrics(self.gold, preds)
+            m["prompt"] = key
+            m["run"]    = run_id
+            self.run_metrics.append(m)
+        if self.tracker is not None:
+            self.tracker.update(key, responses, preds, m and m[args.ci_metric])
+        gc.collect()
+
+    def run_done(self, run_id):
+        if self.args.stream:   # a run só termina no último bloco
+            return
+        self.run_stats[run_id].stop()
+        print(f"=== RUN {run_id}/{self.args.runs}: {self.run_stats[run_id].summary()}")
+
+    def finish(self):
+        """Métricas por (prompt, run) da varredura inteira."""
+        if self.args.stream:
+            for run_id in range(1, self.args.runs + 1):
+                self.run_stats[run_id].stop()
+                print(f"=== RUN {run_id}/{self.args.runs}: {self.run_stats[run_id].summary()}")
+            return self.stream_metrics.rows()
+        return self.run_metrics
+
+
+class Delivery:
+    def __init__(self, journal, task, runs, tally=None):
+        self.journal = journal
+        self.task = task
+        self.runs = runs
+        self.tally = tally
+        self.texts = self.sink = self.dedup = None
+        self.fanout = {}    # (run, prompt, representante) → linhas que recebem a resposta (--dedup)
+        self.n_copied = 0
+
+    def start_chunk(self, texts, sink, dedup=None):
+        self.texts, self.sink, self.dedup = texts, sink, dedup
+
+    def collapse(self, round_jobs):
+        """
+        Um job por (run, prompt, grupo do --dedup): o primeiro membro do
+        grupo na rodada responde por todos.
+        """
+        if self.dedup is None:
+            return round_jobs
+        out, lead = [], {}
+        for j in round_jobs:
+            group = (j.run, j.prompt, int(self.dedup.rep[j.row]))
+            if group not in lead:
+                lead[group] = j.row
+                self.fanout[(j.run, j.prompt, j.row)] = []
+                out.append(j)
+            self.fanout[(j.run, j.prompt, lead[group])].append(j.row)
+        return out
+
+    def deliver(self, job, resp, fresh=False):
+        """
+        Resposta obtida (não preenchida): entra no voto e, nas runs
+        regulares, no sink; `fresh` (recém-chegada) grava no diário cada
+        linha que a recebe, membros do --dedup inclusive.
+        """
+        rows = [job.row]
+        if self.dedup is not None:
+            rows = self.fanout.pop((job.run, job.prompt, job.row), rows)
+            self.n_copied += len(rows) - 1
+        for row in rows:
+            j = job if row == job.row else job._replace(row=row, text=self.texts.iat[row])
+            if fresh:
+                self.journal.write(j, resp)
+            if self.tally is not None and not is_error(resp):
+                self.tally.add(j.prompt, j.row, self.task.detect(resp))
+            if j.run <= self.runs:
+                self.sink.add(j, resp)
+
+    def received(self, job, resp):
+        """Resposta recém-chegada do despacho."""
+        self.deliver(job, resp, fresh=True)
+
+    def drain(self, round_jobs, dispatch):
+        """
+        Entrega o que o diário já tem, linha a linha (vale mesmo se o
+        --dedup mudou desde a gravação), agrupa o resto e passa a
+        `dispatch(jobs, on_result)`; devolve os jobs despachados.
+        """
+        pending, finished = self.journal.split(round_jobs)
+        if finished:
+            print(f"retomando: {len(finished)} respostas recuperadas do diário")
+        for job, resp in finished:
+            self.deliver(job, resp)
+        pending = self.collapse(pending)
+        dispatch(pending, self.received)
+        return pending
@@ -0,0 +1,211 @@
+"""
+Despacho dos jobs pendentes de uma varredura: cache de respostas, limite
+de taxa, empacotamento (--pack_size) e execução pelo AsyncEngine ou, com
+--mode batch, num job de lote do backend (`complete_batch`).
+
+Cada resultado volta por `on_result(job, resposta)`, na ordem de chegada;
+falhas definitivas chegam como "ERROR: ...", uma por job do pacote.
+"""
+import asyncio, time
+
+from polarity.backends import Request
+from polarity.cache import make_key, scoped_run, is_error
+from polarity.packing import pack_jobs, pack_prompt, unpack_response
+from polarity.ratelimit import call_with_retries, estimate_tokens
+
+OUT_TOKENS = 20   # orçamento de saída por rótulo (estimativa de TPM)
+
+
+class Dispatcher:
+    def __init__(self, args, backend, engine, task, system, *, cache, limiter, params,
+                 decode_labels, pack_size, pack_report, tracer, run_stats, sweep_stats,
+                 batch_path=None):
+        self.args = args
+        self.backend = backend
+        self.engine = engine
+        self.task = task
+        self.system = system
+        self.cache = cache
+        self.limiter = limiter
+        self.params = params
+        self.decode_labels = decode_labels
+        self.pack_size = pack_size
+        self.pack_report = pack_report
+        self.tracer = tracer
+        self.run_stats = run_stats
+        self.sweep_stats = sweep_stats
+        self.batch_path = batch_path     # com --mode batch: prefixo dos JSONL de lote
+        self.n_sent = self.n_calls = self.n_errors = 0
+
+    # --------------------------- requisições --------------------------
+    def cache_run(self, run):
+        # amostras extras (--resample_split) precisam de chave própria por run
+        return scoped_run("run" if run > self.args.runs else self.args.cache_scope, run)
+
+    def cache_key(self, prefix, text, params, run):
+        if not self.cache.enabled:
+            return None
+        return make_key(self.backend.name, self.backend.model, self.system, prefix, text, params, run)
+
+    def request(self, pack, run):
+        """(chave de cache, requisição) de um pacote (ou de um job isolado)."""
+        if len(pack) == 1:
+            job = pack[0]
+            return (self.cache_key(job.prefix, job.text, self.params, run),
+                    Request(self.system, job.prefix + job.text, self.decode_labels))
+        texts, prefix = [j.text for j in pack], pack[0].prefix
+        return (self.cache_key(prefix, "\n".join(texts), dict(self.params, pack=len(pack)), run),
+                Request(self.system, pack_prompt(prefix, texts), self.task.labels, len(pack)))
+
+    async def _timed_send(self, req, span):
+        span["tokens_sent"] += estimate_tokens(self.system + req.prompt, 0)
+        t = time.perf_counter()
+        try:
+            return await self.backend.acomplete(req, span)
+        finally:
+            span["send_ms"] += (time.perf_counter() - t) * 1000
+
+    async def _send(self, req, span):
+        if self.limiter is None:
+            return await self._timed_send(req, span)
+        tokens = estimate_tokens(req.prompt, OUT_TOKENS * max(1, req.n_items))
+        timeout = self.args.timeout * self.backend.attempts   # por tentativa de rede
+        return await call_with_retries(lambda: self._timed_send(req, span), self.limiter,
+                                       tokens, span=span, timeout=timeout)
+
+    async def _single(self, job, run, span):
+        key, req = self.request([job], run)
+        if key is not None and (hit := self.cache.get(key)) is not None:
+            span["cache_hits"] += 1
+            return hit
+        out = await self._send(req, span)
+        if key is not None:
+            self.cache.put(key, out)
+        return out
+
+    async def _packed(self, pack, run, span):
+        """Rótulos de várias manchetes numa chamada; None onde a resposta falhar."""
+        key, req = self.request(pack, run)
+        raw = self.cache.get(key) if key is not None else None
+        if raw is not None:
+            span["cache_hits"] += 1
+        else:
+            try:
+                raw = await self._send(req, span)
+            except Exception as e:
+                span["pack_error"] = type(e).__name__
+                return [None] * len(pack)
+        labels = unpack_response(raw, len(pack), list(self.task.labels))
+        if key is not None and None not in labels:
+            self.cache.put(key, raw)
+        return labels
+
+    async def _work(self, pack):
+        run = self.cache_run(pack[0].run)
+        span = self.tracer.start(pack)
+        t = time.perf_counter()
+        try:
+            if len(pack) == 1:
+                return [await self._single(pack[0], run, span)]
+            labels = await self._packed(pack, run, span)
+            out = []
+            for job, lab in zip(pack, labels):
+                if lab is None:  # fallback: chamada individual
+                    try:
+                        lab = await self._single(job, run, span)
+                    except Exception as e:
+                        lab = f"ERROR: {e}"
+                out.append(lab)
+            self.pack_report.record(len(pack), labels.count(None))
+            return out
+        except asyncio.CancelledError:   # timeout do engine
+            span["error"] = "timeout"
+            raise
+        except Exception as e:
+            span["error"] = type(e).__name__
+            raise
+        finally:
+            dt = time.perf_counter() - t
+            self.run_stats[pack[0].run].record(dt)
+            self.sweep_stats.record(dt)
+            self.tracer.finish(span)
+
+    # ------------------------------ lote ------------------------------
+    def _batch_round(self, items, suffix):
+        """items: [(chave, requisição)] → respostas; acertos de cache não vão para o lote."""
+        out = [self.cache.get(key) if key is not None else None for key, _ in items]
+        todo = [i for i, hit in enumerate(out) if hit is None]
+        if todo:
+            path = self.batch_path.with_name(f"{self.batch_path.name}{suffix}.jsonl")
+            responses = self.backend.complete_batch([items[i][1] for i in todo], path=path)
+            for i, resp in zip(todo, responses):
+                out[i] = resp
+        return out, set(todo)
+
+    def _run_batch(self, packs, on_pack):
+        """
+        --mode batch: um job com todas as chamadas pendentes; posições
+        inválidas dos pacotes voltam num segundo job de chamadas isoladas.
+        A latência de cada pacote vai da submissão do lote ao seu resultado.
+        """
+        spans = [self.tracer.start(pack) for pack in packs]
+        t = time.perf_counter()
+        items = [self.request(pack, self.cache_run(pack[0].run)) for pack in packs]
+        raws, fresh = self._batch_round(items, "")
+        first = time.perf_counter()
+        results, retry, done = {}, [], {}
+        for idx, (pack, raw) in enumerate(zip(packs, raws)):
+            key = items[idx][0]
+            if idx not in fresh:
+                spans[idx]["cache_hits"] += 1
+            if len(pack) == 1:
+                if idx in fresh and key is not None:
+                    self.cache.put(key, raw)
+                results[idx], done[idx] = [raw], first
+                continue
+            labels = unpack_response(raw, len(pack), list(self.task.labels))
+            self.pack_report.record(len(pack), labels.count(None))
+            if idx in fresh and key is not None and None not in labels:
+                self.cache.put(key, raw)
+            results[idx], done[idx] = labels, first
+            run = self.cache_run(pack[0].run)
+            retry += [(idx, pos, self.request([job], run))
+                      for pos, (job, lab) in enumerate(zip(pack, labels)) if lab is None]
+        if retry:
+            print(f"lote: {len(retry)} manchetes de pacotes inválidos refeitas individualmente")
+            raws, fresh = self._batch_round([item for _, _, item in retry], "_retry")
+            now = time.perf_counter()
+            for i, ((idx, pos, (key, _)), raw) in enumerate(zip(retry, raws)):
+                if i in fresh and key is not None:
+                    self.cache.put(key, raw)
+                results[idx][pos], done[idx] = raw, now
+        for idx, pack in enumerate(packs):
+            dt = done[idx] - t
+            spans[idx]["send_ms"] = dt * 1000
+            self.run_stats[pack[0].run].record(dt)
+            self.sweep_stats.record(dt)
+            self.tracer.finish(spans[idx])
+            on_pack(idx, results[idx])
+
+    # ----------------------------- rodada -----------------------------
+    def run(self, jobs, on_result):
+        """Executa `jobs` (uma rodada) e entrega cada resposta a `on_result(job, resposta)`."""
+        packs = pack_jobs(jobs, self.pack_size)
+
+        def on_pack(idx, results):
+            pack = packs[idx]
+            if isinstance(results, str):  # erro definitivo do engine vale para o pacote
+                results = [results] * len(pack)
+            errs = sum(map(is_error, results))
+            self.n_errors += errs
+            self.tracer.advance(len(pack), errs)
+            for job, resp in zip(pack, results):
+                on_result(job, resp)
+
+        if self.batch_path is not None:
+            self._run_batch(packs, on_pack)
+        else:
+            self.tracer.enqueue(packs)
+            self.engine.map(self._work, packs, on_result=on_pack)
+        self.n_sent += len(jobs)
+        self.n_calls += len(packs)
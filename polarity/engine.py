@@ -0,0 +1,59 @@
+"""
+Motor de execução concorrente para chamadas assíncronas a LLMs.
+
+Mantém um único event loop durante toda a varredura (os clientes httpx
+do Ollama ficam presos ao loop em que foram criados) e executa as
+corrotinas com no máximo `concurrency` requisições em voo, timeout por
+requisição e retentativas com backoff exponencial. A ordem do resultado
+é sempre a ordem da entrada.
+"""
+import asyncio
+
+
+class AsyncEngine:
+    def __init__(self, concurrency=1, timeout=120.0, retries=2, backoff=1.0):
+        self.concurrency = max(1, int(concurrency))
+        self.timeout = timeout
+        self.retries = max(0, int(retries))
+        self.backoff = backoff
+        self.loop = asyncio.new_event_loop()
+
+    async def call(self, coro_fn, item):
+        """`coro_fn(item)` com timeout e retentativas; falha definitiva vira "ERROR: ..."."""
+        for attempt in range(self.retries + 1):
+            try:
+                return await asyncio.wait_for(coro_fn(item), self.timeout)
+            except Exception as e:
+                err = e
+                if attempt < self.retries:
+                    await asyncio.sleep(self.backoff * 2 ** attempt)
+        if isinstance(err, asyncio.TimeoutError):
+            return f"ERROR: timeout após {self.timeout}s"
+        return f"ERROR: {err}"
+
+    async def _drain(self, coro_fn, items, on_result):
+        results = [None] * len(items)
+        queue = iter(enumerate(items))
+
+        async def worker():
+            # cada worker puxa o próximo item assim que termina o anterior
+            for idx, item in queue:
+                results[idx] = await self.call(coro_fn, item)
+                if on_result is not None:
+                    on_result(idx, results[idx])
+
+        n = min(self.concurrency, len(items))
+        await asyncio.gather(*(worker() for _ in range(n)))
+        return results
+
+    def map(self, coro_fn, items, on_result=None):
+        """
+        Aplica `coro_fn` (função async) a cada item e devolve a lista de
+        resultados na mesma ordem. Falhas definitivas viram "ERROR: ...".
+        `on_result(idx, resultado)` é chamado à medida que cada item termina.
+        """
+        return self.loop.run_until_complete(self._drain(coro_fn, list(items), on_result))
+
+    def close(self):
+        self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+        self.loop.close()
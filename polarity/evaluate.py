@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Recalcula métricas offline a partir dos CSVs de resultado já gerados,
+sem chamar nenhum LLM.
+
+Varre diretórios como gemini25/train_results_gemini_posneg ou
+local_models/test_results_qwen_opprisk, interpreta os nomes
+`<stem>_<prompt>_run<k>.csv`, monta um único tensor de matrizes de
+confusão (run × prompt × classe × classe) com NumPy e calcula accuracy e
+precision/recall/F1 (micro, macro, weighted) por run, média, desvio
+padrão e IC por bootstrap (reamostrando manchetes).
+
+As respostas de sentimento são mapeadas para o rótulo-ouro
+(Positive → Opportunity, Negative → Risk); qualquer outra coisa, "error"
+inclusive, é "undetermined" (o mesmo mapeamento da varredura,
+polarity.labels.scored). As médias seguem o sklearn: macro sobre as classes
+presentes no ouro ou na predição, weighted pelo suporte.
+
+Exemplo:
+  python -m polarity.evaluate gemini25/train_results_gemini_posneg \
+         local_models/test_results_qwen_opprisk --bootstrap 1000
+"""
+import argparse, re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from polarity.labels import SCORED, UNDETERMINED
+from polarity.metrics import METRICS, confusion, metrics_from_confusion
+
+CLASSES   = ["Risk", "Opportunity", UNDETERMINED]
+LABEL_MAP = {
+    "risk": 0, "opportunity": 1,
+    "negative": 0, "positive": 1,
+}
+UNDET = 2
+
+FILE_RE = re.compile(r"^(?P<stem>.+?)_(?P<prompt>prompt_.+)_run(?P<run>\d+)\.csv$")
+
+
+def encode(series) -> np.ndarray:
+    low = series.astype(str).str.strip().str.lower().replace(SCORED)
+    return low.map(LABEL_MAP).fillna(UNDET).to_numpy(dtype=np.int64)
+
+
+def scan(directory):
+    """{stem: {(prompt, run): Path}} para os CSVs de resultado do diretório."""
+    found = {}
+    for path in sorted(Path(directory).glob("*_run*.csv")):
+        m = FILE_RE.match(path.name)
+        if m:
+            found.setdefault(m["stem"], {})[(m["prompt"], int(m["run"]))] = path
+    return found
+
+
+def load(files):
+    """
+    Lê os CSVs de um stem e devolve (prompts, runs, y_true, y_pred, present),
+    com y_* de forma (R, P, N) e present (R, P) marcando as células existentes.
+    """
+    prompts = sorted({p for p, _ in files})
+    runs    = sorted({r for _, r in files})
+    cells   = {k: pd.read_csv(v, usecols=["label", "responseLabel"]) for k, v in files.items()}
+    n = max(len(df) for df in cells.values())
+    y_true  = np.full((len(runs), len(prompts), n), UNDET, dtype=np.int64)
+    y_pred  = np.full_like(y_true, UNDET)
+    present = np.zeros((len(runs), len(prompts)), dtype=bool)
+    for (p, r), df in cells.items():
+        if len(df) != n:
+            print(f"  ! {files[(p, r)].name}: {len(df)} linhas (esperado {n}), ignorado")
+            continue
+        ri, pi = runs.index(r), prompts.index(p)
+        y_true[ri, pi] = encode(df["label"])
+        y_pred[ri, pi] = encode(df["responseLabel"])
+        present[ri, pi] = True
+    return prompts, runs, y_true, y_pred, present
+
+
+def bootstrap_ci(y_true, y_pred, present, n_boot, alpha, rng):
+    """
+    IC (1-alpha) da média entre runs de cada métrica, por prompt,
+    reamostrando manchetes com reposição (mesmos índices para todas as runs).
+    Devolve {métrica: array (P, 2)}.
+    """
+    R, P, N = y_true.shape
+    ci = {k: np.full((P, 2), np.nan) for k in METRICS}
+    if n_boot <= 0:
+        return ci
+    idx = rng.integers(0, N, size=(n_boot, N))
+    for pi in range(P):
+        runs = np.flatnonzero(present[:, pi])
+        if runs.size == 0:
+            continue
+        t = y_true[runs, pi][:, idx]       # (R', B, N)
+        p = y_pred[runs, pi][:, idx]
+        m = metrics_from_confusion(confusion(t, p, len(CLASSES)))
+        for k in METRICS:
+            dist = m[k].mean(axis=0)        # média entre runs, por amostra
+            ci[k][pi] = np.quantile(dist, [alpha / 2, 1 - alpha / 2])
+    return ci
+
+
+def evaluate_stem(prompts, runs, y_true, y_pred, present, n_boot=1000, alpha=0.05, seed=0):
+    """Devolve (DataFrame por run, DataFrame resumo por prompt)."""
+    m = metrics_from_confusion(confusion(y_true, y_pred, len(CLASSES)))   # cada (R, P)
+
+    rows = []
+    for ri, r in enumerate(runs):
+        for pi, p in enumerate(prompts):
+            if present[ri, pi]:
+                rows.append({"prompt": p, "run": r, **{k: m[k][ri, pi] for k in METRICS}})
+    per_run = pd.DataFrame(rows)
+
+    ci = bootstrap_ci(y_true, y_pred, present, n_boot, alpha, np.random.default_rng(seed))
+    summary = []
+    for pi, p in enumerate(prompts):
+        mask = present[:, pi]
+        if not mask.any():
+            continue
+        rec = {"prompt": p, "runs": int(mask.sum())}
+        for k in METRICS:
+            vals = m[k][mask, pi]
+            rec[f"{k}_mean"] = vals.mean()
+            rec[f"{k}_std"] = vals.std(ddof=1) if vals.size > 1 else 0.0
+            rec[f"{k}_ci_low"], rec[f"{k}_ci_high"] = ci[k][pi]
+        summary.append(rec)
+    return per_run, pd.DataFrame(summary)
+
+
+def main(args):
+    for directory in args.dirs:
+        for stem, files in scan(directory).items():
+            print(f"\n# {directory} · {stem} ({len(files)} CSVs)")
+            prompts, runs, y_true, y_pred, present = load(files)
+            per_run, summary = evaluate_stem(
+                prompts, runs, y_true, y_pred, present,
+                n_boot=args.bootstrap, alpha=args.alpha, seed=args.seed,
+            )
+            out_dir = Path(args.out_dir) if args.out_dir else Path(directory)
+            out_dir.mkdir(parents=True, exist_ok=True)
+            per_run.to_csv(out_dir / f"evaluation_{stem}_runs.csv", index=False)
+            summary.to_csv(out_dir / f"evaluation_{stem}_summary.csv", index=False)
+            for _, s in summary.iterrows():
+                print(f"{s['prompt']}: accuracy={s['accuracy_mean']:.4f}±{s['accuracy_std']:.4f} "
+                      f"[{s['accuracy_ci_low']:.4f}, {s['accuracy_ci_high']:.4f}], "
+                      f"f1_macro={s['f1_macro_mean']:.4f}±{s['f1_macro_std']:.4f} "
+                      f"[{s['f1_macro_ci_low']:.4f}, {s['f1_macro_ci_high']:.4f}]")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Métricas offline sobre diretórios de resultados")
+    ap.add_argument("dirs", nargs="+", help="diretórios com CSVs <stem>_<prompt>_run<k>.csv")
+    ap.add_argument("--out_dir", default=None, help="onde salvar (padrão: o próprio diretório)")
+    ap.add_argument("--bootstrap", type=int, default=1000, help="amostras de bootstrap (0 desliga)")
+    ap.add_argument("--alpha", type=float, default=0.05, help="nível do IC (0.05 → 95%%)")
+    ap.add_argument("--seed", type=int, default=0)
+    main(ap.parse_args())
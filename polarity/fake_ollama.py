@@ -0,0 +1,373 @@
+"""
+Servidor HTTP que imita o endpoint /api/chat do Ollama e o
+generateContent do Gemini, para validar e medir os scripts de
+local_models/ e gemini25/ sem GPU nem Vertex AI.
+
+O rótulo devolvido é determinístico: o servidor extrai do prompt os
+rótulos entre aspas simples ('Risk' or 'Opportunity') e escolhe um deles
+pelo hash da manchete (o mesmo com ou sem --pack_size). GET /stats informa
+o pico de requisições simultâneas e as falhas injetadas.
+
+A latência segue uma distribuição configurável (const, uniform, exp,
+lognormal) com média --latency; --error_rate devolve HTTP 500 e
+--throttle_rate HTTP 429 (RESOURCE_EXHAUSTED) nessa fração das chamadas.
+
+No /api/chat, --prefill_ms simula o cache de prefixo do Ollama: só as
+palavras que diferem da requisição anterior pagam prefill (e entram em
+prompt_eval_count / prompt_eval_duration). O /api/show informa
+--quantization nos detalhes do modelo: servidores com valores diferentes
+simulam máquinas com outra versão do modelo (ver --endpoints).
+
+Do lado do Gemini há também cachedContents (criar/apagar; o conteúdo em
+cache é prefixado ao prompt das requisições que o referenciam) e
+batchGenerateContent com requisições inline: o job fica RUNNING por
+--latency segundos e depois SUCCEEDED, consultado em GET /batches/N.
+
+Saída restrita aos rótulos (--decoding label): `format` com JSON schema
+enum no /api/chat e `text/x.enum` no Gemini devolvem só o rótulo, com
+logprobs determinísticos (a confiança sai do hash da manchete) quando
+pedidos.
+
+Uso:
+  python -m polarity.fake_ollama --port 11435 --latency 0.2 --dist lognormal
+  python classify_opprisk.py ... --base_url http://localhost:11435 --concurrency 8
+  python gemini_opprisk.py   ... --base_url http://localhost:11435
+"""
+import argparse, hashlib, itertools, json, math, random, re, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LABEL_RE = re.compile(r"'([A-Z][A-Za-z]+)'")
+ITEM_RE = re.compile(r"^\d+\. (.*)$", re.M)
+
+DISTRIBUTIONS = ("const", "uniform", "exp", "lognormal")
+
+
+def fake_label(prompt: str, text=None) -> str:
+    labels = LABEL_RE.findall(prompt) or ["Positive", "Negative"]
+    key = text if text is not None else prompt
+    h = int(hashlib.sha1(key.encode("utf-8")).hexdigest(), 16)
+    return labels[h % len(labels)]
+
+
+def fake_answer(prompt: str, json_mode=False) -> str:
+    """Rótulo único ou, em modo JSON (--pack_size), {"labels": [...]} por item numerado."""
+    items = ITEM_RE.findall(prompt) if json_mode else []
+    if items:
+        return json.dumps({"labels": [fake_label(prompt, t) for t in items]})
+    return fake_label(prompt, prompt.rsplit(": ", 1)[-1])
+
+
+def fake_confidence(text: str) -> float:
+    """Probabilidade determinística do rótulo falso, em [0.5, 0.99]."""
+    h = int(hashlib.sha1(f"p:{text}".encode("utf-8")).hexdigest(), 16)
+    return 0.5 + (h % 50) / 100
+
+
+def fake_logprobs(prompt: str, k=5):
+    """(rótulo, [(token, logprob)] do token do rótulo: escolhido + alternativas)."""
+    text = prompt.rsplit(": ", 1)[-1]
+    label, p = fake_label(prompt, text), fake_confidence(text)
+    others = [l for l in dict.fromkeys(LABEL_RE.findall(prompt) or ["Positive", "Negative"])
+              if l != label]
+    top = [(label, math.log(p))] + [(l, math.log((1 - p) / len(others))) for l in others]
+    return label, top[:max(1, k)]
+
+
+def sample_latency(rng, mean, dist="const", sigma=0.5):
+    """Uma amostra de latência (s) com a média pedida."""
+    if mean <= 0:
+        return 0.0
+    if dist == "uniform":
+        return rng.uniform(0, 2 * mean)
+    if dist == "exp":
+        return rng.expovariate(1 / mean)
+    if dist == "lognormal":
+        return rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+    return mean
+
+
+class _State:
+    def __init__(self, latency, dist="const", error_rate=0.0, throttle_rate=0.0, seed=0,
+                 prefill_ms=0.0, quantization="Q4_K_M"):
+        self.latency = latency
+        self.quantization = quantization
+        self.prefill_ms = prefill_ms
+        self.last_prompt = []
+        self.caches = {}    # nome → texto do CachedContent
+        self.batches = {}   # nome → (instante de criação, modelo, respostas)
+        self._ids = itertools.count(1)
+        self.dist = dist
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+        self.total = 0
+        self.errors = 0
+        self.throttled = 0
+
+    def enter(self):
+        """Registra a chamada e sorteia (latência, falha: None | 429 | 500)."""
+        with self.lock:
+            self.in_flight += 1
+            self.total += 1
+            self.peak = max(self.peak, self.in_flight)
+            delay = sample_latency(self.rng, self.latency, self.dist)
+            u = self.rng.random()
+            fail = None
+            if u < self.throttle_rate:
+                fail, self.throttled = 429, self.throttled + 1
+            elif u < self.throttle_rate + self.error_rate:
+                fail, self.errors = 500, self.errors + 1
+            return delay, fail
+
+    def prefill(self, words):
+        """Tokens (palavras) fora do prefixo comum com a requisição anterior."""
+        with self.lock:
+            common = 0
+            for a, b in zip(words, self.last_prompt):
+                if a != b:
+                    break
+                common += 1
+            self.last_prompt = words
+        return max(1, len(words) - common)
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def new_name(self, kind, value):
+        with self.lock:
+            store = self.caches if kind == "cachedContents" else self.batches
+            name = f"{kind}/{next(self._ids)}"
+            store[name] = value
+        return name
+
+    def as_dict(self):
+        with self.lock:
+            return {"peak_in_flight": self.peak, "total": self.total,
+                    "errors": self.errors, "throttled": self.throttled}
+
+
+def _ollama_reply(state, req, delay, fail):
+    if fail == 429:
+        return 429, {"error": "RESOURCE_EXHAUSTED: too many requests"}
+    if fail:
+        return 500, {"error": "internal error"}
+    messages = req.get("messages", [{}])
+    prompt = messages[-1].get("content", "")
+    evaluated = state.prefill(" ".join(m.get("content", "") for m in messages).split())
+    prefill_s = evaluated * state.prefill_ms / 1000
+    time.sleep(prefill_s)
+    fmt = req.get("format")
+    extra, eval_count = {}, 1
+    if isinstance(fmt, dict) and "enum" in fmt:
+        label, top = fake_logprobs(prompt, req.get("top_logprobs") or 1)
+        content, eval_count = json.dumps(label), 3
+        if req.get("logprobs"):
+            quote = {"token": '"', "logprob": 0.0, "top_logprobs": [{"token": '"', "logprob": 0.0}]}
+            extra["logprobs"] = [quote, {"token": label, "logprob": top[0][1], "top_logprobs": [
+                {"token": t, "logprob": lp} for t, lp in top]}, quote]
+    else:
+        content = fake_answer(prompt, bool(fmt))
+    return 200, {
+        "model": req.get("model", "fake"),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "message": {"role": "assistant", "content": content},
+        "done": True,
+        "done_reason": "stop",
+        "load_duration": 0,
+        "prompt_eval_count": evaluated,
+        "prompt_eval_duration": int(prefill_s * 1e9),
+        "eval_count": eval_count,
+        "eval_duration": int(delay * 1e9),
+        "total_duration": int((prefill_s + delay) * 1e9),
+        **extra,
+    }
+
+
+def _texts(contents):
+    return " ".join(p.get("text", "") for c in contents for p in c.get("parts", []))
+
+
+def _gemini_error(code, status):
+    return code, {"error": {"code": code, "message": status.lower(), "status": status}}
+
+
+def _gemini_response(state, req):
+    """Corpo do generateContent; None se o cachedContent referenciado não existe."""
+    prompt = _texts(req.get("contents", [{}])[-1:])
+    cached = ""
+    if req.get("cachedContent"):
+        cached = state.caches.get(req["cachedContent"])
+        if cached is None:
+            return None
+        prompt = f"{cached} {prompt}"
+    # em lote, a configuração pode vir aninhada: basta achar o mime type
+    dumped = json.dumps(req)
+    candidate = {"finishReason": "STOP"}
+    if '"text/x.enum"' in dumped:
+        k = re.search(r'"logprobs": (\d+)', dumped)
+        text, top = fake_logprobs(prompt, int(k.group(1)) if k else 1)
+        if '"responseLogprobs": true' in dumped:
+            alts = [{"token": t, "logProbability": lp} for t, lp in top]
+            candidate["logprobsResult"] = {"chosenCandidates": alts[:1],
+                                           "topCandidates": [{"candidates": alts}]}
+    else:
+        text = fake_answer(prompt, '"application/json"' in dumped)
+    n_cached = len(cached.split())
+    n_prompt = len(prompt.split())
+    return {
+        "candidates": [{
+            "content": {"role": "model", "parts": [{"text": text}]},
+            **candidate,
+        }],
+        "usageMetadata": {"promptTokenCount": n_prompt,
+                          "cachedContentTokenCount": n_cached,
+                          "candidatesTokenCount": 1,
+                          "totalTokenCount": n_prompt + 1},
+        "modelVersion": "fake",
+    }
+
+
+def _gemini_reply(state, req, delay, fail):
+    if fail:
+        return _gemini_error(fail, "RESOURCE_EXHAUSTED" if fail == 429 else "INTERNAL")
+    resp = _gemini_response(state, req)
+    if resp is None:
+        return _gemini_error(404, "NOT_FOUND")
+    return 200, resp
+
+
+def _create_cache(state, req):
+    text = " ".join(filter(None, [_texts([req.get("systemInstruction", {})]),
+                                  _texts(req.get("contents", []))]))
+    name = state.new_name("cachedContents", text)
+    return 200, {"name": name, "model": req.get("model"), "displayName": req.get("displayName"),
+                 "usageMetadata": {"totalTokenCount": len(text.split())}}
+
+
+def _create_batch(state, req, model):
+    batch = req.get("batch", req)
+    items = batch.get("inputConfig", {}).get("requests", {}).get("requests", [])
+    out = []
+    for item in items:
+        resp = _gemini_response(state, item.get("request", item))
+        out.append({"response": resp} if resp is not None else
+                   {"error": {"code": 404, "message": "cachedContent not found"}})
+    name = state.new_name("batches", (time.monotonic(), model, out))
+    return 200, _batch_json(state, name)
+
+
+def _batch_json(state, name):
+    """Operation do job: RUNNING até passar --latency desde a criação."""
+    created, model, out = state.batches[name]
+    done = time.monotonic() - created >= state.latency
+    meta = {
+        "@type": "type.googleapis.com/google.ai.generativelanguage.v1beta.GenerateContentBatch",
+        "name": name, "model": model, "displayName": "polarity",
+        "state": "BATCH_STATE_SUCCEEDED" if done else "BATCH_STATE_RUNNING",
+    }
+    if done:
+        meta["output"] = {"inlinedResponses": {"inlinedResponses": out}}
+    return {"name": name, "metadata": meta, "done": done, **({"response": meta} if done else {})}
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *a):
+            pass
+
+        def _send(self, code, obj):
+            body = json.dumps(obj).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            name = path.split("/", 2)[-1] if path.count("/") >= 2 else ""
+            if path == "/stats":
+                self._send(200, state.as_dict())
+            elif name in state.batches:
+                self._send(200, _batch_json(state, name))
+            elif self.path in ("/", "/api/version", "/api/tags"):
+                self._send(200, {"version": "fake", "models": []})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_DELETE(self):
+            name = self.path.split("?", 1)[0].split("/", 2)[-1]
+            if state.caches.pop(name, None) is None:
+                self._send(*_gemini_error(404, "NOT_FOUND"))
+            else:
+                self._send(200, {})
+
+        def do_POST(self):
+            size = int(self.headers.get("Content-Length", 0))
+            req = json.loads(self.rfile.read(size) or b"{}")
+            path = self.path.split("?", 1)[0]
+            if path == "/api/show":   # LlamaIndex e o health check do --endpoints
+                self._send(200, {"modelfile": "", "parameters": "", "template": "",
+                                 "details": {"family": "fake",
+                                             "quantization_level": state.quantization},
+                                 "model_info": {"general.architecture": "fake",
+                                               "fake.context_length": 8192}})
+                return
+            if path.endswith("/cachedContents"):
+                self._send(*_create_cache(state, req))
+                return
+            if path.endswith(":batchGenerateContent"):
+                model = path.rsplit("/", 1)[-1].split(":", 1)[0]
+                self._send(*_create_batch(state, req, f"models/{model}"))
+                return
+            if path == "/api/chat":
+                reply = _ollama_reply
+            elif path.endswith(":generateContent"):
+                reply = _gemini_reply
+            else:
+                self._send(404, {"error": "not found"})
+                return
+            delay, fail = state.enter()
+            try:
+                time.sleep(delay)
+                self._send(*reply(state, req, delay, fail))
+            finally:
+                state.leave()
+
+    return Handler
+
+
+def serve(host="127.0.0.1", port=11435, latency=0.0, dist="const",
+          error_rate=0.0, throttle_rate=0.0, seed=0, prefill_ms=0.0, quantization="Q4_K_M"):
+    """Cria o servidor (não bloqueia); use .serve_forever() ou uma thread. port=0 escolhe uma porta livre."""
+    state = _State(latency, dist, error_rate, throttle_rate, seed, prefill_ms, quantization)
+    srv = ThreadingHTTPServer((host, port), make_handler(state))
+    srv.daemon_threads = True
+    srv.state = state
+    return srv
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Stand-in local do Ollama /api/chat e do Gemini generateContent")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=11435)
+    ap.add_argument("--latency", type=float, default=0.0, help="latência média por requisição (s)")
+    ap.add_argument("--dist", choices=DISTRIBUTIONS, default="const", help="distribuição da latência")
+    ap.add_argument("--error_rate", type=float, default=0.0, help="fração de respostas HTTP 500")
+    ap.add_argument("--throttle_rate", type=float, default=0.0, help="fração de respostas HTTP 429")
+    ap.add_argument("--prefill_ms", type=float, default=0.0,
+                    help="custo de prefill por palavra fora do prefixo em cache (ms)")
+    ap.add_argument("--quantization", default="Q4_K_M",
+                    help="quantização informada no /api/show (impressão digital do modelo)")
+    ap.add_argument("--seed", type=int, default=0)
+    a = ap.parse_args()
+    srv = serve(a.host, a.port, a.latency, a.dist, a.error_rate, a.throttle_rate, a.seed,
+                a.prefill_ms, a.quantization)
+    print(f"fake LLM em http://{a.host}:{a.port}")
+    srv.serve_forever()
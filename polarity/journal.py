@@ -0,0 +1,130 @@
+"""
+Diário (journal) append-only em JSONL: uma linha por resposta recebida,
+gravada no momento em que chega. Com --resume, as células (run, prompt,
+linha) já respondidas são puladas e os CSVs/métricas são reconstruídos a
+partir do diário. Respostas de erro não contam como concluídas.
+
+Com `row_ids` (entrada em blocos ou fatiada, ver polarity.stream), a
+linha gravada é o id global, não a posição no bloco. Com `windowed`
+(--stream), a retomada não guarda as respostas do corpus inteiro: a
+abertura indexa só (linha, posição no arquivo) de cada registro, e
+`split` lê as respostas das linhas do bloco corrente.
+"""
+import json, os, threading
+from pathlib import Path
+
+import numpy as np
+
+from polarity.cache import is_error
+
+
+def journal_path(out_dir, stem, model):
+    safe = model.replace(":", "-").replace("/", "-")
+    return Path(out_dir) / f"journal_{stem}_{safe}.jsonl"
+
+
+class Journal:
+    def __init__(self, path, resume=False, fsync_every=100, windowed=False):
+        self.path = path
+        self.fsync_every = fsync_every
+        self._done = {}
+        self._index = None    # windowed: (linhas, offsets) dos registros, ordenados por linha
+        self._window = None   # (primeira, última) linha carregada em _done
+        if resume and windowed:
+            self._index = self._scan()
+        elif resume:
+            self._done = self._load()
+        self._fh = open(path, "a" if resume else "w", encoding="utf-8")
+        if resume and self._fh.tell() > 0 and not self._ends_with_newline():
+            self._fh.write("\n")  # isola a linha truncada
+        self._lock = threading.Lock()
+        self._n = 0
+        self.row_ids = None   # posição no bloco → id global da linha
+
+    def _row(self, job):
+        return job.row if self.row_ids is None else int(self.row_ids[job.row])
+
+    def _ends_with_newline(self):
+        with open(self.path, "rb") as fh:
+            fh.seek(-1, os.SEEK_END)
+            return fh.read(1) == b"\n"
+
+    @staticmethod
+    def _apply(done, line):
+        try:
+            rec = json.loads(line)
+        except json.JSONDecodeError:
+            return  # última linha truncada por queda do processo
+        key = (rec["run"], rec["prompt"], rec["row"])
+        if is_error(rec["response"]):
+            done.pop(key, None)
+        else:
+            done[key] = rec["response"]
+
+    def _load(self):
+        done = {}
+        if not os.path.exists(self.path):
+            return done
+        with open(self.path, encoding="utf-8") as fh:
+            for line in fh:
+                self._apply(done, line)
+        return done
+
+    def _scan(self):
+        """(linhas, offsets) de todos os registros válidos, em ordem de linha."""
+        rows, offsets = [], []
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as fh:
+                pos = 0
+                for line in fh:
+                    try:
+                        rows.append(json.loads(line)["row"])
+                        offsets.append(pos)
+                    except (json.JSONDecodeError, KeyError):
+                        pass
+                    pos += len(line)
+        rows, offsets = np.array(rows, dtype=np.int64), np.array(offsets, dtype=np.int64)
+        order = np.argsort(rows, kind="stable")
+        return rows[order], offsets[order]
+
+    def _load_window(self, lo, hi):
+        """Respostas das linhas lo..hi, na ordem do arquivo (a última de cada célula vale)."""
+        rows, offsets = self._index
+        a, b = np.searchsorted(rows, lo, "left"), np.searchsorted(rows, hi, "right")
+        done = {}
+        with open(self.path, "rb") as fh:
+            for off in np.sort(offsets[a:b]):
+                fh.seek(off)
+                self._apply(done, fh.readline())
+        self._done, self._window = done, (lo, hi)
+
+    def split(self, jobs):
+        """Separa os jobs em (pendentes, [(job, resposta_do_diário), ...])."""
+        if self._index is not None and jobs:
+            rows = [self._row(j) for j in jobs]
+            lo, hi = min(rows), max(rows)
+            if self._window is None or not (self._window[0] <= lo and hi <= self._window[1]):
+                self._load_window(lo, hi)
+        pending, finished = [], []
+        for j in jobs:
+            resp = self._done.get((j.run, j.prompt, self._row(j)))
+            if resp is None:
+                pending.append(j)
+            else:
+                finished.append((j, resp))
+        return pending, finished
+
+    def write(self, job, response: str):
+        rec = {"run": job.run, "prompt": job.prompt, "row": self._row(job), "response": response}
+        with self._lock:
+            self._fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            self._fh.flush()
+            self._n += 1
+            if self._n % self.fsync_every == 0:
+                os.fsync(self._fh.fileno())
+
+    def close(self):
+        with self._lock:
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+            self._fh.close()
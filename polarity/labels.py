@@ -0,0 +1,126 @@
+"""
+Extração do rótulo a partir da resposta do modelo, com as expressões
+regulares compiladas uma vez por conjunto de rótulos.
+
+Regras, na ordem (no pior caso, uma única passada de regex no texto):
+  1. "ERROR: ..." / "Error: ..." (falha da chamada) → "error", nunca um
+     rótulo, mesmo que a mensagem cite um;
+  2. blocos <think>...</think> são descartados;
+  3. resposta igual a um rótulo, ignorando caixa, aspas, pontuação e
+     markdown → o rótulo (caminho rápido, por dicionário);
+  4. JSON ("Risk", {"label": ...}, {"labels": [x]}) → o valor, pela regra 3;
+  5. menções no texto: as negadas ("not a risk", "no opportunity",
+     "risk-free") são descartadas, e as que só qualificam outra palavra
+     num composto com hífen ("low-risk opportunity") só contam se não
+     houver outra; se sobra um único rótulo, é ele; com mais de um, vence
+     o que abre a resposta ("Opportunity, but risky"), a menos que venha
+     em alternativa ("Risk or Opportunity"); senão "undetermined" —
+     inclusive quando só há menções negadas ("No risk"): negar um rótulo
+     não afirma o outro, nem em tarefas binárias.
+
+`parse_many` re-rotula uma coluna inteira fatorando os valores distintos
+(as respostas se repetem muito entre linhas e runs).
+
+Nas métricas (polarity.metrics na varredura, polarity.evaluate offline),
+"error" conta como "undetermined" (`scored`): uma chamada que falhou é
+uma resposta sem rótulo, e as duas avaliações usam as mesmas classes.
+"""
+import json, re
+
+import numpy as np
+import pandas as pd
+
+ERROR        = "error"
+UNDETERMINED = "undetermined"
+SCORED       = {ERROR: UNDETERMINED}    # classe nas métricas, quando difere do rótulo
+
+NEGATIONS = ("not", "no", "never", "nor", "neither", "without", "isn't", "isnt", "is not")
+SUFFIXES  = ("free", "less")    # "risk-free", "riskless": negação do rótulo
+FILLERS   = ("a", "an", "the", "any", "much", "really", "very", "significant")
+
+_ERROR_RE = re.compile(r"^\s*error\s*:", re.I)
+_THINK_RE = re.compile(r"<think>.*?</think>", re.I | re.S)
+_STRIP    = " \t\r\n\"'`*_.,:;!?()[]{}<>"
+_JOINERS  = {"", "or", "and", "nor", "/", "|", "vs", "versus"}
+
+
+def scored(label):
+    """Classe de `label` nas métricas ("error" → "undetermined")."""
+    return SCORED.get(label, label)
+
+
+def _forms(label):
+    """Singular e plural (risk/risks, opportunity/opportunities)."""
+    low = label.lower()
+    plural = low[:-1] + "ies" if low.endswith("y") else low + "s"
+    return f"{re.escape(plural)}|{re.escape(low)}"
+
+
+class LabelParser:
+    def __init__(self, labels):
+        self.labels = tuple(labels)
+        self._exact = {l.lower(): l for l in self.labels}
+        neg = "|".join(re.escape(n) for n in sorted(NEGATIONS, key=len, reverse=True))
+        fill = "|".join(FILLERS)
+        alts = "|".join(f"(?P<l{i}>{_forms(l)})" for i, l in enumerate(self.labels))
+        suf = "|".join(SUFFIXES)
+        self._mention = re.compile(
+            rf"(?P<neg>\b(?:{neg})[\s-]+(?:(?:{fill})\s+)*)?\b(?:{alts})"
+            rf"(?:(?P<suf>[\s-]?(?:{suf}))\b|\b)", re.I)
+
+    def _label(self, m):
+        return next(l for i, l in enumerate(self.labels) if m.group(f"l{i}"))
+
+    def _from_json(self, text):
+        try:
+            obj = json.loads(text)
+        except ValueError:
+            return None
+        if isinstance(obj, dict):
+            obj = obj.get("label", obj.get("labels"))
+        if isinstance(obj, list) and len(obj) == 1:
+            obj = obj[0]
+        if isinstance(obj, str):
+            return self._exact.get(obj.strip(_STRIP).lower())
+        return None
+
+    def parse(self, text) -> str:
+        """Rótulo canônico, "error" ou "undetermined"."""
+        if not isinstance(text, str):
+            return UNDETERMINED          # NaN de CSV
+        if _ERROR_RE.match(text):
+            return ERROR
+        if "<" in text:
+            text = _THINK_RE.sub("", text)
+        key = text.strip(_STRIP).lower()
+        if key in self._exact:
+            return self._exact[key]
+        if text.lstrip()[:1] in ('{', '[', '"'):
+            label = self._from_json(text.strip())
+            if label is not None:
+                return label
+
+        plain, compound = [], []   # menções afirmativas: (início, fim, rótulo)
+        for m in self._mention.finditer(text):
+            label = self._label(m)
+            if m.group("neg") or m.group("suf"):
+                continue
+            if text[m.end():m.end() + 1] == "-" or text[m.start() - 1:m.start()] == "-":
+                compound.append((m.start(), m.end(), label))
+            else:
+                plain.append((m.start(), m.end(), label))
+        found = plain or compound
+        distinct = {label for _, _, label in found}
+        if len(distinct) == 1:
+            return found[0][2]
+        if distinct and not text[:found[0][0]].strip(_STRIP):
+            nxt = next(f for f in found if f[2] != found[0][2])
+            if text[found[0][1]:nxt[0]].strip(_STRIP).lower() not in _JOINERS:
+                return found[0][2]
+        return UNDETERMINED
+
+    def parse_many(self, responses) -> np.ndarray:
+        """`parse` sobre uma coluna inteira, uma vez por valor distinto."""
+        codes, uniques = pd.factorize(pd.Series(responses, dtype=object))
+        parsed = np.array([self.parse(u) for u in uniques] + [UNDETERMINED], dtype=object)
+        return parsed[codes]   # código -1 (NaN) → último: undetermined
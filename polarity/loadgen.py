@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Gerador de carga para o serviço de classificação (polarity.serve).
+
+Modo aberto (--qps > 0): as requisições chegam num processo de Poisson
+com a taxa pedida, independentemente das respostas, como num fluxo
+contínuo de manchetes. A latência conta a partir da chegada agendada:
+a espera por um dos --max_in_flight workers entra nela, e as requisições
+enviadas com mais de LATE_MS de atraso são contadas à parte ("late"). Modo fechado (--qps 0): --clients clientes
+enviam uma requisição assim que recebem a anterior, o que mede a vazão
+máxima sustentada. Ao fim, imprime QPS atingido (manchetes e
+requisições), latências p50/p95/p99, erros e as métricas do servidor
+(GET /metrics: histograma de lotes, fila).
+
+Exemplo:
+  python -m polarity.loadgen --url http://127.0.0.1:8765 --qps 50 --duration 30
+  python -m polarity.loadgen --url http://127.0.0.1:8765 --qps 0 --clients 32 --out carga.json
+"""
+import argparse, json, random, threading, time, urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from polarity.stats import percentile
+
+ROOT = Path(__file__).resolve().parent.parent
+LATE_MS = 5.0   # modo aberto: atraso de envio além da chegada agendada que conta como "late"
+
+
+def post(url, body, timeout):
+    req = urllib.request.Request(f"{url}/classify", data=json.dumps(body).encode("utf-8"),
+                                 headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=timeout) as r:
+        return json.loads(r.read())
+
+
+def get(url, path, timeout=10):
+    with urllib.request.urlopen(f"{url}{path}", timeout=timeout) as r:
+        return json.loads(r.read())
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies, self.errors, self.items, self.late = [], 0, 0, 0
+
+    def record(self, ms, n_items, ok, late=False):
+        with self._lock:
+            self.late += late
+            if ok:
+                self.latencies.append(ms)
+                self.items += n_items
+            else:
+                self.errors += 1
+
+
+def main(args):
+    texts = pd.read_csv(args.input_csv)["text"].astype(str).tolist()
+    rng = random.Random(args.seed)
+    rec = Recorder()
+    prompts = args.prompts or None
+
+    def one(scheduled=None):
+        """`scheduled`: chegada agendada (modo aberto), origem da latência."""
+        body = {"texts": rng.sample(texts, args.batch)}
+        if prompts:
+            body["prompts"] = prompts
+        t = time.perf_counter()
+        late = scheduled is not None and (t - scheduled) * 1000 > LATE_MS
+        if scheduled is not None:
+            t = scheduled
+        try:
+            out = post(args.url, body, args.timeout)
+            rec.record((time.perf_counter() - t) * 1000, len(out["results"]), True, late)
+        except Exception:
+            rec.record(0.0, 0, False, late)
+
+    health = get(args.url, "/health")
+    print(f"alvo: {health['backend']}:{health['model']} · {health['task']} · "
+          f"{len(prompts or health['prompts'])} prompts por manchete")
+    t0 = time.perf_counter()
+    end = t0 + args.duration
+    if args.qps > 0:
+        with ThreadPoolExecutor(max_workers=args.max_in_flight) as pool:
+            nxt = t0
+            while nxt < end:
+                time.sleep(max(0.0, nxt - time.perf_counter()))
+                pool.submit(one, nxt)
+                nxt += rng.expovariate(args.qps)
+    else:
+        def client():
+            while time.perf_counter() < end:
+                one()
+        threads = [threading.Thread(target=client) for _ in range(args.clients)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    wall = time.perf_counter() - t0
+
+    lat = sorted(rec.latencies)
+    res = {"mode": "open" if args.qps > 0 else "closed", "target_qps": args.qps,
+           "clients": args.clients if args.qps <= 0 else None, "batch": args.batch,
+           "wall_s": wall, "requests": len(lat), "errors": rec.errors,
+           "late": rec.late if args.qps > 0 else None,
+           "requests_per_s": len(lat) / wall, "headlines_per_s": rec.items / wall,
+           **{f"p{q}_ms": percentile(lat, q) for q in (50, 95, 99)},
+           "server": get(args.url, "/metrics")}
+    srv = res["server"]
+    late = f", {rec.late} enviadas com atraso > {LATE_MS:.0f}ms" if args.qps > 0 else ""
+    print(f"{res['requests']} requisições em {wall:.1f}s ({rec.errors} erros{late}): "
+          f"{res['requests_per_s']:.1f} req/s, {res['headlines_per_s']:.1f} manchetes/s · "
+          f"p50={res['p50_ms']:.0f}ms p95={res['p95_ms']:.0f}ms p99={res['p99_ms']:.0f}ms")
+    print(f"servidor: lote médio {srv['mean_batch']:.1f}, {srv['llm_calls']} chamadas ao LLM, "
+          f"{srv['coalesced']} itens coalescidos, fila={srv['queue_depth']} · "
+          f"lotes {srv['batch_size_hist']}")
+    if args.out:
+        Path(args.out).write_text(json.dumps(res, indent=2), encoding="utf-8")
+        print(f"✔ {args.out}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Carga sustentada contra o serviço polarity.serve")
+    ap.add_argument("--url", default="http://127.0.0.1:8765")
+    ap.add_argument("--input_csv", default=str(ROOT / "ML-ESG-2_English_Train_formatted.csv"),
+                    help="manchetes sorteadas para as requisições")
+    ap.add_argument("--qps", type=float, default=10.0,
+                    help="requisições/s em chegada Poisson (0: modo fechado com --clients)")
+    ap.add_argument("--clients", type=int, default=8, help="clientes simultâneos no modo fechado")
+    ap.add_argument("--duration", type=float, default=30.0, help="duração da carga (s)")
+    ap.add_argument("--batch", type=int, default=1, help="manchetes por requisição")
+    ap.add_argument("--prompts", nargs="*", default=None, help="só estes prompts (padrão: todos)")
+    ap.add_argument("--max_in_flight", type=int, default=256,
+                    help="requisições simultâneas no modo aberto")
+    ap.add_argument("--timeout", type=float, default=300.0)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default=None, help="grava o resultado em JSON")
+    main(ap.parse_args())
@@ -0,0 +1,115 @@
+"""
+Métricas de classificação (accuracy, precision/recall/F1 micro, macro e
+weighted) calculadas a partir de matrizes de confusão com NumPy.
+
+Segue a semântica do sklearn (`precision_recall_fscore_support` com
+zero_division=0): macro sobre as classes presentes no ouro ou na
+predição, weighted pelo suporte, micro = accuracy em multiclasse.
+Predições "error" contam como "undetermined" (polarity.labels.scored),
+como no polarity.evaluate.
+"""
+import datetime
+from pathlib import Path
+
+import numpy as np
+
+from polarity.labels import scored
+
+METRICS = [
+    "accuracy",
+    "precision_micro", "recall_micro", "f1_micro",
+    "precision_macro", "recall_macro", "f1_macro",
+    "precision_weighted", "recall_weighted", "f1_weighted",
+]
+
+
+def confusion(y_true, y_pred, n_classes):
+    """
+    Matrizes de confusão para todos os eixos iniciais de uma vez:
+    (..., N) → (..., C, C), com [t, p] = contagem, via um único bincount.
+    """
+    lead = y_true.shape[:-1]
+    cells = int(np.prod(lead)) if lead else 1
+    code = y_true.reshape(cells, -1) * n_classes + y_pred.reshape(cells, -1)
+    code += (np.arange(cells) * n_classes * n_classes)[:, None]
+    counts = np.bincount(code.ravel(), minlength=cells * n_classes * n_classes)
+    return counts.reshape(*lead, n_classes, n_classes)
+
+
+def _div(a, b):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(b > 0, a / np.where(b > 0, b, 1), 0.0)
+
+
+def metrics_from_confusion(cm):
+    """Dicionário métrica → array (...,) a partir de cm (..., C, C)."""
+    cm = cm.astype(np.float64)
+    tp = np.diagonal(cm, axis1=-2, axis2=-1)
+    support = cm.sum(axis=-1)       # verdadeiros por classe
+    predicted = cm.sum(axis=-2)     # preditos por classe
+    total = support.sum(axis=-1)
+
+    prec = _div(tp, predicted)
+    rec  = _div(tp, support)
+    f1   = _div(2 * prec * rec, prec + rec)
+
+    present = (support + predicted) > 0
+    n_present = present.sum(axis=-1)
+    acc = _div(tp.sum(axis=-1), total)
+
+    out = {"accuracy": acc}
+    # micro em multiclasse (todas as classes) = accuracy
+    out["precision_micro"] = out["recall_micro"] = out["f1_micro"] = acc
+    for name, arr in (("precision", prec), ("recall", rec), ("f1", f1)):
+        out[f"{name}_macro"]    = _div((arr * present).sum(axis=-1), n_present)
+        out[f"{name}_weighted"] = _div((arr * support).sum(axis=-1), total)
+    return out
+
+
+def compute_metrics(y_true, y_pred):
+    """Dicionário de métricas (floats) para duas listas de rótulos."""
+    y_pred = [scored(p) for p in y_pred]
+    classes = sorted(set(y_true) | set(y_pred))
+    index = {c: i for i, c in enumerate(classes)}
+    t = np.array([index[c] for c in y_true], dtype=np.int64)
+    p = np.array([index[c] for c in y_pred], dtype=np.int64)
+    m = metrics_from_confusion(confusion(t, p, len(classes)))
+    return {k: float(m[k]) for k in METRICS}
+
+
+def compute_metrics_counts(pairs):
+    """Como `compute_metrics`, a partir de um Counter {(ouro, predição): n}."""
+    classes = sorted({t for t, _ in pairs} | {scored(p) for _, p in pairs})
+    index = {c: i for i, c in enumerate(classes)}
+    cm = np.zeros((len(classes), len(classes)), dtype=np.int64)
+    for (t, p), n in pairs.items():
+        cm[index[t], index[scored(p)]] += n
+    m = metrics_from_confusion(cm)
+    return {k: float(m[k]) for k in METRICS}
+
+
+def fmt4(x):
+    return f"{x:.4f}"
+
+
+def write_metrics_txt(out_dir, model, run_metrics, prompt_order):
+    """
+    Grava o TXT de métricas: uma linha por (prompt, run) e a média por
+    prompt. `run_metrics` é uma lista de dicts com métricas + prompt + run.
+    """
+    lines = []
+    for prompt in prompt_order:
+        sub = sorted((m for m in run_metrics if m["prompt"] == prompt), key=lambda m: m["run"])
+        if not sub:
+            continue
+        for r in sub:
+            ln = ", ".join(f"{k}={fmt4(r[k])}" for k in METRICS + ["run"])
+            lines.append(f"{prompt}, {ln}")
+        mean = {k: sum(r[k] for r in sub) / len(sub) for k in METRICS}
+        ln_m = ", ".join(f"{k}_mean={fmt4(v)}" for k, v in mean.items())
+        lines.append(f"{prompt}, {ln_m}\n")
+
+    ts = datetime.datetime.now().strftime("%Y-%m-%d_%H%M")
+    path = Path(out_dir) / f"metrics_{model.replace(':', '-')}_{ts}.txt"
+    path.write_text("\n".join(lines), encoding="utf-8")
+    return path
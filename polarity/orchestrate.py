@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Orquestra a varredura completa (modelos × tarefas × datasets) a partir
+de um único JSON de configuração, no lugar dos run.sh.
+
+Cada combinação roda como subprocesso do script de sempre
+(local_models/classify_<tarefa>.py ou gemini25/gemini_<tarefa>.py) e
+grava no layout existente: <dir do backend>/<dataset>_results_<tag>_<tarefa>
+(sob "out_root", se definido; caminhos relativos partem da raiz do repo).
+
+Backends independentes andam em paralelo (ex.: chamadas ao Gemini
+enquanto o Ollama processa um modelo local). Cada backend tem uma fila
+própria com até `parallel` combinações simultâneas (Ollama: 1, agrupado
+por modelo para carregar cada modelo uma vez e descarregá-lo ao fim) e
+`concurrency` requisições simultâneas por combinação. O orçamento global
+`budget.concurrency` limita a soma das requisições em voo de todas as
+combinações ativas.
+
+Exemplo de configuração (sweep.json):
+  {
+    "runs": 10,
+    "budget": {"concurrency": 16},
+    "args": ["--resume"],
+    "datasets": {"train": "ML-ESG-2_English_Train_formatted.csv"},
+    "tasks": {"posneg": "prompts_posneg.json", "opprisk": "prompts_opprisk.json"},
+    "backends": {
+      "ollama": {"parallel": 1, "concurrency": 1, "base_url": "http://localhost:11434"},
+      "gemini": {"parallel": 2, "concurrency": 8, "args": ["--rpm", "300"]}
+    },
+    "models": [
+      {"name": "qwen3:32b",  "backend": "ollama", "tag": "qwen"},
+      {"name": "gemini-2.5-flash-preview-04-17", "backend": "gemini", "tag": "gemini"}
+    ]
+  }
+
+Uso:
+  python -m polarity.orchestrate sweep.json --dry_run
+  python -m polarity.orchestrate sweep.json --backends gemini --tasks posneg
+"""
+import argparse, json, subprocess, sys, threading, time, urllib.request
+from collections import Counter, namedtuple
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# backend → (diretório dos scripts e das saídas, nome do script)
+SCRIPTS = {
+    "ollama": ("local_models", "classify_{task}.py"),
+    "gemini": ("gemini25",     "gemini_{task}.py"),
+}
+
+Entry = namedtuple("Entry", "backend model tag task dataset script prompts input_csv out_dir")
+
+
+def plan(cfg, backends=None, tasks=None, datasets=None):
+    """Combinações modelo × tarefa × dataset, agrupadas por modelo dentro de cada backend."""
+    entries = []
+    out_root = ROOT / cfg.get("out_root", ".")
+    for m in cfg["models"]:
+        if backends and m["backend"] not in backends:
+            continue
+        folder, script = SCRIPTS[m["backend"]]
+        for task, prompts in cfg["tasks"].items():
+            if tasks and task not in tasks:
+                continue
+            for split, csv in cfg["datasets"].items():
+                if datasets and split not in datasets:
+                    continue
+                entries.append(Entry(
+                    m["backend"], m["name"], m.get("tag", m["name"]), task, split,
+                    ROOT / folder / script.format(task=task), ROOT / prompts, ROOT / csv,
+                    out_root / folder / f"{split}_results_{m.get('tag', m['name'])}_{task}",
+                ))
+    return entries
+
+
+class Budget:
+    """Soma das requisições simultâneas de todas as combinações ativas."""
+
+    def __init__(self, total):
+        self.total = total
+        self.used = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, n):
+        n = min(n, self.total) if self.total else n
+        with self._cond:
+            self._cond.wait_for(lambda: not self.total or self.used + n <= self.total)
+            self.used += n
+        return n
+
+    def release(self, n):
+        with self._cond:
+            self.used -= n
+            self._cond.notify_all()
+
+
+def command(entry, cfg, concurrency):
+    bcfg = cfg["backends"].get(entry.backend, {})
+    model_cfg = next(m for m in cfg["models"] if m["name"] == entry.model and m["backend"] == entry.backend)
+    cmd = [sys.executable, str(entry.script),
+           "--input_csv", str(entry.input_csv), "--out_dir", str(entry.out_dir),
+           "--prompts", str(entry.prompts), "--model", entry.model,
+           "--runs", str(cfg.get("runs", 10)), "--concurrency", str(concurrency),
+           "--no_progress"]
+    if bcfg.get("base_url"):
+        cmd += ["--base_url", bcfg["base_url"]]
+    return cmd + list(cfg.get("args", [])) + list(bcfg.get("args", [])) + list(model_cfg.get("args", []))
+
+
+def unload_ollama(base_url, model):
+    """Descarrega o modelo do servidor (equivale a `ollama stop`)."""
+    body = json.dumps({"model": model, "keep_alive": 0}).encode("utf-8")
+    req = urllib.request.Request(f"{base_url.rstrip('/')}/api/generate", data=body,
+                                 headers={"Content-Type": "application/json"})
+    try:
+        urllib.request.urlopen(req, timeout=60).read()
+    except OSError as e:
+        print(f"! não foi possível descarregar {model}: {e}")
+
+
+class Orchestrator:
+    def __init__(self, cfg, entries):
+        self.cfg = cfg
+        self.entries = entries
+        self.budget = Budget(cfg.get("budget", {}).get("concurrency"))
+        self.results = []
+        self._active = Counter()   # (backend, modelo) → combinações em execução
+        self._lock = threading.Lock()
+
+    def _run(self, entry):
+        bcfg = self.cfg["backends"].get(entry.backend, {})
+        conc = self.budget.acquire(bcfg.get("concurrency", 1))
+        entry.out_dir.mkdir(parents=True, exist_ok=True)
+        log_path = entry.out_dir / "orchestrate.log"
+        t0 = time.perf_counter()
+        label = f"{entry.backend}:{entry.model} · {entry.task} · {entry.dataset}"
+        print(f"▶ {label} (concorrência {conc})", flush=True)
+        try:
+            with open(log_path, "a", encoding="utf-8") as log:
+                code = subprocess.run(command(entry, self.cfg, conc), stdout=log,
+                                      stderr=subprocess.STDOUT, cwd=ROOT).returncode
+        finally:
+            self.budget.release(conc)
+        dt = time.perf_counter() - t0
+        print(f"{'✔' if code == 0 else '✗'} {label}: {dt:.0f}s"
+              f"{'' if code == 0 else f' (código {code}, ver {log_path})'}", flush=True)
+        with self._lock:
+            self.results.append((entry, code, dt))
+
+    def _lane(self, backend, queue):
+        """
+        Fila de um backend; o Ollama descarrega cada modelo quando termina
+        a última combinação dele (nenhuma na fila nem em outra faixa).
+        """
+        bcfg = self.cfg["backends"].get(backend, {})
+        while True:
+            with self._lock:
+                if not queue:
+                    return
+                entry = queue.pop(0)
+                self._active[backend, entry.model] += 1
+            try:
+                self._run(entry)
+            finally:
+                with self._lock:
+                    self._active[backend, entry.model] -= 1
+                    last_of_model = (not self._active[backend, entry.model]
+                                     and all(e.model != entry.model for e in queue))
+            if backend == "ollama" and last_of_model and bcfg.get("unload", True):
+                unload_ollama(bcfg.get("base_url", "http://localhost:11434"), entry.model)
+
+    def run(self):
+        threads = []
+        for backend in dict.fromkeys(e.backend for e in self.entries):
+            queue = [e for e in self.entries if e.backend == backend]
+            parallel = self.cfg["backends"].get(backend, {}).get("parallel", 1)
+            for _ in range(max(1, parallel)):
+                t = threading.Thread(target=self._lane, args=(backend, queue), daemon=True)
+                t.start()
+                threads.append(t)
+        for t in threads:
+            t.join()
+        return self.results
+
+
+def main(args):
+    cfg = json.loads(Path(args.config).read_text(encoding="utf-8"))
+    entries = plan(cfg, args.backends, args.tasks, args.datasets)
+    print(f"{len(entries)} combinações · orçamento global de concorrência: "
+          f"{cfg.get('budget', {}).get('concurrency') or 'sem limite'}")
+    if args.dry_run:
+        for e in entries:
+            print(f"  {e.backend:<7} {e.model:<32} {e.task:<8} {e.dataset:<6} → {e.out_dir}")
+        return
+    t0 = time.perf_counter()
+    results = Orchestrator(cfg, entries).run()
+    failed = [(e, c) for e, c, _ in results if c != 0]
+    print(f"\n{len(results) - len(failed)}/{len(results)} combinações concluídas em "
+          f"{time.perf_counter() - t0:.0f}s")
+    if failed:
+        for e, c in failed:
+            print(f"  ✗ {e.backend}:{e.model} · {e.task} · {e.dataset} (código {c})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Varredura multi-modelo/multi-tarefa com backends em paralelo")
+    ap.add_argument("config", help="JSON da varredura (modelos, tarefas, datasets, backends)")
+    ap.add_argument("--backends", nargs="+", choices=list(SCRIPTS), default=None,
+                    help="só estes backends")
+    ap.add_argument("--tasks", nargs="+", default=None, help="só estas tarefas")
+    ap.add_argument("--datasets", nargs="+", default=None, help="só estes datasets")
+    ap.add_argument("--dry_run", action="store_true", help="lista as combinações e sai")
+    main(ap.parse_args())
@@ -0,0 +1,120 @@
+"""
+Empacotamento de várias manchetes por chamada (--pack_size N).
+
+O prefixo do prompt é enviado uma única vez, seguido de N manchetes
+numeradas; o modelo responde um objeto JSON {"labels": [...]} (Gemini
+via response_schema, Ollama via format=`json_schema`). Posições ausentes ou
+malformadas voltam como None e devem ser refeitas individualmente.
+"""
+import json, re, threading
+from pathlib import Path
+
+PACK_TEMPLATE = (
+    "{prefix}\n"
+    "Apply this classification independently to each of the {n} numbered "
+    "headlines below. Answer only with a JSON object of the form "
+    '{{"labels": [...]}} containing exactly {n} labels, in the same order.\n\n'
+    "{items}"
+)
+
+_JSON_RE = re.compile(r"\{.*\}|\[.*\]", re.S)
+
+
+def pack_jobs(jobs, n):
+    """Agrupa jobs consecutivos da mesma célula (run, prompt) em pacotes de até n."""
+    packs, cur = [], []
+    for j in jobs:
+        if cur and (len(cur) == n or (cur[0].run, cur[0].prompt) != (j.run, j.prompt)):
+            packs.append(cur)
+            cur = []
+        cur.append(j)
+    if cur:
+        packs.append(cur)
+    return packs
+
+
+def pack_prompt(prefix, texts):
+    items = "\n".join(f"{i}. {t}" for i, t in enumerate(texts, 1))
+    return PACK_TEMPLATE.format(prefix=prefix.rstrip(), n=len(texts), items=items)
+
+
+def json_schema(labels):
+    """Schema JSON do objeto de resposta (`format` do /api/chat do Ollama)."""
+    return {
+        "type": "object",
+        "properties": {"labels": {"type": "array", "items": {"type": "string", "enum": list(labels)}}},
+        "required": ["labels"],
+    }
+
+
+def unpack_response(raw, n, labels):
+    """
+    Devolve lista de n rótulos canônicos (ou None onde inválido). Se o
+    tamanho do array não bate com n, nenhuma posição é confiável.
+    """
+    canon = {l.lower(): l for l in labels}
+    try:
+        obj = json.loads(raw)
+    except (json.JSONDecodeError, TypeError):
+        m = _JSON_RE.search(raw or "")
+        try:
+            obj = json.loads(m.group(0)) if m else None
+        except json.JSONDecodeError:
+            obj = None
+    if isinstance(obj, dict):
+        obj = obj.get("labels")
+    if not isinstance(obj, list) or len(obj) != n:
+        return [None] * n
+    out = []
+    for item in obj:
+        key = str(item).strip().strip("'\".").lower() if item is not None else ""
+        out.append(canon.get(key))
+    return out
+
+
+class PackReport:
+    """Contabiliza chamadas, fallbacks e concordância com uma execução sem pacotes."""
+
+    def __init__(self, compare_dir=None):
+        self.compare_dir = Path(compare_dir) if compare_dir else None
+        self._lock = threading.Lock()
+        self.rows = self.calls = self.fallbacks = 0
+        self.agree = self.compared = 0
+
+    def record(self, n_rows, n_fallbacks):
+        with self._lock:
+            self.rows += n_rows
+            self.calls += 1 + n_fallbacks
+            self.fallbacks += n_fallbacks
+
+    def compare(self, csv_name, labels):
+        """Concordância de `labels` com o CSV homônimo em compare_dir (se existir)."""
+        if self.compare_dir is None:
+            return
+        ref = self.compare_dir / csv_name
+        if not ref.exists():
+            return
+        import pandas as pd
+        ref_labels = pd.read_csv(ref)["responseLabel"].astype(str).str.lower().tolist()
+        with self._lock:
+            for a, b in zip(labels, ref_labels):
+                self.compared += 1
+                self.agree += str(a).lower() == b
+
+    def summary(self, wall=None) -> str:
+        if not self.calls:
+            return "pack: nenhuma chamada"
+        ln = (f"pack: {self.rows} linhas em {self.calls} chamadas "
+              f"({self.rows / self.calls:.1f} linhas/chamada, {self.fallbacks} fallbacks individuais)")
+        if wall:
+            ln += f", {self.rows / wall:.2f} linhas/s"
+        if self.compared:
+            ln += f", concordância vs. sem pacotes={self.agree / self.compared:.4f} ({self.compared} linhas)"
+        return ln
+
+
+def add_pack_args(parser):
+    parser.add_argument("--pack_size", type=int, default=1,
+                        help="manchetes por chamada (JSON estruturado; 1 = desligado)")
+    parser.add_argument("--pack_compare_dir", default=None,
+                        help="diretório com CSVs sem pacotes para medir concordância")
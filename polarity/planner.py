@@ -0,0 +1,85 @@
+"""
+Planejador da varredura: expande (run × prompt × linha) em uma única
+fila de trabalho, drenada por um pool compartilhado, e demultiplexa os
+resultados de volta para cada célula (run, prompt).
+"""
+import threading
+from collections import namedtuple
+
+Job = namedtuple("Job", "run prompt row prefix text")
+
+
+def plan_jobs(prompt_dict, runs, texts, order="run"):
+    """
+    Produto cartesiano runs × prompts × textos, em ordem run → prompt →
+    linha. Com order="prefix", prompt → run → linha: requisições com o
+    mesmo prefixo ficam contíguas (o servidor reaproveita o KV cache),
+    mas nenhuma run se completa antes do último prompt.
+    """
+    texts = list(texts)
+    if order == "prefix":
+        return [
+            Job(run, key, row, prefix, text)
+            for key, prefix in prompt_dict.items()
+            for run in range(1, runs + 1)
+            for row, text in enumerate(texts)
+        ]
+    return [
+        Job(run, key, row, prefix, text)
+        for run in range(1, runs + 1)
+        for key, prefix in prompt_dict.items()
+        for row, text in enumerate(texts)
+    ]
+
+
+def plan_rounds(jobs, prompt_dict, runs, texts, tracker=None, skip=None, fill=None):
+    """
+    Rodadas da varredura: todos os jobs de uma vez ou, com `tracker`
+    (--adaptive), uma rodada por run, planejada só depois que a anterior
+    foi entregue; as linhas estáveis (fora de `skip[prompt]`, as já
+    respondidas pela cascata) vão para `fill(job, resposta)`.
+    """
+    if tracker is None:
+        yield jobs
+        return
+    skip = skip or {}
+    for run in range(1, runs + 1):
+        active = {key: set(tracker.plan(key, run)) for key in prompt_dict}
+        for key, prefix in prompt_dict.items():
+            for row in set(range(len(texts))).difference(active[key], skip.get(key, ())):
+                fill(Job(run, key, row, prefix, texts[row]), tracker.fill(key, row))
+        yield [j for j in jobs if j.run == run and j.row in active[j.prompt]]
+
+
+class ResultSink:
+    """
+    Recebe (job, resultado) em qualquer ordem. Quando todas as linhas de
+    uma célula chegam, chama `on_cell_done(run, prompt, resultados)`;
+    quando todas as células de uma run terminam, `on_run_done(run)`.
+    """
+    def __init__(self, n_rows, n_prompts, on_cell_done, on_run_done=None):
+        self.n_rows = n_rows
+        self.n_prompts = n_prompts
+        self.on_cell_done = on_cell_done
+        self.on_run_done = on_run_done
+        self._cells = {}
+        self._counts = {}
+        self._cells_done = {}
+        self._lock = threading.Lock()
+
+    def add(self, job, result):
+        key = (job.run, job.prompt)
+        with self._lock:
+            cell = self._cells.setdefault(key, [None] * self.n_rows)
+            cell[job.row] = result
+            self._counts[key] = self._counts.get(key, 0) + 1
+            cell_done = self._counts[key] == self.n_rows
+            run_done = False
+            if cell_done:
+                del self._cells[key], self._counts[key]
+                self._cells_done[job.run] = self._cells_done.get(job.run, 0) + 1
+                run_done = self._cells_done[job.run] == self.n_prompts
+        if cell_done:
+            self.on_cell_done(job.run, job.prompt, cell)
+        if run_done and self.on_run_done is not None:
+            self.on_run_done(job.run)
@@ -0,0 +1,120 @@
+"""
+Pool de conexões HTTP explícito por backend (httpx), dimensionado pela
+concorrência da varredura e compartilhado por todas as runs, prompts e
+formatos de resposta do backend.
+
+Cada requisição leva o trace do httpcore: as conexões abertas (TCP e
+TLS) são contadas e cronometradas, e o resumo ao fim mostra quantas
+requisições reaproveitaram uma conexão já aberta. Com --http2 (requer o
+pacote h2) as requisições simultâneas são multiplexadas em poucas
+conexões.
+"""
+import threading, time
+
+import httpx
+
+# etapas do httpcore que só acontecem ao abrir uma conexão
+CONNECT_STEPS = ("connection.connect_tcp", "connection.start_tls")
+
+
+def add_pool_args(parser):
+    parser.add_argument("--pool_size", type=int, default=None,
+                        help="conexões HTTP mantidas pelo backend (padrão: a concorrência)")
+    parser.add_argument("--keepalive_expiry", type=float, default=60.0,
+                        help="tempo (s) que uma conexão ociosa fica aberta no pool")
+    parser.add_argument("--http2", action="store_true",
+                        help="usa HTTP/2 quando o servidor aceita (requer o pacote h2)")
+
+
+def make_pool(args):
+    """Pool do backend real; o tamanho padrão é --concurrency ou a sugestão do backend."""
+    return HttpPool(args.pool_size or args.concurrency, args.keepalive_expiry, args.http2)
+
+
+class HttpPool:
+    def __init__(self, size=None, keepalive_expiry=60.0, http2=False):
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                raise ImportError("--http2 requer o pacote h2 (pip install 'httpx[http2]')")
+        self.size = size
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2
+        self.requests = self.connections = self.tls = 0
+        self.connect_ms = 0.0
+        self._lock = threading.Lock()
+
+    def sized(self, default):
+        """Fixa o tamanho do pool, se ainda não definido (sugestão do backend)."""
+        if self.size is None:
+            self.size = max(1, default)
+        return self
+
+    def _limits(self):
+        return httpx.Limits(max_connections=self.size, max_keepalive_connections=self.size,
+                            keepalive_expiry=self.keepalive_expiry)
+
+    # ------------------------------ trace -----------------------------
+    def _tracer(self):
+        started = {}
+
+        def on_event(name, info):
+            step, _, phase = name.rpartition(".")
+            if step not in CONNECT_STEPS:
+                return
+            if phase == "started":
+                started[step] = time.perf_counter()
+            elif phase == "complete":
+                dt = (time.perf_counter() - started.pop(step, time.perf_counter())) * 1000
+                with self._lock:
+                    self.connect_ms += dt
+                    if step == CONNECT_STEPS[0]:
+                        self.connections += 1
+                    else:
+                        self.tls += 1
+        return on_event
+
+    def _count(self):
+        with self._lock:
+            self.requests += 1
+
+    def _on_request(self, request):
+        self._count()
+        request.extensions["trace"] = self._tracer()
+
+    async def _aon_request(self, request):
+        self._count()
+        on_event = self._tracer()
+
+        async def trace(name, info):
+            on_event(name, info)
+        request.extensions["trace"] = trace
+
+    # ---------------------------- clientes ----------------------------
+    def client_args(self):
+        """kwargs de httpx.Client (transporte com o pool + hook de contagem)."""
+        return {"transport": httpx.HTTPTransport(limits=self._limits(), http2=self.http2),
+                "event_hooks": {"request": [self._on_request]}}
+
+    def async_client_args(self):
+        """kwargs de httpx.AsyncClient, com um pool próprio do loop do engine."""
+        return {"transport": httpx.AsyncHTTPTransport(limits=self._limits(), http2=self.http2),
+                "event_hooks": {"request": [self._aon_request]}}
+
+    # ----------------------------- resumo -----------------------------
+    @property
+    def reused(self):
+        return max(0, self.requests - self.connections)
+
+    def as_dict(self):
+        return {"http_requests": self.requests, "http_connections": self.connections,
+                "http_reuse": self.reused / self.requests if self.requests else 0.0,
+                "connect_ms_mean": self.connect_ms / self.connections if self.connections else 0.0}
+
+    def summary(self):
+        d = self.as_dict()
+        return (f"conexões HTTP: {self.requests} requisições, {self.connections} conexões abertas "
+                f"({self.tls} TLS, {d['connect_ms_mean']:.0f} ms em média) · "
+                f"reuso {d['http_reuse']:.1%} · pool={self.size} "
+                f"keepalive={self.keepalive_expiry:g}s http2={'on' if self.http2 else 'off'}")
@@ -0,0 +1,187 @@
+"""
+Limitador de taxa adaptativo para APIs com cota (Gemini / Vertex AI).
+
+Dois token buckets compartilhados entre todas as requisições: requisições
+por minuto (RPM) e tokens por minuto (TPM). A taxa efetiva segue AIMD:
+cada sucesso soma `ai_step` RPM (até o teto configurado) e cada erro 429
+/ RESOURCE_EXHAUSTED multiplica a taxa por `md_factor`. As retentativas
+usam backoff exponencial com jitter; o timeout vale para cada tentativa
+de rede, sem contar a espera no limitador nem o backoff.
+"""
+import asyncio, random, re, threading, time
+
+# sem atributo code/status_code, o status vem da mensagem: o código HTTP
+# só conta como número isolado (não "4290 tokens" nem "model-500")
+_STATUS = r"(?<![\w./-])(?:{})(?![\w./-])"
+RATE_LIMIT_RE = re.compile(_STATUS.format("429") + r"|\bRESOURCE_EXHAUSTED\b")
+TRANSIENT_RE  = re.compile(_STATUS.format("500|503")
+                           + r"|\b(?:UNAVAILABLE|INTERNAL|DEADLINE_EXCEEDED)\b|\btimed out\b")
+
+
+def is_rate_limit_error(e: Exception) -> bool:
+    code = getattr(e, "code", None) or getattr(e, "status_code", None)
+    if code == 429:
+        return True
+    return RATE_LIMIT_RE.search(str(e)) is not None
+
+
+def is_transient_error(e: Exception) -> bool:
+    code = getattr(e, "code", None) or getattr(e, "status_code", None)
+    if isinstance(code, int) and code >= 500:
+        return True
+    if isinstance(e, (TimeoutError, ConnectionError)):
+        return True
+    return TRANSIENT_RE.search(str(e)) is not None
+
+
+class RateLimiter:
+    def __init__(self, rpm, tpm=None, retries=5, min_rpm=1.0, ai_step=None, md_factor=0.5):
+        self.max_retries = retries
+        self.max_rpm = float(rpm)
+        self.rpm = float(rpm)
+        self.max_tpm = float(tpm) if tpm else None
+        self.min_rpm = min_rpm
+        self.ai_step = ai_step if ai_step is not None else max(1.0, rpm / 50)
+        self.md_factor = md_factor
+        self._lock = threading.Lock()
+        self._req = 1.0
+        self._tok = self._tok_capacity()
+        self._last = time.monotonic()
+        self.throttled = 0
+        self.retries = 0
+        self.failures = 0
+
+    # capacidade = 1 s de vazão (evita rajadas que estouram a cota)
+    def _req_capacity(self):
+        return max(1.0, self.rpm / 60)
+
+    def _tpm(self):
+        return self.max_tpm * self.rpm / self.max_rpm if self.max_tpm else None
+
+    def _tok_capacity(self):
+        tpm = self._tpm()
+        return max(1.0, tpm / 60) if tpm else 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        dt, self._last = now - self._last, now
+        self._req = min(self._req_capacity(), self._req + dt * self.rpm / 60)
+        tpm = self._tpm()
+        if tpm:
+            self._tok = min(self._tok_capacity(), self._tok + dt * tpm / 60)
+
+    def _try_acquire(self, tokens):
+        """Consome a cota e devolve 0, ou devolve quantos segundos esperar."""
+        with self._lock:
+            self._refill()
+            tpm = self._tpm()
+            need_tok = min(tokens, self._tok_capacity()) if tpm else 0
+            if self._req >= 1 and (not tpm or self._tok >= need_tok):
+                self._req -= 1
+                if tpm:
+                    self._tok -= need_tok
+                return 0.0
+            wait = (1 - self._req) * 60 / self.rpm if self._req < 1 else 0.0
+            if tpm and self._tok < need_tok:
+                wait = max(wait, (need_tok - self._tok) * 60 / tpm)
+            return max(wait, 0.001)
+
+    def acquire(self, tokens=1):
+        """Bloqueia até haver 1 requisição e `tokens` tokens disponíveis."""
+        while (wait := self._try_acquire(tokens)) > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, tokens=1):
+        """Como `acquire`, mas cede o event loop enquanto espera."""
+        while (wait := self._try_acquire(tokens)) > 0:
+            await asyncio.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            self.rpm = min(self.max_rpm, self.rpm + self.ai_step)
+
+    def on_throttle(self):
+        with self._lock:
+            self.throttled += 1
+            self.rpm = max(self.min_rpm, self.rpm * self.md_factor)
+            self._req = min(self._req, 0.0)
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+
+    def summary(self) -> str:
+        return (f"rate limiter: rpm atual={self.rpm:.0f}/{self.max_rpm:.0f}, "
+                f"429s={self.throttled}, retentativas={self.retries}, falhas={self.failures}")
+
+
+async def call_with_retries(coro_fn, limiter, tokens=1, base_delay=1.0, max_delay=60.0, span=None,
+                            timeout=None):
+    """
+    Aguarda `coro_fn()` respeitando o limitador. Erros de cota e
+    transitórios são repetidos (até `limiter.max_retries` vezes) com
+    backoff exponencial + jitter; os demais (ou o último) são propagados.
+    `timeout` (s) limita cada tentativa; estourar conta como transitório.
+    Com `span` (polarity.trace), soma a espera em throttle_ms e conta as
+    retentativas.
+    """
+    retries = limiter.max_retries
+    for attempt in range(retries + 1):
+        t = time.perf_counter()
+        await limiter.aacquire(tokens)
+        if span is not None:
+            span["throttle_ms"] += (time.perf_counter() - t) * 1000
+        try:
+            try:
+                out = await asyncio.wait_for(coro_fn(), timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"sem resposta em {timeout}s") from None
+        except Exception as e:
+            throttled = is_rate_limit_error(e)
+            if throttled:
+                limiter.on_throttle()
+            if attempt >= retries or not (throttled or is_transient_error(e)):
+                limiter.record_failure()
+                raise
+            limiter.record_retry()
+            delay = min(max_delay, base_delay * 2 ** attempt)
+            t = time.perf_counter()
+            await asyncio.sleep(delay / 2 + random.uniform(0, delay / 2))
+            if span is not None:
+                span["retries"] += 1
+                span["throttle_ms"] += (time.perf_counter() - t) * 1000
+            continue
+        limiter.on_success()
+        return out
+
+
+def retry_budget(timeout, retries, base_delay=1.0, max_delay=60.0):
+    """
+    Pior caso (s) de uma chamada com `retries` retentativas de até
+    `timeout` s cada e o backoff de `call_with_retries` (sem a espera
+    no limitador).
+    """
+    return timeout * (retries + 1) + sum(min(max_delay, base_delay * 2 ** i)
+                                         for i in range(retries))
+
+
+def estimate_tokens(prompt: str, max_output_tokens: int) -> int:
+    """Estimativa grosseira (~4 caracteres/token) para o bucket de TPM."""
+    return len(prompt) // 4 + max_output_tokens
+
+
+def add_rate_args(parser):
+    parser.add_argument("--rpm", type=float, default=300,
+                        help="teto de requisições por minuto (compartilhado por toda a varredura)")
+    parser.add_argument("--tpm", type=float, default=None,
+                        help="teto de tokens por minuto (opcional)")
+    parser.add_argument("--retries", type=int, default=5,
+                        help="retentativas para 429/RESOURCE_EXHAUSTED e erros transitórios")
+
+
+def make_limiter(args) -> RateLimiter:
+    return RateLimiter(args.rpm, args.tpm, retries=args.retries)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Re-rotula CSVs de resultado já gerados com o parser atual
+(polarity.labels), sem chamar nenhum LLM: recalcula a coluna
+responseLabel a partir de response e informa as transições.
+
+A tarefa sai do nome do prompt (positive_negative → posneg, senão
+opprisk) e a caixa dos rótulos segue a do CSV (local_models/posneg grava
+em minúsculas). Sem --out_dir os CSVs são reescritos no lugar; com
+--dry_run só o relatório é impresso.
+
+Exemplo:
+  python -m polarity.relabel gemini25/train_results_gemini_posneg \
+         local_models/test_results_qwen_opprisk --dry_run
+"""
+import argparse
+from collections import Counter
+from pathlib import Path
+
+import pandas as pd
+
+from polarity.evaluate import scan
+from polarity.tasks import OPPRISK, POSNEG, Task
+
+
+def task_for(prompt, labels_seen):
+    base = POSNEG if "positive_negative" in prompt else OPPRISK
+    lower = [l.lower() for l in base.labels]
+    lowercase = any(l in lower for l in labels_seen) and not any(l in base.labels for l in labels_seen)
+    return Task(base.name, base.labels, lowercase=lowercase) if lowercase else base
+
+
+def relabel_file(path, prompt, out_path=None):
+    """Re-rotula um CSV; devolve Counter de (antigo, novo) nas linhas alteradas."""
+    df = pd.read_csv(path)
+    old = df["responseLabel"].astype(str)
+    task = task_for(prompt, set(old.unique()))
+    df["responseLabel"] = task.detect_many(df["response"])
+    changed = old != df["responseLabel"]
+    if out_path is not None and (changed.any() or out_path != path):
+        df.to_csv(out_path, index=False)
+    return Counter(zip(old[changed], df["responseLabel"][changed]))
+
+
+def main(args):
+    total = Counter()
+    n_files = n_changed = 0
+    for directory in args.dirs:
+        for stem, files in scan(directory).items():
+            out_dir = Path(args.out_dir) if args.out_dir else None
+            if out_dir:
+                out_dir.mkdir(parents=True, exist_ok=True)
+            for (prompt, run), path in sorted(files.items()):
+                dest = None if args.dry_run else (out_dir / path.name if out_dir else path)
+                diff = relabel_file(path, prompt, dest)
+                n_files += 1
+                if diff:
+                    n_changed += 1
+                    total += diff
+                    print(f"  {path.name}: {sum(diff.values())} linhas alteradas")
+    print(f"\n{n_files} CSVs, {n_changed} com alterações")
+    for (old, new), n in total.most_common():
+        print(f"  {old} → {new}: {n}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Re-rotula CSVs de resultado sem consultar o LLM")
+    ap.add_argument("dirs", nargs="+", help="diretórios com <stem>_<prompt>_run<k>.csv")
+    ap.add_argument("--out_dir", default=None, help="grava os CSVs aqui (padrão: no lugar)")
+    ap.add_argument("--dry_run", action="store_true", help="só relata as transições")
+    main(ap.parse_args())
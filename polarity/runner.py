@@ -0,0 +1,383 @@
+"""
+Varredura comum a todos os scripts: runs × prompts × manchetes drenadas
+por um único AsyncEngine sobre qualquer backend (ollama, gemini, mock).
+
+Os scripts só definem a instrução de sistema, a tarefa e o backend. Aqui
+ficam os argumentos comuns e o planejamento (`Sweep`: blocos da entrada,
+cascata, rodadas do --adaptive, reamostragem) e os resumos; cache, limite
+de taxa, empacotamento e --mode batch estão em polarity.dispatch, e
+diário, --dedup, voto e gravação das células em polarity.delivery. Com
+--stream, a entrada é lida e varrida bloco a bloco (polarity.stream).
+"""
+import json
+from itertools import chain
+from pathlib import Path
+
+import pandas as pd
+
+from polarity.adaptive import StabilityTracker, add_adaptive_args
+from polarity.backends.balancer import add_endpoint_args
+from polarity.backends import get_backend
+from polarity.cascade import Cascade, add_cascade_args
+from polarity.cache import add_cache_args, open_cache
+from polarity.consensus import VoteTally, add_consensus_args, write_consensus
+from polarity.decoding import add_decoding_args
+from polarity.dedup import Dedup, add_dedup_args
+from polarity.delivery import CellWriter, Delivery
+from polarity.dispatch import Dispatcher
+from polarity.engine import AsyncEngine
+from polarity.journal import Journal, journal_path
+from polarity.metrics import write_metrics_txt
+from polarity.packing import PackReport, add_pack_args
+from polarity.planner import Job, plan_jobs, plan_rounds, ResultSink
+from polarity.pool import add_pool_args, make_pool
+from polarity.ratelimit import add_rate_args, make_limiter
+from polarity.stats import RESERVOIR, LatencyStats
+from polarity.trace import Tracer
+from polarity.serve import add_serve_args, serve
+from polarity.store import add_output_args, open_stores
+from polarity.stream import add_stream_args, input_stem, is_partial, read_input
+
+
+def add_runner_args(parser, backends, model, prompts=None, rate_limit=False):
+    """Argumentos comuns; `backends` é a lista de escolhas de --backend."""
+    parser.add_argument("--input_csv", default=None,
+                        help="CSV (ou JSONL) com colunas text e label; '-' lê do stdin "
+                             "(obrigatório, exceto com --serve)")
+    parser.add_argument("--out_dir",   default="results", help="diretório para CSVs e métricas")
+    parser.add_argument("--model",     default=model, help="nome do modelo")
+    parser.add_argument("--prompts",   default=prompts, required=prompts is None,
+                        help="JSON de prompts")
+    parser.add_argument("--runs",      type=int, default=10, help="quantas repetições")
+    parser.add_argument("--backend",   choices=backends, default=backends[0],
+                        help="backend de LLM (mock: local, determinístico, sem rede)")
+    parser.add_argument("--mock_latency", type=float, default=0.05,
+                        help="latência simulada do backend mock (s)")
+    parser.add_argument("--concurrency", "--max_workers", dest="concurrency", type=int,
+                        default=None,
+                        help="requisições simultâneas (padrão: sugestão do backend)")
+    parser.add_argument("--timeout",   type=float, default=120.0, help="timeout por requisição (s)")
+    parser.add_argument("--schedule",  choices=("run", "prefix"), default=None,
+                        help="ordem da fila: run→prompt ou prompt→run (agrupa o prefixo; "
+                             "padrão: prefix se o backend reaproveita KV de prefixo)")
+    if rate_limit:
+        add_rate_args(parser)
+    else:
+        parser.add_argument("--retries", type=int, default=2, help="retentativas por requisição")
+    parser.add_argument("--resume", action="store_true",
+                        help="retoma a varredura a partir do diário em out_dir")
+    parser.add_argument("--stats_json", default=None,
+                        help="grava vazão e latências da varredura em JSON (polarity.bench)")
+    parser.add_argument("--trace", default=None,
+                        help="JSONL com um span por requisição (fila, throttle, envio, tokens)")
+    parser.add_argument("--no_progress", action="store_true",
+                        help="desliga a linha de progresso (linhas/s e ETA) no stderr")
+    add_output_args(parser)
+    add_decoding_args(parser)
+    add_pack_args(parser)
+    add_cache_args(parser)
+    add_adaptive_args(parser)
+    add_consensus_args(parser)
+    add_stream_args(parser)
+    add_dedup_args(parser)
+    add_cascade_args(parser)
+    add_serve_args(parser)
+
+
+def add_ollama_args(parser):
+    """Argumentos do backend Ollama (scripts de local_models/)."""
+    parser.add_argument("--base_url", default="http://localhost:11434",
+                        help="endereço do servidor Ollama")
+    parser.add_argument("--keep_alive", default="30m",
+                        help="mantém o modelo carregado entre requisições (ex.: 30m, -1)")
+    parser.add_argument("--num_ctx", type=lambda v: v if v == "auto" else int(v), default=None,
+                        help="janela de contexto; 'auto' dimensiona pela maior requisição")
+    add_endpoint_args(parser)
+    add_pool_args(parser)
+
+
+def ollama_kwargs(args):
+    return dict(base_url=args.base_url, timeout=args.timeout,
+                keep_alive=args.keep_alive, num_ctx=args.num_ctx, pool=make_pool(args),
+                top_logprobs=args.top_logprobs, endpoints=args.endpoints,
+                health_interval=args.health_interval)
+
+
+def add_gemini_args(parser):
+    """Argumentos do backend Gemini (scripts de gemini25/)."""
+    parser.add_argument("--base_url", default=None,
+                        help="endpoint alternativo da API (ex.: stand-in local polarity.fake_ollama)")
+    parser.add_argument("--mode", choices=("online", "batch"), default="online",
+                        help="online: uma chamada por requisição; batch: um job de Batch Prediction")
+    parser.add_argument("--context_cache", action="store_true",
+                        help="cria um CachedContent por prefixo de prompt (sistema + persona)")
+    parser.add_argument("--context_cache_ttl", default="3600s", help="validade do cache de contexto")
+    parser.add_argument("--batch_gcs", default=None,
+                        help="gs://bucket/prefixo para entrada/saída do lote no Vertex")
+    parser.add_argument("--batch_poll", type=float, default=30.0,
+                        help="intervalo de consulta ao job de lote (s)")
+    add_pool_args(parser)
+
+
+def gemini_kwargs(args):
+    return dict(base_url=args.base_url, context_cache=args.context_cache,
+                cache_ttl=args.context_cache_ttl, batch_gcs=args.batch_gcs, batch_poll=args.batch_poll,
+                pool=make_pool(args), top_logprobs=args.top_logprobs)
+
+
+def make_backend(args, **kwargs):
+    """Backend escolhido em --backend; `kwargs` vão só para o backend real."""
+    if args.backend == "mock":
+        return get_backend("mock", args.model, latency=args.mock_latency)
+    return get_backend(args.backend, args.model, **kwargs)
+
+
+def _stream_only(args):
+    """Desliga, com aviso, o que precisa da entrada inteira (--stream)."""
+    for on, flag in ((args.adaptive, "--adaptive"),
+                     (args.consensus or args.resample_split, "--consensus/--resample_split"),
+                     (args.pack_compare_dir, "--pack_compare_dir"),
+                     (set(args.output) - {"csv"}, "--output parquet/arrow")):
+        if on:
+            print(f"! {flag} precisa da entrada inteira; ignorado com --stream")
+    args.adaptive, args.consensus, args.resample_split = False, False, 0
+    args.pack_compare_dir, args.output = None, ["csv"]
+
+
+class Sweep:
+    """
+    Uma varredura: o planejamento (blocos, cascata, --adaptive) fica aqui;
+    o despacho em polarity.dispatch, a entrega e a gravação em
+    polarity.delivery; `report` imprime e grava os resumos.
+    """
+
+    def __init__(self, args, backend, task, system, rate_limit, df, chunks):
+        self.args, self.backend, self.task = args, backend, task
+        self.df, self.chunks = df, chunks
+        self.out_dir = Path(args.out_dir)
+        self.prompt_dict = json.loads(Path(args.prompts).read_text(encoding="utf-8"))["prompts"]
+        self.stem    = input_stem(args)
+        self.partial = is_partial(args)
+        self.has_gold   = "label" in df
+        self.metrics_on = task.metrics and self.has_gold
+        self.gold = df["label"].tolist() if self.has_gold else [None] * len(df)
+
+        self.pack_size = max(1, args.pack_size)
+        if self.pack_size > 1 and not backend.json_mode:
+            print(f"! backend {backend.name} não tem saída JSON; --pack_size ignorado")
+            self.pack_size = 1
+
+        self.cache   = open_cache(args)
+        self.limiter = make_limiter(args) if rate_limit else None
+        params = backend.params()
+        # --decoding label: um rótulo por chamada, restrito a task.labels (polarity.decoding)
+        constrained = args.decoding == "label"
+        if constrained:
+            params = dict(params, decoding="label", top_logprobs=args.top_logprobs)
+        backend.prepare(system, list(self.prompt_dict.values()), df["text"], self.pack_size)
+
+        # com limitador, as retentativas (429/transitórios) e o timeout por
+        # tentativa ficam com ele (polarity.ratelimit); com --endpoints, o
+        # timeout cobre o failover por todos os servidores
+        self.engine = AsyncEngine(
+            concurrency=args.concurrency or backend.max_concurrency,
+            timeout=None if self.limiter else args.timeout * backend.attempts,
+            retries=0 if self.limiter else args.retries,
+        )
+        stores = open_stores(args, args.model, task.name, df["text"], self.gold, self.stem)
+
+        # fila global: todas as runs × prompts × manchetes
+        self.order = args.schedule or ("prefix" if backend.prefix_cache else "run")
+        batch_mode = getattr(args, "mode", "online") == "batch"   # só os scripts do Gemini têm --mode
+        self.setup = (f"backend={backend.name} · concorrência={self.engine.concurrency} · "
+                      f"ordem={self.order}{' · modo=batch' if batch_mode else ''}"
+                      f"{' · decodificação=label' if constrained else ''}")
+        if args.stream:
+            print(f"entrada em blocos de {args.chunk_rows} linhas "
+                  f"({args.runs} runs × {len(self.prompt_dict)} prompts por bloco) · {self.setup}")
+
+        # com --stream, latências por amostragem e diário carregado bloco a bloco
+        samples = RESERVOIR if args.stream else None
+        run_stats = {r: LatencyStats(samples)
+                     for r in range(1, args.runs + args.resample_split + 1)}
+        self.pack_report = PackReport(args.pack_compare_dir)
+        self.tracker = None
+        if args.adaptive:
+            self.tracker = StabilityTracker(list(self.prompt_dict), len(df), args.stable_k,
+                                            args.ci_eps if self.metrics_on else None, args.min_runs)
+        self.cascade = Cascade(args.cascade, args.cascade_threshold, task) if args.cascade else None
+        self.tally = None
+        if args.consensus or args.resample_split:
+            self.tally = VoteTally(list(self.prompt_dict), len(df), task.outputs)
+
+        self.stats = LatencyStats(samples)
+        # diário: cada resposta é gravada ao chegar; --resume pula o que já existe
+        self.journal = Journal(journal_path(self.out_dir, self.stem, args.model),
+                               resume=args.resume, windowed=args.stream)
+        self.tracer = Tracer(args.trace, model=args.model, total_rows=0,
+                             progress=False if args.no_progress else None, max_samples=samples)
+        self.writer = CellWriter(args, task, self.stem, self.out_dir, stores=stores,
+                                 pack_report=self.pack_report, tracker=self.tracker,
+                                 run_stats=run_stats, metrics_on=self.metrics_on,
+                                 partial=self.partial)
+        self.delivery = Delivery(self.journal, task, args.runs, self.tally)
+        self.dispatcher = Dispatcher(
+            args, backend, self.engine, task, system, cache=self.cache, limiter=self.limiter,
+            params=params, decode_labels=task.labels if constrained else None,
+            pack_size=self.pack_size, pack_report=self.pack_report, tracer=self.tracer,
+            run_stats=run_stats, sweep_stats=self.stats,
+            batch_path=self.out_dir / f"batch_{self.stem}" if batch_mode else None)
+
+    # --------------------------- planejamento -------------------------
+    def run(self):
+        for n_chunk, df in enumerate(chain([self.df], self.chunks), 1):
+            self.df = df
+            if n_chunk > 1:
+                self.gold = df["label"].tolist() if self.has_gold else [None] * len(df)
+            self._chunk(n_chunk, df)
+        self.run_metrics = self.writer.finish()
+        if self.args.resample_split and self.tally is not None:
+            self._resample()
+
+    def _chunk(self, n_chunk, df):
+        """Planeja e drena um bloco da entrada (a entrada inteira, sem --stream)."""
+        args, prompt_dict = self.args, self.prompt_dict
+        jobs = plan_jobs(prompt_dict, args.runs, df["text"], order=self.order)
+        if not args.stream:
+            print(f"{len(jobs)} requisições planejadas "
+                  f"({args.runs} runs × {len(prompt_dict)} prompts × {len(df)} linhas) · {self.setup}")
+        sink = ResultSink(len(df), len(prompt_dict), self.writer.save_cell, self.writer.run_done)
+        self.writer.start_chunk(df, self.gold)
+        self.journal.row_ids = df["row"].to_numpy() if self.partial else None
+        dedup = None
+        if args.dedup != "off":
+            dedup = Dedup(df["text"], args.dedup, args.dedup_threshold)
+            print(dedup.summary())
+        self.delivery.start_chunk(df["text"], sink, dedup)
+        local = {}   # prompt → {linha: rótulo} respondidas pelo modelo local (--cascade)
+        if self.cascade is not None:
+            local = self._route_local(n_chunk, df)
+            jobs = [j for j in jobs if j.row not in local.get(j.prompt, ())]
+        self.tracer.total_rows += len(jobs) if dedup is None else len(jobs) * dedup.n_reps // len(df)
+        # com --adaptive, uma rodada por run; linhas estáveis são preenchidas
+        for round_jobs in plan_rounds(jobs, prompt_dict, args.runs, df["text"].tolist(),
+                                      self.tracker, local, sink.add):
+            self.delivery.drain(round_jobs, self.dispatcher.run)
+        if args.stream:
+            print(f"=== BLOCO {n_chunk}: linhas {df['row'].iat[0]}–{df['row'].iat[-1]} "
+                  f"({len(df)}) · {self.dispatcher.n_sent} requisições até aqui")
+
+    def _route_local(self, n_chunk, df):
+        """--cascade: entrega as respostas do modelo local e grava o relatório de roteamento."""
+        local, report = self.cascade.answer(list(self.prompt_dict), df["text"].tolist(),
+                                            df["row"] if self.partial else df.index)
+        for key, answers in local.items():
+            for row, label in answers.items():
+                for run in range(1, self.args.runs + 1):
+                    self.delivery.deliver(
+                        Job(run, key, row, self.prompt_dict[key], df["text"].iat[row]), label)
+        if report is not None:
+            report.to_csv(self.out_dir / f"cascade_{self.stem}.csv", index=False,
+                          mode="w" if n_chunk == 1 else "a", header=n_chunk == 1)
+        return local
+
+    def _resample(self):
+        """--resample_split: amostras extras das linhas com votos divididos."""
+        df, args = self.df, self.args
+        split = {key: self.tally.split_rows(key) for key in self.prompt_dict}
+        extra = [Job(args.runs + i, key, row, prefix, df["text"].iat[row])
+                 for i in range(1, args.resample_split + 1)
+                 for key, prefix in self.prompt_dict.items()
+                 for row in split[key]]
+        print(f"reamostragem: {len(extra)} requisições extras para linhas com votos divididos")
+        self.delivery.drain(extra, self.dispatcher.run)
+
+    # ------------------------------ relatório -------------------------
+    def report(self):
+        """Fecha a varredura, imprime os resumos e grava métricas e estatísticas."""
+        args, backend, out_dir = self.args, self.backend, self.out_dir
+        dispatcher, tracker, cascade = self.dispatcher, self.tracker, self.cascade
+        self.tracer.close()
+        self.journal.close()
+        self.stats.stop()
+        if self.pack_size > 1:
+            print(self.pack_report.summary(self.stats.wall))
+        print(self.tracer.summary())
+        if prefill := self.tracer.prefill_summary():
+            print(prefill)
+        if args.trace:
+            pd.DataFrame(self.tracer.summary_rows()).to_csv(
+                Path(args.trace).with_suffix(".summary.csv"), index=False)
+        if self.tally is not None:
+            print(write_consensus(self.tally, out_dir, self.stem, self.df["text"], self.gold,
+                                  self.metrics_on))
+        if tracker is not None:
+            print(tracker.summary())
+            pd.DataFrame(tracker.report_rows()).to_csv(
+                out_dir / f"adaptive_{self.stem}.csv", index=False)
+
+        metrics_path = None
+        if self.metrics_on:
+            metrics_path = write_metrics_txt(out_dir, args.model, self.run_metrics,
+                                             list(self.prompt_dict))
+
+        n_sent, wall = dispatcher.n_sent, self.stats.wall
+        if args.stats_json:
+            stats = dict(self.stats.as_dict(), rows=n_sent, calls=dispatcher.n_calls,
+                         errors=dispatcher.n_errors, rows_per_s=n_sent / wall if wall > 0 else 0.0,
+                         backend=backend.name, model=args.model, task=self.task.name,
+                         concurrency=self.engine.concurrency, pack_size=self.pack_size,
+                         decoding=args.decoding)
+            if tracker is not None:
+                stats["saved"] = tracker.total_saved
+            if args.dedup != "off":
+                stats["dedup_copied"] = self.delivery.n_copied
+            if cascade is not None:
+                stats["cascade_local"] = sum(cascade.local.values()) * args.runs
+            if backend.pool is not None:
+                stats.update(backend.pool.as_dict())
+            if hasattr(backend, "endpoints"):
+                stats.update(backend.as_dict())
+            if self.limiter is not None:
+                stats.update(throttled=self.limiter.throttled, retries=self.limiter.retries,
+                             failures=self.limiter.failures)
+            Path(args.stats_json).write_text(json.dumps(stats, indent=2), encoding="utf-8")
+
+        self.engine.close()
+        backend.close()
+        self.cache.close()
+        print(self.cache.summary())
+        if args.dedup != "off":
+            print(f"dedup: {self.delivery.n_copied} respostas copiadas dos representantes")
+        if cascade is not None:
+            print(cascade.summary(args.runs))
+        if backend.pool is not None:
+            print(backend.pool.summary())
+        if hasattr(backend, "endpoints"):
+            print(backend.summary())
+        if self.limiter is not None:
+            print(self.limiter.summary())
+        print(f"\n✔ {n_sent} requisições em {wall:.1f}s; resultados em {out_dir}")
+        if metrics_path is not None:
+            print(f"✔ Métricas salvas em {metrics_path}")
+        return metrics_path
+
+
+def run_sweep(args, backend, task, system, rate_limit=False):
+    """Executa a varredura completa e grava os resultados em args.out_dir."""
+    if args.serve:
+        return serve(args, backend, task, system, rate_limit)
+    if args.input_csv is None:
+        raise SystemExit("--input_csv é obrigatório (exceto com --serve)")
+    Path(args.out_dir).mkdir(parents=True, exist_ok=True)
+    if args.stream:
+        _stream_only(args)
+
+    chunks = read_input(args)
+    df = next(chunks, None)
+    if df is None:
+        print("entrada vazia; nada a fazer")
+        return None
+    sweep = Sweep(args, backend, task, system, rate_limit, df, chunks)
+    sweep.run()
+    return sweep.report()
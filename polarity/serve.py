@@ -0,0 +1,408 @@
+"""
+Modo serviço (--serve): servidor HTTP local que mantém o backend
+aquecido (cliente, pool de conexões e modelo carregado) e agrupa as
+manchetes que chegam numa janela curta em micro-lotes.
+
+Cada micro-lote (até --max_batch itens ou --batch_window_ms) é
+deduplicado por (prompt, manchete), consultado no cache e, com
+--pack_size > 1, empacotado por prompt; as chamadas vão ao event loop
+do AsyncEngine, que fica rodando numa thread própria, com no máximo
+--concurrency chamadas em voo. Os prompts e a extração do rótulo são os
+mesmos da varredura.
+
+Cada requisição HTTP tem um prazo único, o pior caso das chamadas com
+retentativas (--timeout × tentativas, --retries e backoff). Estourado,
+os itens ainda pendentes são cancelados (não chegam ao backend se ainda
+estiverem na fila), contados em "expired" no /metrics, e a resposta é 504.
+
+Endpoints:
+  POST /classify  {"text": "..."} ou {"texts": [...]}, "prompts" opcional
+                  (padrão: todos os do JSON de prompts) →
+                  {"results": [{"text", "labels": {prompt: rótulo},
+                                "responses": {prompt: resposta}}], "ms"}
+                  (com --decoding label, também "confidence": {prompt: p})
+  GET  /metrics   fila, itens em voo, histograma de tamanhos de lote,
+                  latências p50/p95/p99, vazão em requisições/s e em itens/s
+                  (item = manchete × prompt; com --endpoints, também por servidor)
+  GET  /health
+
+Exemplo:
+  python local_models/classify_opprisk.py --serve --port 8765 --concurrency 4
+  python -m polarity.loadgen --url http://127.0.0.1:8765 --qps 20 --duration 30
+"""
+import asyncio, json, queue, threading, time
+from collections import defaultdict, deque
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+
+from polarity.backends import Request
+from polarity.cache import is_error, make_key, open_cache
+from polarity.decoding import confidence_many
+from polarity.engine import AsyncEngine
+from polarity.packing import pack_prompt, unpack_response
+from polarity.ratelimit import call_with_retries, estimate_tokens, make_limiter, retry_budget
+from polarity.stats import percentile
+
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+SIZING_TEXT   = "x" * 1000   # num_ctx="auto" dimensiona para manchetes até este tamanho
+OUT_TOKENS    = 20
+
+
+def add_serve_args(parser):
+    parser.add_argument("--serve", action="store_true",
+                        help="sobe o serviço HTTP de classificação em vez da varredura")
+    parser.add_argument("--host", default="127.0.0.1", help="endereço do serviço")
+    parser.add_argument("--port", type=int, default=8765, help="porta do serviço")
+    parser.add_argument("--batch_window_ms", type=float, default=10.0,
+                        help="janela de coalescência dos micro-lotes (ms)")
+    parser.add_argument("--max_batch", type=int, default=64, help="itens por micro-lote")
+
+
+class ServiceMetrics:
+    def __init__(self, window=10000):
+        self._lock = threading.Lock()
+        self.t0 = time.monotonic()
+        self.requests = self.items = self.errors = self.expired = 0
+        self.batches = self.batched = self.calls = self.cache_hits = self.coalesced = 0
+        self.in_flight = 0
+        self.hist = {b: 0 for b in BATCH_BUCKETS}
+        self.hist["more"] = 0
+        self.request_ms = deque(maxlen=window)
+        self.item_ms = deque(maxlen=window)
+        self._done = deque(maxlen=window)       # instantes de conclusão dos itens (vazão recente)
+        self._answered = deque(maxlen=window)   # idem, das requisições HTTP
+
+    def enqueue(self, n):
+        with self._lock:
+            self.in_flight += n
+
+    def batch(self, size, unique):
+        with self._lock:
+            self.batches += 1
+            self.batched += size
+            self.coalesced += size - unique
+            self.hist[next((b for b in BATCH_BUCKETS if size <= b), "more")] += 1
+
+    def item_done(self, ms, error):
+        with self._lock:
+            self.in_flight -= 1
+            self.item_ms.append(ms)
+            self.errors += error
+            self._done.append(time.monotonic())
+
+    def expire(self, n):
+        """Itens cancelados no prazo da requisição: saem do voo e contam como erro."""
+        with self._lock:
+            self.in_flight -= n
+            self.errors += n
+            self.expired += n
+
+    def request(self, n_items, ms):
+        with self._lock:
+            self.requests += 1
+            self.items += n_items
+            self.request_ms.append(ms)
+            self._answered.append(time.monotonic())
+
+    def as_dict(self, queue_depth):
+        with self._lock:
+            up = time.monotonic() - self.t0
+            now = time.monotonic()
+            recent = sum(1 for t in self._done if now - t <= 10.0)
+            recent_req = sum(1 for t in self._answered if now - t <= 10.0)
+            req, item = sorted(self.request_ms), sorted(self.item_ms)
+            return {
+                "uptime_s": up, "queue_depth": queue_depth, "in_flight": self.in_flight,
+                "requests": self.requests, "items": self.items, "errors": self.errors,
+                "expired": self.expired,
+                "batches": self.batches, "llm_calls": self.calls, "cache_hits": self.cache_hits,
+                "coalesced": self.coalesced,
+                "mean_batch": self.batched / self.batches if self.batches else 0.0,
+                "batch_size_hist": {str(k): v for k, v in self.hist.items()},
+                "requests_per_s": self.requests / up if up > 0 else 0.0,
+                "requests_per_s_10s": recent_req / 10.0,
+                "items_per_s": self.items / up if up > 0 else 0.0,
+                "items_per_s_10s": recent / 10.0,
+                "request_ms": {f"p{q}": percentile(req, q) for q in (50, 95, 99)},
+                "item_ms": {f"p{q}": percentile(item, q) for q in (50, 95, 99)},
+            }
+
+
+class Classifier:
+    """Backend aquecido + micro-lotes sobre o loop do AsyncEngine."""
+
+    def __init__(self, args, backend, task, system, rate_limit=False):
+        self.args = args
+        self.backend = backend
+        self.task = task
+        self.system = system
+        self.prompts = json.loads(Path(args.prompts).read_text(encoding="utf-8"))["prompts"]
+        self.pack_size = max(1, args.pack_size) if backend.json_mode else 1
+        self.cache = open_cache(args)
+        self.limiter = make_limiter(args) if rate_limit else None
+        self.params = backend.params()
+        self.labels = task.labels if args.decoding == "label" else None   # polarity.decoding
+        if self.labels:
+            self.params = dict(self.params, decoding="label", top_logprobs=args.top_logprobs)
+        backend.prepare(system, list(self.prompts.values()), [SIZING_TEXT] * self.pack_size,
+                        self.pack_size)
+        self.engine = AsyncEngine(concurrency=args.concurrency or backend.max_concurrency,
+                                  timeout=None if self.limiter else args.timeout * backend.attempts,
+                                  retries=0 if self.limiter else args.retries)
+        if self.limiter is not None:
+            attempt = retry_budget(args.timeout * backend.attempts, self.limiter.max_retries)
+            attempt *= 1 + self.pack_size if self.pack_size > 1 else 1   # pacote + refeitas isoladas
+        else:
+            attempt = retry_budget(self.engine.timeout, self.engine.retries, self.engine.backoff,
+                                   float("inf"))
+        self.deadline_s = attempt + args.batch_window_ms / 1000   # prazo de uma requisição HTTP
+        self.metrics = ServiceMetrics()
+        self.queue = queue.Queue()
+        self._sem = None
+        threading.Thread(target=self.engine.loop.run_forever, daemon=True).start()
+        threading.Thread(target=self._batcher, daemon=True).start()
+
+    # ------------------------------ chamadas -----------------------------
+    def _key(self, prefix, text, params):
+        if not self.cache.enabled:
+            return None
+        return make_key(self.backend.name, self.backend.model, self.system, prefix, text, params)
+
+    async def _send(self, req):
+        span = defaultdict(float)
+        if self.limiter is None:
+            return await self.backend.acomplete(req, span)
+        tokens = estimate_tokens(req.prompt, OUT_TOKENS * max(1, req.n_items))
+        return await call_with_retries(lambda: self.backend.acomplete(req, span),
+                                       self.limiter, tokens, span=span,
+                                       timeout=self.args.timeout * self.backend.attempts)
+
+    async def _single(self, prefix, text):
+        key = self._key(prefix, text, self.params)
+        if key is not None and (hit := self.cache.get(key)) is not None:
+            self.metrics.cache_hits += 1
+            return hit
+        self.metrics.calls += 1
+        out = await self._send(Request(self.system, prefix + text, self.labels))
+        if key is not None:
+            self.cache.put(key, out)
+        return out
+
+    async def _pack(self, pack):
+        """pack: [(prompt, texto)] do mesmo prompt → respostas (rótulos ou respostas livres)."""
+        prefix = self.prompts[pack[0][0]]
+        texts = [t for _, t in pack]
+        if len(pack) == 1:
+            return [await self._single(prefix, texts[0])]
+        key = self._key(prefix, "\n".join(texts), dict(self.params, pack=len(pack)))
+        raw = self.cache.get(key) if key is not None else None
+        if raw is None:
+            self.metrics.calls += 1
+            try:
+                raw = await self._send(Request(self.system, pack_prompt(prefix, texts),
+                                               self.task.labels, len(pack)))
+            except Exception:
+                raw = ""
+        labels = unpack_response(raw, len(pack), list(self.task.labels))
+        if key is not None and None not in labels:
+            self.cache.put(key, raw)
+        return [lab if lab is not None else await self._single(prefix, t)
+                for lab, t in zip(labels, texts)]
+
+    async def _run(self, items):
+        """items: [(prompt, texto, Future, t0)]; uma chamada por (prompt, texto) distinto."""
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.engine.concurrency)
+        waiting = {}
+        for prompt, text, fut, t0 in items:
+            waiting.setdefault((prompt, text), []).append((fut, t0))
+        self.metrics.batch(len(items), len(waiting))
+        by_prompt = {}
+        for prompt, text in waiting:
+            by_prompt.setdefault(prompt, []).append((prompt, text))
+        packs = [group[i:i + self.pack_size] for group in by_prompt.values()
+                 for i in range(0, len(group), self.pack_size)]
+
+        async def one(pack):
+            async with self._sem:
+                # itens cujas requisições já estouraram o prazo não vão ao backend
+                pack = [item for item in pack
+                        if not all(fut.cancelled() for fut, _ in waiting[item])]
+                if not pack:
+                    return
+                out = await self.engine.call(self._pack, pack)
+            if isinstance(out, str):   # erro definitivo do engine vale para o pacote
+                out = [out] * len(pack)
+            for item, resp in zip(pack, out):
+                for fut, t0 in waiting[item]:
+                    self._settle(fut, t0, is_error(resp), resp)
+
+        # todos os pacotes terminam antes de uma falha propagar (ver _failed)
+        for res in await asyncio.gather(*(one(p) for p in packs), return_exceptions=True):
+            if isinstance(res, BaseException):
+                raise res
+
+    def _failed(self, items, done):
+        """Callback do micro-lote: se `_run` falhou, quem ainda espera recebe a exceção."""
+        exc = asyncio.CancelledError() if done.cancelled() else done.exception()
+        if exc is None:
+            return
+        for _, _, fut, t0 in items:
+            if not fut.done():
+                self._settle(fut, t0, True, exc=exc)
+
+    def _settle(self, fut, t0, error, resp=None, exc=None):
+        """Entrega o resultado; um item já cancelado pelo prazo foi contado em `expire`."""
+        try:
+            if exc is not None:
+                fut.set_exception(exc)
+            else:
+                fut.set_result(resp)
+        except InvalidStateError:
+            return
+        self.metrics.item_done((time.perf_counter() - t0) * 1000, error)
+
+    def _batcher(self):
+        window = self.args.batch_window_ms / 1000
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + window
+            while len(batch) < self.args.max_batch:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=left))
+                except queue.Empty:
+                    break
+            done = asyncio.run_coroutine_threadsafe(self._run(batch), self.engine.loop)
+            done.add_done_callback(lambda f, batch=batch: self._failed(batch, f))
+
+    # ------------------------------ interface ----------------------------
+    def classify(self, texts, prompts=None):
+        """Lista de {"text", "labels", "responses"}; bloqueia até as respostas chegarem."""
+        prompts = list(prompts or self.prompts)
+        unknown = [p for p in prompts if p not in self.prompts]
+        if unknown:
+            raise KeyError(f"prompts desconhecidos: {unknown}")
+        t0 = time.perf_counter()
+        items = [(p, text, Future(), t0) for text in texts for p in prompts]
+        self.metrics.enqueue(len(items))
+        for item in items:
+            self.queue.put(item)
+        futs = [fut for _, _, fut, _ in items]
+        deadline = t0 + self.deadline_s
+        try:
+            for fut in futs:
+                fut.result(timeout=max(0.0, deadline - time.perf_counter()))
+        except FutureTimeout:
+            self.metrics.expire(sum(fut.cancel() for fut in futs))
+            raise TimeoutError(f"sem resposta em {self.deadline_s:.1f}s") from None
+        out = []
+        it = iter(futs)
+        for text in texts:
+            responses = {p: next(it).result() for p in prompts}
+            res = {"text": text, "responses": responses,
+                   "labels": {p: self.task.detect(r) for p, r in responses.items()}}
+            if self.labels:
+                conf = confidence_many(list(responses.values()))
+                res["confidence"] = {p: None if np.isnan(c) else float(c)
+                                     for p, c in zip(responses, conf)}
+            out.append(res)
+        self.metrics.request(len(futs), (time.perf_counter() - t0) * 1000)
+        return out
+
+    def warmup(self):
+        t = time.perf_counter()
+        prompt = next(iter(self.prompts))
+        fut = asyncio.run_coroutine_threadsafe(
+            self._send(Request(self.system, self.prompts[prompt] + "Warm-up headline.")),
+            self.engine.loop)
+        try:
+            fut.result(timeout=self.args.timeout)
+            print(f"backend aquecido em {time.perf_counter() - t:.1f}s")
+        except Exception as e:
+            print(f"! aquecimento falhou: {e}")
+
+    def stats(self):
+        out = self.metrics.as_dict(self.queue.qsize())
+        if hasattr(self.backend, "endpoints"):
+            out.update(self.backend.as_dict())
+        return out
+
+    def close(self):
+        self.engine.loop.call_soon_threadsafe(self.engine.loop.stop)
+        self.backend.close()
+        self.cache.close()
+
+
+def make_handler(clf):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *a):
+            pass
+
+        def _send(self, code, obj):
+            body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            if path == "/metrics":
+                self._send(200, clf.stats())
+            elif path == "/health":
+                self._send(200, {"status": "ok", "backend": clf.backend.name,
+                                 "model": clf.backend.model, "task": clf.task.name,
+                                 "prompts": list(clf.prompts)})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path.split("?", 1)[0] != "/classify":
+                self._send(404, {"error": "not found"})
+                return
+            t = time.perf_counter()
+            try:
+                req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                texts = req["texts"] if "texts" in req else [req["text"]]
+                results = clf.classify([str(x) for x in texts], req.get("prompts"))
+            except (KeyError, ValueError, TypeError) as e:
+                self._send(400, {"error": str(e)})
+                return
+            except TimeoutError as e:
+                self._send(504, {"error": str(e)})
+                return
+            except Exception as e:
+                self._send(500, {"error": f"{type(e).__name__}: {e}"})
+                return
+            self._send(200, {"results": results, "ms": (time.perf_counter() - t) * 1000})
+
+    return Handler
+
+
+def serve(args, backend, task, system, rate_limit=False):
+    """Sobe o serviço e atende até Ctrl+C."""
+    clf = Classifier(args, backend, task, system, rate_limit)
+    clf.warmup()
+    srv = ThreadingHTTPServer((args.host, args.port), make_handler(clf))
+    srv.daemon_threads = True
+    print(f"serviço {task.name} · backend={backend.name} · modelo={backend.model} · "
+          f"{len(clf.prompts)} prompts · concorrência={clf.engine.concurrency} · "
+          f"janela={args.batch_window_ms:g}ms · lote≤{args.max_batch} · pack={clf.pack_size}")
+    print(f"ouvindo em http://{args.host}:{srv.server_address[1]} (POST /classify, GET /metrics)")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.server_close()
+        print(json.dumps(clf.stats(), indent=2))
+        clf.close()
@@ -0,0 +1,75 @@
+"""
+Estatísticas de latência / vazão de uma execução (run).
+
+Com `max_samples` (--stream), os percentis saem de uma amostra uniforme
+de tamanho fixo (reservoir sampling) e a memória não cresce com o corpus;
+sem, de todas as latências.
+"""
+import random, threading, time
+
+RESERVOIR = 10_000   # latências guardadas por série com --stream
+
+
+def percentile(sorted_vals, q):
+    """Percentil por interpolação linear (q em [0, 100])."""
+    if not sorted_vals:
+        return 0.0
+    pos = (len(sorted_vals) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_vals) - 1)
+    return sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (pos - lo)
+
+
+class Reservoir:
+    """Amostra uniforme de até `size` valores de uma série (algoritmo R); sem `size`, todos."""
+
+    def __init__(self, size=None, seed=0):
+        self.size = size
+        self.n = 0
+        self.values = []
+        self._rng = random.Random(seed)
+
+    def add(self, x):
+        self.n += 1
+        if self.size is None or len(self.values) < self.size:
+            self.values.append(x)
+            return
+        i = self._rng.randrange(self.n)
+        if i < self.size:
+            self.values[i] = x
+
+
+class LatencyStats:
+    def __init__(self, max_samples=None):
+        self._lock = threading.Lock()
+        self.sample = Reservoir(max_samples)
+        self.t0 = time.perf_counter()
+        self.t1 = None
+
+    def record(self, seconds):
+        with self._lock:
+            self.sample.add(seconds)
+
+    def stop(self):
+        self.t1 = time.perf_counter()
+
+    @property
+    def wall(self):
+        return (self.t1 or time.perf_counter()) - self.t0
+
+    def as_dict(self):
+        lat = sorted(self.sample.values)
+        n, wall = self.sample.n, self.wall
+        return {
+            "n": n,
+            "wall_s": wall,
+            "qps": n / wall if wall > 0 else 0.0,
+            "p50_ms": percentile(lat, 50) * 1000,
+            "p95_ms": percentile(lat, 95) * 1000,
+            "p99_ms": percentile(lat, 99) * 1000,
+        }
+
+    def summary(self) -> str:
+        d = self.as_dict()
+        return (f"n={d['n']}, wall={d['wall_s']:.1f}s, qps={d['qps']:.2f}, "
+                f"p50={d['p50_ms']:.0f}ms, p95={d['p95_ms']:.0f}ms, p99={d['p99_ms']:.0f}ms")
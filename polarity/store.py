@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Armazenamento colunar (Parquet / Arrow IPC) dos resultados, como
+alternativa aos 40 CSVs por varredura que repetem `text` e `label`.
+
+Layout (particionado no estilo hive):
+
+  <root>/texts/<stem>.<ext>                       row_id, text, label (uma vez;
+                                                  regravado se o conteúdo mudar)
+  <root>/results/model=<m>/task=<t>/prompt=<p>/run=<k>/<stem>.<ext>
+                                                  row_id, response, responseLabel
+
+`responseLabel` é gravado com dictionary encoding. No formato "arrow"
+(IPC sem compressão) os arquivos são abertos via memory map, sem cópia.
+A exportação para os CSVs legados continua disponível:
+
+  python -m polarity.store export <root> --out_dir results_csv
+  python -m polarity.store info   <root>
+"""
+import argparse, hashlib
+from pathlib import Path
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+    from pyarrow import fs
+except ImportError:  # dependência opcional
+    pa = None
+
+EXT = {"parquet": "parquet", "arrow": "arrow"}
+DIGEST = b"polarity.sha256"   # metadado do arquivo de textos: hash de (text, label)
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("--output parquet/arrow requer pyarrow (pip install pyarrow)")
+
+
+def _safe(name: str) -> str:
+    return name.replace(":", "-").replace("/", "-")
+
+
+def _digest(texts, gold):
+    h = hashlib.sha256()
+    for t, g in zip(texts, gold):
+        h.update(f"{t}\x1f{g}\x1e".encode("utf-8"))
+    return h.hexdigest().encode()
+
+
+def _stored_digest(path, fmt):
+    """Hash gravado em `path` (None se o arquivo não existe ou não o tem)."""
+    if not path.exists():
+        return None
+    schema = pq.read_schema(path) if fmt == "parquet" else pa.ipc.open_file(path).schema
+    return (schema.metadata or {}).get(DIGEST)
+
+
+def _write(table, path, fmt):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if fmt == "parquet":
+        pq.write_table(table, path)
+    else:
+        feather.write_feather(table, path, compression="uncompressed")
+
+
+class ColumnarStore:
+    """Grava uma varredura (um modelo, uma tarefa, um CSV de entrada)."""
+
+    def __init__(self, root, fmt, model, task, stem, texts, gold):
+        _require_pyarrow()
+        self.root = Path(root)
+        self.fmt = fmt
+        self.model = _safe(model)
+        self.task = task
+        self.stem = stem
+        # mesmo stem com outro conteúdo (CSV editado, --rows diferente): regrava
+        texts_path = self.root / "texts" / f"{stem}.{EXT[fmt]}"
+        digest = _digest(texts, gold)
+        if _stored_digest(texts_path, fmt) != digest:
+            _write(pa.table({
+                "row_id": pa.array(range(len(texts)), pa.int32()),
+                "text": pa.array(list(texts), pa.string()),
+                "label": pa.array(list(gold), pa.string()).dictionary_encode(),
+            }).replace_schema_metadata({DIGEST: digest}), texts_path, fmt)
+
+    def write_cell(self, prompt, run, responses, labels):
+        table = pa.table({
+            "row_id": pa.array(range(len(responses)), pa.int32()),
+            "response": pa.array(list(responses), pa.string()),
+            "responseLabel": pa.array(list(labels), pa.string()).dictionary_encode(),
+        })
+        path = (self.root / "results" / f"model={self.model}" / f"task={self.task}"
+                / f"prompt={prompt}" / f"run={run}" / f"{self.stem}.{EXT[self.fmt]}")
+        _write(table, path, self.fmt)
+
+
+def _detect_format(root):
+    for fmt, ext in EXT.items():
+        if next(Path(root, "results").rglob(f"*.{ext}"), None) is not None:
+            return fmt
+    raise FileNotFoundError(f"nenhum resultado em {root}/results")
+
+
+def open_results(root, fmt=None):
+    """
+    Dataset particionado com colunas row_id, response, responseLabel e as
+    partições model/task/prompt/run. Arquivos arrow são lidos via mmap.
+    """
+    _require_pyarrow()
+    fmt = fmt or _detect_format(root)
+    return ds.dataset(
+        str(Path(root) / "results"),
+        format="ipc" if fmt == "arrow" else "parquet",
+        partitioning="hive",
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+    )
+
+
+def load_texts(root, stem, fmt=None):
+    _require_pyarrow()
+    fmt = fmt or _detect_format(root)
+    path = Path(root) / "texts" / f"{stem}.{EXT[fmt]}"
+    if fmt == "arrow":
+        return feather.read_table(path, memory_map=True)
+    return pq.read_table(path, memory_map=True)
+
+
+def export_csv(root, out_dir):
+    """Reconstrói os CSVs legados `<stem>_<prompt>_run<k>.csv` (text, label, response, responseLabel)."""
+    fmt = _detect_format(root)
+    n = 0
+    for path in sorted(Path(root, "results").rglob(f"*.{EXT[fmt]}")):
+        parts = dict(p.split("=", 1) for p in path.relative_to(Path(root, "results")).parts[:-1])
+        stem = path.stem
+        texts = load_texts(root, stem, fmt).to_pandas()
+        res = (feather.read_table(path, memory_map=True) if fmt == "arrow"
+               else pq.read_table(path)).to_pandas()
+        df = texts.merge(res, on="row_id").sort_values("row_id")
+        dest = Path(out_dir) / f"model={parts['model']}" / f"task={parts['task']}"
+        dest.mkdir(parents=True, exist_ok=True)
+        df[["text", "label", "response", "responseLabel"]].astype(
+            {"label": str, "responseLabel": str}
+        ).to_csv(dest / f"{stem}_{parts['prompt']}_run{parts['run']}.csv", index=False)
+        n += 1
+    return n
+
+
+def add_output_args(parser):
+    parser.add_argument("--output", nargs="+", choices=("csv", "parquet", "arrow"),
+                        default=["csv"],
+                        help="formatos de saída: csv (legado), parquet e/ou arrow (colunar)")
+    parser.add_argument("--store_dir", default=None,
+                        help="raiz do dataset colunar (padrão: <out_dir>/dataset)")
+
+
+def open_stores(args, model, task, texts, gold, stem=None):
+    """Um ColumnarStore por formato colunar pedido em --output."""
+    root = Path(args.store_dir) if args.store_dir else Path(args.out_dir) / "dataset"
+    stem = stem or Path(args.input_csv).stem
+    return [ColumnarStore(root, fmt, model, task, stem, texts, gold)
+            for fmt in args.output if fmt != "csv"]
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Dataset colunar de resultados")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ex = sub.add_parser("export", help="exporta para os CSVs legados")
+    ex.add_argument("root")
+    ex.add_argument("--out_dir", required=True)
+    info = sub.add_parser("info", help="resume o conteúdo do dataset")
+    info.add_argument("root")
+    a = ap.parse_args()
+    if a.cmd == "export":
+        print(f"{export_csv(a.root, a.out_dir)} CSVs exportados para {a.out_dir}")
+    else:
+        t = open_results(a.root).to_table(columns=["model", "task", "prompt", "run"])
+        print(t.group_by(["model", "task", "prompt"]).aggregate([("run", "count_distinct")])
+               .to_pandas().to_string(index=False))
@@ -0,0 +1,131 @@
+"""
+Leitura da entrada em blocos (--stream) e fatias por processo (--rows,
+--shard).
+
+Sem --stream o CSV é lido inteiro, como sempre. Com --stream a entrada
+(CSV, JSONL ou stdin com --input_csv -) é lida em blocos de
+--chunk_rows linhas; cada bloco passa pela varredura completa
+(runs × prompts) e suas linhas são acrescentadas aos CSVs de saída ao
+fim do bloco, de modo que a memória depende do bloco, não do corpus.
+As métricas são acumuladas em contagens (ouro, predição).
+
+--rows A:B e --shard I/N escolhem as linhas deste processo pelo id
+global (posição na entrada, a partir de 0). Vários processos dividem um
+corpus no mesmo out_dir (--shard 0/4 … 3/4): cada um grava CSVs e
+diário próprios (sufixo _rowsA-B / _shardIofN) com a coluna `row`.
+
+Exemplo:
+  zcat feed.jsonl.gz | python local_models/classify_posneg.py \
+      --input_csv - --input_format jsonl --stream --shard 0/4 --runs 3
+"""
+import argparse, sys
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from polarity.metrics import compute_metrics_counts
+
+
+def row_range(spec):
+    """"A:B" → (A, B); B=None até o fim."""
+    try:
+        a, b = spec.split(":")
+        a, b = int(a or 0), (int(b) if b else None)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"intervalo inválido: {spec!r} (use A:B)")
+    if a < 0 or (b is not None and b <= a):
+        raise argparse.ArgumentTypeError(f"intervalo vazio ou negativo: {spec!r}")
+    return a, b
+
+
+def shard(spec):
+    """"I/N" → (I, N), 0 ≤ I < N."""
+    try:
+        i, n = (int(x) for x in spec.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"shard inválido: {spec!r} (use I/N)")
+    if not 0 <= i < n:
+        raise argparse.ArgumentTypeError(f"shard fora do intervalo: {spec!r}")
+    return i, n
+
+
+def add_stream_args(parser):
+    parser.add_argument("--stream", action="store_true",
+                        help="lê a entrada em blocos e grava os CSVs a cada bloco (memória limitada)")
+    parser.add_argument("--chunk_rows", type=int, default=5000, help="linhas por bloco com --stream")
+    parser.add_argument("--input_format", choices=("auto", "csv", "jsonl"), default="auto",
+                        help="formato da entrada (auto: pela extensão; stdin é CSV)")
+    parser.add_argument("--rows", type=row_range, default=None,
+                        help="só as linhas A:B da entrada (ids a partir de 0; A ou B podem faltar)")
+    parser.add_argument("--shard", type=shard, default=None,
+                        help="I/N: só as linhas com id %% N == I (divide o corpus entre processos)")
+
+
+def is_partial(args):
+    """Entrada em blocos ou fatiada: as saídas levam a coluna `row`."""
+    return args.stream or args.rows is not None or args.shard is not None
+
+
+def input_stem(args):
+    """Nome base das saídas, com o sufixo da fatia deste processo."""
+    stem = "stdin" if args.input_csv == "-" else Path(args.input_csv).stem
+    if args.rows is not None:
+        a, b = args.rows
+        stem += f"_rows{a}-{'' if b is None else b}"
+    if args.shard is not None:
+        stem += f"_shard{args.shard[0]}of{args.shard[1]}"
+    return stem
+
+
+def read_input(args):
+    """
+    DataFrames (row, text[, label]) com as linhas deste processo: um só
+    sem --stream, blocos de --chunk_rows com --stream.
+    """
+    src = sys.stdin if args.input_csv == "-" else args.input_csv
+    fmt = args.input_format
+    if fmt == "auto":
+        fmt = "jsonl" if str(args.input_csv).endswith((".jsonl", ".ndjson")) else "csv"
+    start, stop = args.rows or (0, None)
+    chunksize = args.chunk_rows if args.stream else None
+
+    if fmt == "csv":
+        # o CSV pula as linhas anteriores a A sem interpretá-las
+        reader = pd.read_csv(src, chunksize=chunksize,
+                             skiprows=range(1, start + 1) if start else None,
+                             nrows=None if stop is None else stop - start)
+        offset = start
+    else:
+        reader = pd.read_json(src, lines=True, dtype=False, chunksize=chunksize, nrows=stop)
+        offset = 0
+    chunks = [reader] if chunksize is None else reader
+
+    for chunk in chunks:
+        ids = np.arange(offset, offset + len(chunk))
+        offset += len(chunk)
+        keep = ids >= start
+        if args.shard is not None:
+            keep &= ids % args.shard[1] == args.shard[0]
+        if not keep.all():
+            chunk, ids = chunk[keep], ids[keep]
+        out = pd.DataFrame({"row": ids, "text": chunk["text"].to_numpy()})
+        if "label" in chunk:
+            out["label"] = chunk["label"].to_numpy()
+        if len(out) or chunksize is None:
+            yield out
+
+
+class StreamMetrics:
+    """Métricas por (prompt, run) a partir de contagens (ouro, predição) somadas bloco a bloco."""
+
+    def __init__(self):
+        self.pairs = {}
+
+    def add(self, prompt, run, gold, preds):
+        self.pairs.setdefault((prompt, run), Counter()).update(zip(gold, preds))
+
+    def rows(self):
+        return [dict(compute_metrics_counts(c), prompt=p, run=r)
+                for (p, r), c in self.pairs.items()]
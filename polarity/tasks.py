@@ -0,0 +1,36 @@
+"""
+Definição das tarefas de classificação (conjunto de rótulos e detecção
+do rótulo na resposta do modelo, via polarity.labels).
+"""
+from polarity.labels import LabelParser, UNDETERMINED
+
+
+class Task:
+    def __init__(self, name, labels, lowercase=False, metrics=False):
+        self.name = name
+        self.labels = tuple(labels)
+        self.lowercase = lowercase   # local_models/posneg grava rótulos em minúsculas
+        self.metrics = metrics       # grava o TXT de métricas ao fim da varredura
+        self.parser = LabelParser(self.labels)
+
+    @property
+    def outputs(self):
+        """
+        Valores de `detect` para respostas válidas, na ordem de `labels`,
+        mais "undetermined" ("error" só aparece para falhas da chamada).
+        """
+        return tuple(l.lower() if self.lowercase else l for l in self.labels) + (UNDETERMINED,)
+
+    def detect(self, text: str) -> str:
+        """Rótulo da resposta, "error" (falha da chamada) ou "undetermined"."""
+        label = self.parser.parse(text)
+        return label.lower() if self.lowercase else label
+
+    def detect_many(self, responses) -> list:
+        """`detect` sobre uma coluna inteira de respostas."""
+        labels = self.parser.parse_many(responses)
+        return [l.lower() for l in labels] if self.lowercase else labels.tolist()
+
+
+OPPRISK = Task("opprisk", ("Risk", "Opportunity"), metrics=True)
+POSNEG  = Task("posneg", ("Positive", "Negative"))
@@ -0,0 +1,174 @@
+"""
+Rastreamento por requisição da varredura.
+
+Cada chamada do engine (uma manchete ou um pacote) gera um span com:
+
+  queue_ms       espera na fila do engine, da entrada na fila (`enqueue`)
+                 até um worker pegar o item (0 nas retentativas)
+  throttle_ms    espera no limitador de taxa (RPM/TPM)
+  send_ms        tempo dentro do backend (rede + modelo), somando retentativas
+  first_byte_ms  tempo até o primeiro token no servidor (Ollama: load + prefill)
+  prefill_ms / decode_ms   prompt_eval_duration / eval_duration do Ollama
+  total_ms       do início do work até a resposta
+  tokens_in / tokens_out   Ollama prompt_eval_count / eval_count,
+                 Gemini usage_metadata
+  tokens_sent    estimativa (~4 caracteres/token) do prompt completo enviado
+  retries, cache_hits, error (classe da exceção)
+
+Os spans vão para um JSONL (--trace); uma linha de progresso (linhas/s e
+ETA) é atualizada no stderr e, ao fim, sai um resumo por (modelo, prompt);
+com `max_samples` (--stream), p50/p95 do resumo vêm de uma amostra de
+tamanho fixo dos total_ms (polarity.stats.Reservoir).
+
+No Ollama, prompt_eval_count conta só os tokens que passaram pelo
+prefill (o prefixo em cache é pulado); comparado a tokens_sent, dá a
+economia de prefill por run (`prefill_summary`).
+"""
+import json, sys, time
+
+from polarity.stats import Reservoir, percentile
+
+SPAN_SUMS = ("queue_ms", "throttle_ms", "send_ms", "prefill_ms", "decode_ms",
+             "tokens_in", "tokens_out", "retries", "cache_hits")
+
+
+def _fmt_eta(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    return f"{seconds // 60}m{seconds % 60:02d}s"
+
+
+class Tracer:
+    def __init__(self, path=None, model=None, total_rows=0, progress=None, every=0.5,
+                 max_samples=None):
+        self.file = open(path, "a", encoding="utf-8") if path else None
+        self.model = model
+        self.total_rows = total_rows
+        self.progress = sys.stderr.isatty() if progress is None else progress
+        self.every = every
+        self.max_samples = max_samples
+        self.t0 = time.perf_counter()
+        self.rows_done = 0
+        self.errors = 0
+        self._last_draw = 0.0
+        self._groups = {}   # (modelo, prompt) → agregados
+        self._runs = {}     # run → [prefill_ms, tokens_in, tokens_sent]
+        self._enqueued = {}  # id(pacote) → instante em que entrou na fila
+
+    # ----------------------------- spans ------------------------------
+    def enqueue(self, packs):
+        """Marca a entrada dos pacotes na fila do engine."""
+        now = time.perf_counter()
+        self._enqueued.update((id(pack), now) for pack in packs)
+
+    def start(self, pack):
+        now = time.perf_counter()
+        queued = self._enqueued.pop(id(pack), now)
+        return {
+            "ts": time.time(),
+            "model": self.model,
+            "run": pack[0].run,
+            "prompt": pack[0].prompt,
+            "rows": [j.row for j in pack],
+            "t_start": now,
+            "queue_ms": (now - queued) * 1000,
+            "throttle_ms": 0.0, "send_ms": 0.0,
+            "tokens_in": 0, "tokens_out": 0, "tokens_sent": 0,
+            "retries": 0, "cache_hits": 0,
+        }
+
+    def finish(self, span):
+        span["total_ms"] = (time.perf_counter() - span.pop("t_start")) * 1000
+        g = self._groups.setdefault((span["model"], span["prompt"]), {
+            "calls": 0, "rows": 0, "errors": 0, "total_ms": Reservoir(self.max_samples),
+            **{k: 0 for k in SPAN_SUMS},
+        })
+        g["calls"] += 1
+        g["rows"] += len(span["rows"])
+        g["errors"] += "error" in span
+        g["total_ms"].add(span["total_ms"])
+        for k in SPAN_SUMS:
+            g[k] += span.get(k) or 0
+        r = self._runs.setdefault(span["run"], [0.0, 0, 0])
+        r[0] += span.get("prefill_ms", 0.0)
+        r[1] += span["tokens_in"]
+        r[2] += span["tokens_sent"]
+        if self.file is not None:
+            rounded = {k: round(v, 2) if isinstance(v, float) and k != "ts" else v
+                       for k, v in span.items()}
+            self.file.write(json.dumps(rounded, ensure_ascii=False) + "\n")
+
+    # --------------------------- progresso ----------------------------
+    def advance(self, rows, errors=0):
+        self.rows_done += rows
+        self.errors += errors
+        now = time.perf_counter()
+        if self.progress and (now - self._last_draw >= self.every
+                              or self.rows_done >= self.total_rows):
+            self._last_draw = now
+            self._draw(now)
+
+    def _draw(self, now):
+        elapsed = now - self.t0
+        rate = self.rows_done / elapsed if elapsed > 0 else 0.0
+        left = max(0, self.total_rows - self.rows_done)
+        eta = _fmt_eta(left / rate) if rate > 0 else "?"
+        sys.stderr.write(f"\r\x1b[K[{self.rows_done}/{self.total_rows}] "
+                         f"{rate:.1f} linhas/s · ETA {eta} · erros {self.errors}")
+        sys.stderr.flush()
+
+    # ----------------------------- resumo -----------------------------
+    def summary_rows(self):
+        out = []
+        for (model, prompt), g in self._groups.items():
+            lat = sorted(g["total_ms"].values)
+            calls = g["calls"]
+            out.append({
+                "model": model, "prompt": prompt,
+                "calls": calls, "rows": g["rows"], "errors": g["errors"],
+                "retries": g["retries"], "cache_hits": g["cache_hits"],
+                "p50_ms": percentile(lat, 50), "p95_ms": percentile(lat, 95),
+                "queue_ms_mean": g["queue_ms"] / calls,
+                "throttle_ms_mean": g["throttle_ms"] / calls,
+                "send_ms_mean": g["send_ms"] / calls,
+                "prefill_ms_mean": g["prefill_ms"] / calls,
+                "decode_ms_mean": g["decode_ms"] / calls,
+                "tokens_in": g["tokens_in"], "tokens_out": g["tokens_out"],
+            })
+        return out
+
+    def summary(self) -> str:
+        lines = ["resumo por (modelo, prompt):"]
+        for r in self.summary_rows():
+            lines.append(
+                f"  {r['model']} · {r['prompt']}: {r['rows']} linhas/{r['calls']} chamadas, "
+                f"p50={r['p50_ms']:.0f}ms p95={r['p95_ms']:.0f}ms, "
+                f"throttle={r['throttle_ms_mean']:.0f}ms send={r['send_ms_mean']:.0f}ms "
+                f"prefill={r['prefill_ms_mean']:.0f}ms decode={r['decode_ms_mean']:.0f}ms (médias), "
+                f"tokens={r['tokens_in']}→{r['tokens_out']}, "
+                f"retentativas={r['retries']}, erros={r['errors']}"
+            )
+        return "\n".join(lines)
+
+    def prefill_summary(self) -> str:
+        """
+        Prefill por run e economia estimada pelo reuso de prefixo:
+        (tokens enviados - tokens avaliados) × custo médio por token avaliado.
+        """
+        lines = []
+        for run, (prefill_ms, evaluated, sent) in sorted(self._runs.items()):
+            if prefill_ms <= 0 or evaluated <= 0:
+                continue
+            reused = max(0, sent - evaluated)
+            saved = reused * prefill_ms / evaluated
+            lines.append(f"  run {run}: prefill {prefill_ms:.0f}ms em {evaluated} tokens avaliados "
+                         f"de ~{sent} enviados (reuso ~{reused / sent:.0%}), "
+                         f"economia estimada ~{saved:.0f}ms")
+        return "prefill por run:\n" + "\n".join(lines) if lines else ""
+
+    def close(self):
+        if self.progress:
+            sys.stderr.write("\n")
+        if self.file is not None:
+            self.file.close()
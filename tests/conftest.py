@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# permite `pytest` a partir de qualquer diretório, sem instalar o pacote
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
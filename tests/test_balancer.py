@@ -0,0 +1,74 @@
+import asyncio, time
+
+import pytest
+
+from polarity.backends import Request
+from polarity.backends.balancer import BalancedBackend
+from polarity.backends.base import Backend
+
+REQ = Request("sys", "Classify: x")
+
+
+class Server(Backend):
+    max_concurrency = 4
+
+    def __init__(self, delay=0.0, answer="Risk"):
+        super().__init__("m")
+        self.delay, self.answer = delay, answer
+
+    def complete(self, req, span=None):
+        time.sleep(self.delay)
+        return self.answer
+
+    async def acomplete(self, req, span=None):
+        await asyncio.sleep(self.delay)
+        return self.answer
+
+
+def balanced(*servers, timeout=0.1):
+    return BalancedBackend(list(servers), [f"http://s{i}" for i in range(len(servers))],
+                           timeout=timeout, health_interval=60)
+
+
+def test_cancelled_call_releases_endpoint():
+    b = balanced(Server(delay=1.0), timeout=5.0)
+
+    async def go():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(b.acomplete(REQ), 0.05)   # timeout de fora (engine)
+
+    asyncio.run(go())
+    ep = b.endpoints[0]
+    assert ep.in_flight == 0 and ep.errors == 0 and ep.healthy
+
+
+def test_async_timeout_fails_over():
+    b = balanced(Server(delay=1.0), Server(answer="Opportunity"))
+    b.endpoints[1].requests = 1           # o lento é escolhido primeiro
+    span = {}
+    assert asyncio.run(b.acomplete(REQ, span)) == "Opportunity"
+    assert span["endpoint"] == "http://s1" and b.failovers == 1
+    assert b.endpoints[0].timeouts == 1 and not b.endpoints[0].healthy
+    assert all(ep.in_flight == 0 for ep in b.endpoints)
+
+
+def test_sync_timeout_fails_over():
+    b = balanced(Server(delay=1.0), Server(answer="Opportunity"))
+    b.endpoints[1].requests = 1
+    t = time.perf_counter()
+    assert b.complete(REQ) == "Opportunity"
+    assert time.perf_counter() - t < 0.5
+    assert b.endpoints[0].timeouts == 1
+    assert all(ep.in_flight == 0 for ep in b.endpoints)
+    b.close()
+
+
+def test_request_error_is_not_failed_over():
+    class Bad(Server):
+        async def acomplete(self, req, span=None):
+            raise ValueError("prompt inválido")
+
+    b = balanced(Bad(), Server())
+    with pytest.raises(ValueError):
+        asyncio.run(b.acomplete(REQ))
+    assert b.failovers == 0 and b.endpoints[0].in_flight == 0
@@ -0,0 +1,27 @@
+import numpy as np
+
+from polarity.dedup import Dedup, agreement_loss, cluster, normalize
+
+
+def test_normalize():
+    assert normalize("  Shell CUTS   emissions, again! ") == "shell cuts emissions again"
+
+
+def test_exact():
+    texts = ["Shell cuts emissions.", "b", "shell  CUTS emissions", "c", "b"]
+    np.testing.assert_array_equal(cluster(texts), [0, 1, 0, 3, 1])
+
+
+def test_near_joins_small_edits():
+    base = "Oil major announces a new offshore wind investment programme in the North Sea"
+    texts = [base, "completely unrelated headline about banking", base + " today"]
+    rep = cluster(texts, "near", threshold=0.8)
+    assert rep.tolist() == [0, 1, 0]
+    assert cluster(texts, "exact").tolist() == [0, 1, 2]
+
+
+def test_groups_and_loss():
+    d = Dedup(["a", "a", "b", "a"])
+    assert d.n_rows == 4 and d.n_reps == 2
+    assert d.groups() == {0: [0, 1, 3]}
+    assert agreement_loss(d, ["risk", "risk", "opportunity", "opportunity"]) == 0.5
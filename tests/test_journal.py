@@ -0,0 +1,89 @@
+import pytest
+
+from polarity.journal import Journal, journal_path
+from polarity.planner import plan_jobs
+
+
+def _jobs():
+    return plan_jobs({"prompt_a": ""}, 1, ["x", "y", "z"])
+
+
+def test_resume_skips_answered(tmp_path):
+    path = journal_path(tmp_path, "train", "qwen:7b")
+    assert path.name == "journal_train_qwen-7b.jsonl"
+    jobs = _jobs()
+    j = Journal(path)
+    j.write(jobs[0], "Risk")
+    j.write(jobs[1], "ERROR: timeout")
+    j.close()
+
+    j = Journal(path, resume=True)
+    pending, finished = j.split(jobs)
+    assert [p.row for p in pending] == [1, 2]
+    assert finished == [(jobs[0], "Risk")]
+    j.close()
+
+
+def test_error_after_success_reopens(tmp_path):
+    path = tmp_path / "j.jsonl"
+    jobs = _jobs()
+    j = Journal(path)
+    j.write(jobs[2], "Opportunity")
+    j.write(jobs[2], "ERROR: x")
+    j.close()
+    j = Journal(path, resume=True)
+    assert len(j.split(jobs)[0]) == 3
+    j.close()
+
+
+@pytest.mark.parametrize("windowed", [False, True])
+def test_truncated_line_is_isolated(tmp_path, windowed):
+    path = tmp_path / "j.jsonl"
+    jobs = _jobs()
+    j = Journal(path)
+    j.write(jobs[0], "Risk")
+    j.close()
+    with open(path, "a", encoding="utf-8") as fh:
+        fh.write('{"run": 1, "prompt": "prompt_a", "ro')     # queda no meio da escrita
+    j = Journal(path, resume=True, windowed=windowed)
+    j.write(jobs[1], "Opportunity")
+    j.close()
+    j = Journal(path, resume=True, windowed=windowed)
+    pending, finished = j.split(jobs)
+    assert [p.row for p in pending] == [2]
+    assert len(finished) == 2
+    j.close()
+
+
+def test_row_ids(tmp_path):
+    path = tmp_path / "j.jsonl"
+    jobs = _jobs()
+    j = Journal(path)
+    j.row_ids = [10, 11, 12]
+    j.write(jobs[1], "Risk")
+    j.close()
+    j = Journal(path, resume=True)
+    j.row_ids = [10, 11, 12]
+    assert [p.row for p in j.split(jobs)[0]] == [0, 2]
+    j.close()
+
+
+def test_windowed_resume_loads_only_the_chunk(tmp_path):
+    path = tmp_path / "j.jsonl"
+    jobs = plan_jobs({"prompt_a": ""}, 2, ["x", "y", "z"])
+    j = Journal(path)
+    j.row_ids = [100, 101, 102]
+    for job in jobs:
+        j.write(job, "Risk")
+    j.write(jobs[4], "ERROR: x")          # run 2, linha 101
+    j.close()
+
+    j = Journal(path, resume=True, windowed=True)
+    assert j._done == {}
+    j.row_ids = [101, 102]                # bloco com as duas últimas linhas
+    chunk = [job._replace(row=job.row - 1) for job in jobs if job.row > 0]
+    pending, finished = j.split(chunk)
+    assert [(p.run, p.row) for p in pending] == [(2, 0)]
+    assert len(finished) == 3
+    assert {k[2] for k in j._done} == {101, 102}
+    j.close()
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from polarity.labels import ERROR, UNDETERMINED, LabelParser
+
+PARSER = LabelParser(("Risk", "Opportunity"))
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Risk", "Risk"),
+    ("  **Opportunity**.", "Opportunity"),
+    ("Risks", "Risk"),
+    ("Opportunities abound", "Opportunity"),
+    ("ERROR: quota exceeded for Risk", ERROR),
+    ("Error: 503", ERROR),
+    ("<think>risk? maybe</think>Opportunity", "Opportunity"),
+    ('{"label": "risk"}', "Risk"),
+    ('{"labels": ["Opportunity"]}', "Opportunity"),
+    ('"Opportunity"', "Opportunity"),
+    ("This is not a risk, it is an opportunity", "Opportunity"),
+    ("no risk here, an opportunity", "Opportunity"),
+    ("Opportunity (low risk)", "Opportunity"),
+    ("Risk or Opportunity", UNDETERMINED),
+    ("Risk/Opportunity", UNDETERMINED),
+    ("Neither risk nor opportunity", UNDETERMINED),
+    ("I cannot tell", UNDETERMINED),
+    # modificadores: compostos com hífen qualificam o outro rótulo ou negam o próprio
+    ("risk-free opportunity", "Opportunity"),
+    ("riskless", UNDETERMINED),
+    ("low-risk opportunity", "Opportunity"),
+    ("low risk", "Risk"),
+    ("Limited opportunity", "Opportunity"),
+    ("minimal risk", "Risk"),
+    ("high-risk opportunity", "Opportunity"),
+    ("opportunity-driven risk", "Risk"),
+    ("High-risk", "Risk"),
+    # só menções negadas: negar um rótulo não afirma o outro
+    ("No risk", UNDETERMINED),
+    ("no-risk.", UNDETERMINED),
+    ("Not an opportunity", UNDETERMINED),
+    ("Risk (low opportunity)", "Risk"),
+    ("", UNDETERMINED),
+])
+def test_parse(text, expected):
+    assert PARSER.parse(text) == expected
+
+
+def test_parse_nan():
+    assert PARSER.parse(float("nan")) == UNDETERMINED
+
+
+def test_parse_many_matches_parse():
+    responses = ["Risk", "opportunity", "Risk", None, "ERROR: x", "Risk or Opportunity"]
+    out = PARSER.parse_many(responses)
+    assert isinstance(out, np.ndarray)
+    assert out.tolist() == [PARSER.parse(r) for r in responses]
+
+
+def test_negation_never_picks_the_other_label():
+    three = LabelParser(("Risk", "Opportunity", "Neutral"))
+    assert three.parse("No risk") == UNDETERMINED
+    assert LabelParser(("Positive", "Negative")).parse("not negative") == UNDETERMINED
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from collections import Counter
+
+import pandas as pd
+
+from polarity.evaluate import CLASSES, encode
+from polarity.metrics import (METRICS, compute_metrics, compute_metrics_counts, confusion,
+                              metrics_from_confusion)
+
+
+def test_binary_known_matrix():
+    # cm (Opportunity, Risk): [[1, 1], [1, 2]]
+    y_true = ["Risk", "Risk", "Risk", "Opportunity", "Opportunity"]
+    y_pred = ["Risk", "Risk", "Opportunity", "Opportunity", "Risk"]
+    m = compute_metrics(y_true, y_pred)
+    assert m["accuracy"] == pytest.approx(0.6)
+    assert m["f1_micro"] == pytest.approx(0.6)
+    assert m["precision_macro"] == pytest.approx((2 / 3 + 1 / 2) / 2)
+    assert m["recall_macro"] == pytest.approx((2 / 3 + 1 / 2) / 2)
+    assert m["f1_macro"] == pytest.approx((2 / 3 + 1 / 2) / 2)
+    assert m["f1_weighted"] == pytest.approx((3 * 2 / 3 + 2 * 1 / 2) / 5)
+
+
+def test_class_only_in_prediction_counts_in_macro():
+    # "undetermined" só aparece na predição: entra na macro com P=R=F1=0
+    y_true = ["Risk", "Opportunity", "Opportunity", "Risk"]
+    y_pred = ["Risk", "undetermined", "Opportunity", "Opportunity"]
+    m = compute_metrics(y_true, y_pred)
+    assert m["accuracy"] == pytest.approx(0.5)
+    assert m["precision_macro"] == pytest.approx((1 + 0.5 + 0) / 3)
+    assert m["recall_macro"] == pytest.approx((0.5 + 0.5 + 0) / 3)
+    assert m["f1_macro"] == pytest.approx((2 / 3 + 0.5 + 0) / 3)
+    # suporte zero: não pesa na weighted
+    assert m["f1_weighted"] == pytest.approx((2 * 2 / 3 + 2 * 0.5) / 4)
+
+
+def test_perfect_and_all_wrong():
+    assert all(v == 1.0 for v in compute_metrics(["Risk", "Opportunity"] * 3,
+                                                 ["Risk", "Opportunity"] * 3).values())
+    m = compute_metrics(["Risk"] * 4, ["Opportunity"] * 4)
+    assert all(m[k] == 0.0 for k in METRICS)
+
+
+def test_counts_match_lists():
+    y_true = ["Risk", "Risk", "Opportunity", "Opportunity", "Risk", "Opportunity"]
+    y_pred = ["Risk", "Opportunity", "Opportunity", "undetermined", "Risk", "Opportunity"]
+    assert compute_metrics_counts(Counter(zip(y_true, y_pred))) == pytest.approx(
+        compute_metrics(y_true, y_pred))
+
+
+def test_confusion_batched():
+    t = np.array([[0, 0, 1], [1, 1, 0]])
+    p = np.array([[0, 1, 1], [1, 1, 1]])
+    cm = confusion(t, p, 2)
+    assert cm.shape == (2, 2, 2)
+    np.testing.assert_array_equal(cm[0], [[1, 1], [0, 1]])
+    np.testing.assert_array_equal(cm[1], [[0, 1], [0, 2]])
+
+
+def test_error_scored_as_undetermined_like_evaluate():
+    y_true = ["Risk", "Risk", "Opportunity", "Opportunity", "Risk"]
+    y_pred = ["Risk", "error", "Opportunity", "undetermined", "error"]
+    m = compute_metrics(y_true, y_pred)
+    assert m == pytest.approx(compute_metrics(y_true, [p.replace("error", "undetermined")
+                                                       for p in y_pred]))
+    assert compute_metrics_counts(Counter(zip(y_true, y_pred))) == pytest.approx(m)
+    cm = confusion(encode(pd.Series(y_true)), encode(pd.Series(y_pred)), len(CLASSES))
+    offline = metrics_from_confusion(cm)
+    assert {k: float(offline[k]) for k in METRICS} == pytest.approx(m)
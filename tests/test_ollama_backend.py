@@ -0,0 +1,48 @@
+import threading
+
+import pytest
+
+pytest.importorskip("llama_index.llms.ollama")
+
+from polarity.backends import Request, ollama   # noqa: E402
+from polarity.backends.ollama import OllamaBackend   # noqa: E402
+from polarity.fake_ollama import serve   # noqa: E402
+from polarity.packing import json_schema, pack_prompt, unpack_response   # noqa: E402
+
+
+@pytest.fixture
+def fake_url():
+    srv = serve(port=0)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}"
+    srv.shutdown()
+
+
+def test_llama_index_clients_share_the_pool():
+    b = OllamaBackend("qwen3:8b", base_url="http://127.0.0.1:9", keep_alive="5m")
+    for llm in (b.llm, b._llm_for(type("R", (), {"n_items": 3})())):
+        assert llm.client is b._client
+        assert llm.async_client is b._async_client
+        assert llm.keep_alive == "5m"
+    assert b.pool.size >= b.max_concurrency
+
+
+def test_old_llama_index_is_refused(monkeypatch):
+    monkeypatch.setattr(ollama, "version", lambda dist: "0.4.2")
+    with pytest.raises(ImportError, match="0.4.2"):
+        OllamaBackend("qwen3:8b", base_url="http://127.0.0.1:9")
+
+
+def test_pack_sends_labels_schema(fake_url, monkeypatch):
+    b = OllamaBackend("qwen3:8b", base_url=fake_url)
+    sent, chat = {}, b._client.chat
+
+    def spy(**kwargs):
+        sent.update(kwargs)
+        return chat(**kwargs)
+
+    monkeypatch.setattr(b._client, "chat", spy)
+    labels = ("Risk", "Opportunity")
+    out = b.complete(Request("sys", pack_prompt("Answer 'Risk' or 'Opportunity':", ["a", "b"]), labels, 2))
+    assert sent["format"] == json_schema(labels)
+    assert None not in unpack_response(out, 2, list(labels))
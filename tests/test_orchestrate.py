@@ -0,0 +1,29 @@
+import threading, time
+
+from polarity import orchestrate
+from polarity.orchestrate import Entry, Orchestrator
+
+
+def entry(model, task):
+    return Entry("ollama", model, model, task, "train", None, None, None, None)
+
+
+def test_unload_waits_for_in_flight_entries(monkeypatch):
+    events, lock = [], threading.Lock()
+
+    def run(self, e):
+        time.sleep(0.05 if e.task == "slow" else 0.0)
+        with lock:
+            events.append(("done", e.model, e.task))
+
+    def unload(base_url, model):
+        with lock:
+            events.append(("unload", model))
+
+    monkeypatch.setattr(Orchestrator, "_run", run)
+    monkeypatch.setattr(orchestrate, "unload_ollama", unload)
+    cfg = {"backends": {"ollama": {"parallel": 2}}}
+    Orchestrator(cfg, [entry("a", "slow"), entry("a", "fast"), entry("b", "fast")]).run()
+    assert events.count(("unload", "a")) == 1
+    assert events.index(("unload", "a")) > events.index(("done", "a", "slow"))
+    assert ("unload", "b") in events
@@ -0,0 +1,27 @@
+from polarity.packing import pack_jobs, pack_prompt, unpack_response
+from polarity.planner import plan_jobs
+
+LABELS = ("Risk", "Opportunity")
+
+
+def test_pack_jobs_stays_within_cell():
+    jobs = plan_jobs({"p1": "", "p2": ""}, 1, "abcde")
+    packs = pack_jobs(jobs, 2)
+    assert [len(p) for p in packs] == [2, 2, 1, 2, 2, 1]
+    assert all(len({(j.run, j.prompt) for j in p}) == 1 for p in packs)
+
+
+def test_pack_prompt():
+    text = pack_prompt("Classify.\n", ["first", "second"])
+    assert text.startswith("Classify.\nApply")
+    assert "exactly 2 labels" in text
+    assert text.endswith("1. first\n2. second")
+
+
+def test_unpack_response():
+    assert unpack_response('{"labels": ["risk", "Opportunity"]}', 2, LABELS) == ["Risk", "Opportunity"]
+    assert unpack_response('["Risk", "maybe"]', 2, LABELS) == ["Risk", None]
+    assert unpack_response('Sure! {"labels": ["Risk"]} done', 1, LABELS) == ["Risk"]
+    assert unpack_response('{"labels": ["Risk"]}', 2, LABELS) == [None, None]
+    assert unpack_response("not json", 2, LABELS) == [None, None]
+    assert unpack_response(None, 1, LABELS) == [None]
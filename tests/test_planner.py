@@ -0,0 +1,56 @@
+from polarity.planner import ResultSink, plan_jobs, plan_rounds
+
+PROMPTS = {"prompt_a": "A:", "prompt_b": "B:"}
+
+
+def test_plan_jobs_orders():
+    jobs = plan_jobs(PROMPTS, 2, ["x", "y"])
+    assert len(jobs) == 2 * 2 * 2
+    assert [(j.run, j.prompt, j.row) for j in jobs[:3]] == [
+        (1, "prompt_a", 0), (1, "prompt_a", 1), (1, "prompt_b", 0)]
+    by_prefix = plan_jobs(PROMPTS, 2, ["x", "y"], order="prefix")
+    assert [(j.run, j.prompt) for j in by_prefix[:4]] == [
+        (1, "prompt_a"), (1, "prompt_a"), (2, "prompt_a"), (2, "prompt_a")]
+    assert sorted(jobs) == sorted(by_prefix)
+    assert jobs[0].prefix == "A:" and jobs[1].text == "y"
+
+
+def test_result_sink_out_of_order():
+    cells, runs = [], []
+    sink = ResultSink(2, 2, lambda r, p, res: cells.append((r, p, res)), runs.append)
+    jobs = plan_jobs(PROMPTS, 2, ["x", "y"])
+    for j in reversed(jobs):
+        sink.add(j, f"{j.run}{j.prompt[-1]}{j.row}")
+    assert len(cells) == 4
+    assert (2, "prompt_b", ["2b0", "2b1"]) in cells
+    assert runs == [2, 1]
+
+
+def test_result_sink_partial_cell():
+    cells = []
+    sink = ResultSink(3, 1, lambda *a: cells.append(a))
+    for j in plan_jobs({"p": ""}, 1, "abc")[:2]:
+        sink.add(j, "Risk")
+    assert cells == []
+
+
+def test_plan_rounds_without_tracker():
+    jobs = plan_jobs(PROMPTS, 2, "xy")
+    assert list(plan_rounds(jobs, PROMPTS, 2, "xy")) == [jobs]
+
+
+def test_plan_rounds_adaptive_fills_stable_rows():
+    class Tracker:   # linha 0 estável a partir da run 2
+        def plan(self, prompt, run):
+            return [0, 1] if run == 1 else [1]
+
+        def fill(self, prompt, row):
+            return "Risk"
+
+    filled = []
+    jobs = plan_jobs(PROMPTS, 2, "xy")
+    rounds = list(plan_rounds(jobs, PROMPTS, 2, "xy", Tracker(), {"prompt_b": {1: "Risk"}},
+                              lambda job, resp: filled.append((job.run, job.prompt, job.row))))
+    assert [len(r) for r in rounds] == [4, 2]
+    assert all(j.row == 1 for j in rounds[1])
+    assert sorted(filled) == [(2, "prompt_a", 0), (2, "prompt_b", 0)]
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from polarity.ratelimit import (RateLimiter, call_with_retries, is_rate_limit_error,
+                                is_transient_error, retry_budget)
+
+
+def test_timeout_applies_per_attempt():
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            await asyncio.sleep(1.0)      # primeira tentativa pendura
+        return "Risk"
+
+    limiter = RateLimiter(rpm=6000, retries=2)
+    out = asyncio.run(call_with_retries(flaky, limiter, timeout=0.05, base_delay=0.01))
+    assert out == "Risk" and len(calls) == 2
+    assert limiter.retries == 1 and limiter.failures == 0
+
+
+def test_timeout_exhausts_retries():
+    async def hang():
+        await asyncio.sleep(1.0)
+
+    limiter = RateLimiter(rpm=6000, retries=1)
+    with pytest.raises(TimeoutError):
+        asyncio.run(call_with_retries(hang, limiter, timeout=0.02, base_delay=0.01))
+    assert limiter.failures == 1
+
+
+def test_non_transient_error_is_raised():
+    async def bad():
+        raise ValueError("400 bad request")
+
+    limiter = RateLimiter(rpm=6000, retries=3)
+    with pytest.raises(ValueError):
+        asyncio.run(call_with_retries(bad, limiter, base_delay=0.01))
+    assert limiter.retries == 0
+
+
+def test_retry_budget_covers_attempts_and_backoff():
+    assert retry_budget(10, 0) == 10
+    assert retry_budget(10, 3) == 4 * 10 + 1 + 2 + 4
+    assert retry_budget(10, 8, max_delay=60) == 9 * 10 + 1 + 2 + 4 + 8 + 16 + 32 + 60 + 60
+
+
+@pytest.mark.parametrize("msg, throttled, transient", [
+    ("429 Too Many Requests", True, False),
+    ("RESOURCE_EXHAUSTED: quota", True, False),
+    ("Error code: 503 - UNAVAILABLE", False, True),
+    ("500 INTERNAL", False, True),
+    ("request timed out", False, True),
+    ("400 prompt has 4290 tokens, limit is 4096", False, False),
+    ("404 model gemini-500-pro not found", False, False),
+    ("400 invalid resource projects/p/locations/x/cachedContents/500", False, False),
+    ("400 INVALID_ARGUMENT", False, False),
+])
+def test_status_from_message(msg, throttled, transient):
+    e = RuntimeError(msg)
+    assert is_rate_limit_error(e) == throttled
+    assert is_transient_error(e) == transient
@@ -0,0 +1,107 @@
+"""Varreduras completas com o backend mock (sem rede), em diretório temporário."""
+import argparse, json
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from polarity.runner import add_runner_args, make_backend, run_sweep
+from polarity.tasks import OPPRISK
+
+ROOT = Path(__file__).resolve().parents[1]
+SYSTEM = "Respond exclusively with one of the specified labels."
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    df = pd.read_csv(ROOT / "ML-ESG-2_English_Train_formatted.csv", nrows=14)
+    df = pd.concat([df, df.iloc[[0, 3]]], ignore_index=True)   # duas duplicatas exatas
+    path = tmp_path / "headlines.csv"
+    df.to_csv(path, index=False)
+    return path
+
+
+def sweep(corpus, out, *extra, **attrs):
+    p = argparse.ArgumentParser()
+    add_runner_args(p, ["mock"], model="mock", prompts=str(ROOT / "prompts_opprisk.json"))
+    args = p.parse_args(["--input_csv", str(corpus), "--out_dir", str(out), "--runs", "2",
+                         "--mock_latency", "0", "--no_progress",
+                         "--stats_json", str(out / "stats.json"), *extra])
+    vars(args).update(attrs)   # opções que o parser do mock não tem (ex.: mode)
+    run_sweep(args, make_backend(args), OPPRISK, SYSTEM)
+    return json.loads((out / "stats.json").read_text(encoding="utf-8"))
+
+
+def cells(out):
+    return {p.name: pd.read_csv(p) for p in sorted(out.glob("headlines_*_run*.csv"))}
+
+
+def test_default_sweep(corpus, tmp_path):
+    out = tmp_path / "out"
+    stats = sweep(corpus, out)
+    res = cells(out)
+    assert len(res) == 2 * 4
+    assert all(len(df) == 16 for df in res.values())
+    assert stats["rows"] == 2 * 4 * 16 and stats["errors"] == 0
+    journal = (out / "journal_headlines_mock.jsonl").read_text(encoding="utf-8").splitlines()
+    assert len(journal) == 2 * 4 * 16
+    metrics = next(out.glob("metrics_mock_*.txt")).read_text(encoding="utf-8")
+    assert metrics.count("accuracy_mean=") == 4
+
+
+def test_resume_sends_nothing(corpus, tmp_path):
+    out = tmp_path / "out"
+    sweep(corpus, out)
+    first = cells(out)
+    stats = sweep(corpus, out, "--resume")
+    assert stats["rows"] == 0
+    for name, df in cells(out).items():
+        pd.testing.assert_frame_equal(df, first[name])
+
+
+def test_dedup_copies_and_journals(corpus, tmp_path):
+    base, out = tmp_path / "base", tmp_path / "dedup"
+    sweep(corpus, base)
+    stats = sweep(corpus, out, "--dedup", "exact")
+    assert stats["rows"] == 2 * 4 * 14
+    assert stats["dedup_copied"] == 2 * 4 * 2
+    for name, df in cells(out).items():
+        assert df["responseLabel"].iat[14] == df["responseLabel"].iat[0]
+        assert df["responseLabel"].iat[15] == df["responseLabel"].iat[3]
+
+
+def test_pack_fills_every_row(corpus, tmp_path):
+    out = tmp_path / "pack"
+    stats = sweep(corpus, out, "--pack_size", "4")
+    assert stats["calls"] == 2 * 4 * 4
+    for df in cells(out).values():
+        assert set(df["responseLabel"]) <= {"Risk", "Opportunity"}
+
+
+def test_stream_matches_default(corpus, tmp_path):
+    ref, out = tmp_path / "ref", tmp_path / "stream"
+    sweep(corpus, ref)
+    sweep(corpus, out, "--stream", "--chunk_rows", "5")
+    expected = cells(ref)
+    for name, df in cells(out).items():
+        assert df["responseLabel"].tolist() == expected[name]["responseLabel"].tolist()
+
+
+def test_resume_after_dedup_change(corpus, tmp_path):
+    out = tmp_path / "out"
+    sweep(corpus, out, "--dedup", "exact")
+    first = cells(out)
+    lines = (out / "journal_headlines_mock.jsonl").read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 2 * 4 * 16          # um registro por membro
+    stats = sweep(corpus, out, "--resume")
+    assert stats["rows"] == 0
+    for name, df in cells(out).items():
+        pd.testing.assert_frame_equal(df, first[name])
+
+
+def test_batch_records_latency(corpus, tmp_path):
+    out = tmp_path / "batch"
+    stats = sweep(corpus, out, "--pack_size", "4", mode="batch", batch_poll=0)
+    assert stats["rows"] == 2 * 4 * 16
+    assert stats["n"] == stats["calls"] == 2 * 4 * 4
+    assert stats["p50_ms"] is not None
@@ -0,0 +1,51 @@
+import argparse, time
+from pathlib import Path
+
+import pytest
+
+from polarity.runner import add_runner_args, make_backend
+from polarity.serve import Classifier
+from polarity.tasks import OPPRISK
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture
+def clf():
+    p = argparse.ArgumentParser()
+    add_runner_args(p, ["mock"], model="mock", prompts=str(ROOT / "prompts_opprisk.json"))
+    args = p.parse_args(["--serve", "--mock_latency", "0", "--batch_window_ms", "1"])
+    c = Classifier(args, make_backend(args), OPPRISK, "Respond with one label.")
+    yield c
+    c.close()
+
+
+def test_classify_and_rates(clf):
+    out = clf.classify(["Profits soared.", "Plant fire halts output."])
+    assert len(out) == 2 and all(len(r["labels"]) == len(clf.prompts) for r in out)
+    m = clf.stats()
+    assert m["requests"] == 1 and m["items"] == 2 * len(clf.prompts)
+    assert m["items_per_s"] == pytest.approx(m["requests_per_s"] * m["items"])
+
+
+def test_failed_batch_fails_waiters(clf, monkeypatch):
+    def boom(*a):
+        raise RuntimeError("lote quebrado")
+
+    monkeypatch.setattr(clf.metrics, "batch", boom)
+    with pytest.raises(RuntimeError, match="lote quebrado"):
+        clf.classify(["Profits soared."])
+    assert clf.stats()["errors"] == len(clf.prompts)
+
+
+def test_deadline_expires_pending_items(clf):
+    clf.engine.concurrency = 1   # um item no backend, os demais na fila do semáforo
+    clf.backend.latency = 0.2
+    clf.deadline_s = 0.05
+    with pytest.raises(TimeoutError):
+        clf.classify(["Profits soared."])
+    time.sleep(0.5)
+    m = clf.stats()
+    assert m["expired"] == m["errors"] == len(clf.prompts)
+    assert m["in_flight"] == 0
+    assert m["llm_calls"] == 1   # os itens cancelados na fila não chegaram ao backend
@@ -0,0 +1,27 @@
+import pytest
+
+from polarity.stats import LatencyStats, Reservoir, percentile
+
+
+def test_percentile():
+    assert percentile([], 50) == 0.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 50) == pytest.approx(2.5)
+    assert percentile([1.0, 2.0, 3.0, 4.0], 100) == 4.0
+
+
+def test_reservoir_is_bounded_and_uniform():
+    r = Reservoir(1000)
+    for x in range(100_000):
+        r.add(x)
+    assert r.n == 100_000 and len(r.values) == 1000
+    assert percentile(sorted(r.values), 50) == pytest.approx(50_000, rel=0.1)
+
+
+def test_latency_stats_counts_all_samples():
+    st = LatencyStats(max_samples=10)
+    for _ in range(50):
+        st.record(0.01)
+    st.stop()
+    d = st.as_dict()
+    assert d["n"] == 50 and len(st.sample.values) == 10
+    assert d["p50_ms"] == pytest.approx(10.0)
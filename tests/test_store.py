@@ -0,0 +1,18 @@
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from polarity.store import ColumnarStore, load_texts   # noqa: E402
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_texts_rewritten_when_content_changes(tmp_path, fmt):
+    ColumnarStore(tmp_path, fmt, "m", "t", "h", ["a", "b", "c"], ["Risk"] * 3)
+    assert load_texts(tmp_path, "h", fmt).num_rows == 3
+    path = next((tmp_path / "texts").iterdir())
+    mtime = path.stat().st_mtime_ns
+    ColumnarStore(tmp_path, fmt, "m", "t", "h", ["a", "b", "c"], ["Risk"] * 3)
+    assert path.stat().st_mtime_ns == mtime          # mesmo conteúdo: não regrava
+    ColumnarStore(tmp_path, fmt, "m", "t", "h", ["a", "x"], ["Risk", "Opportunity"])
+    t = load_texts(tmp_path, "h", fmt).to_pydict()
+    assert t["text"] == ["a", "x"] and t["label"] == ["Risk", "Opportunity"]
@@ -0,0 +1,24 @@
+import time
+
+import pytest
+
+from polarity.planner import plan_jobs
+from polarity.trace import Tracer
+
+
+def test_queue_ms_measured_from_enqueue():
+    tracer = Tracer(progress=False)
+    time.sleep(0.05)                      # tempo antes de enfileirar não conta
+    packs = [[j] for j in plan_jobs({"p": ""}, 1, "ab")]
+    tracer.enqueue(packs)
+    first = tracer.start(packs[0])
+    time.sleep(0.05)
+    second = tracer.start(packs[1])
+    assert first["queue_ms"] < 20
+    assert second["queue_ms"] >= 45
+    assert tracer.start(packs[0])["queue_ms"] < 5     # retentativa: sem nova espera
+    for span in (first, second):
+        tracer.finish(span)
+    row = tracer.summary_rows()[0]
+    assert row["calls"] == 2
+    assert row["queue_ms_mean"] == pytest.approx((first["queue_ms"] + second["queue_ms"]) / 2)